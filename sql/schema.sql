@@ -1,86 +1,137 @@
 CREATE TABLE IF NOT EXISTS characters (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    name TEXT NOT NULL,
-    path_name TEXT NOT NULL UNIQUE,
-    description TEXT,
+    id INTEGER NOT NULL,
+    name VARCHAR NOT NULL,
+    path_name VARCHAR NOT NULL,
+    description VARCHAR,
     age INTEGER,
-    height TEXT,
-    personality TEXT,
-    appearance TEXT,
-    loves TEXT,
-    hates TEXT,
-    details TEXT,
-    scenario TEXT,
-    important TEXT,
-    initial_message TEXT,
-    favorite_colour TEXT,
-    phases boolean DEFAULT 0,
-    img_gen boolean DEFAULT 0,
-    model TEXT,
-    global_positive TEXT,
-    global_negative TEXT,
-    profile_path TEXT
+    height VARCHAR,
+    personality VARCHAR,
+    appearance VARCHAR,
+    loves VARCHAR,
+    hates VARCHAR,
+    details VARCHAR,
+    scenario VARCHAR,
+    important VARCHAR,
+    initial_message VARCHAR,
+    favorite_colour VARCHAR,
+    phases BOOLEAN,
+    img_gen BOOLEAN,
+    model VARCHAR,
+    global_positive VARCHAR,
+    global_negative VARCHAR,
+    profile_path VARCHAR,
+    PRIMARY KEY (id)
 );
 
-CREATE TABLE IF NOT EXISTS users (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    username TEXT NOT NULL UNIQUE,
-    password TEXT NOT NULL,
-    email TEXT NOT NULL UNIQUE
-);
+CREATE INDEX IF NOT EXISTS ix_characters_path_name ON characters (path_name);
 
-CREATE TABLE IF NOT EXISTS threads (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    started TEXT DEFAULT CURRENT_TIMESTAMP,
-    user_id INTEGER NOT NULL,
-    char_id INTEGER NOT NULL,
-    phase INTEGER DEFAULT 0,
-    FOREIGN KEY(user_id) REFERENCES users(id),
-    FOREIGN KEY(char_id) REFERENCES characters(id)
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INTEGER NOT NULL,
+    description VARCHAR NOT NULL,
+    applied DATETIME,
+    PRIMARY KEY (version)
 );
 
-CREATE TABLE IF NOT EXISTS messages (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
-    thread_id INTEGER NOT NULL,
-    content TEXT NOT NULL,
-    role TEXT NOT NULL,
-    FOREIGN KEY(thread_id) REFERENCES threads(id)
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER NOT NULL,
+    username VARCHAR NOT NULL,
+    password VARCHAR NOT NULL,
+    email VARCHAR NOT NULL,
+    PRIMARY KEY (id)
 );
 
+CREATE INDEX IF NOT EXISTS ix_users_username ON users (username);
+
 CREATE TABLE IF NOT EXISTS events (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+    id INTEGER NOT NULL,
+    timestamp DATETIME,
     char_id INTEGER NOT NULL,
-    type TEXT NOT NULL,
-    content TEXT NOT NULL,
-    FOREIGN KEY(char_id) REFERENCES characters(id)
+    type VARCHAR NOT NULL,
+    content VARCHAR NOT NULL,
+    token_count INTEGER,
+    tokenizer VARCHAR,
+    PRIMARY KEY (id),
+    FOREIGN KEY(char_id) REFERENCES characters (id)
 );
 
+CREATE INDEX IF NOT EXISTS ix_events_char_id_timestamp ON events (char_id, timestamp);
+
 CREATE TABLE IF NOT EXISTS posts (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+    id INTEGER NOT NULL,
+    timestamp DATETIME,
     char_id INTEGER NOT NULL,
-    description TEXT,
-    image_post boolean DEFAULT 0,
-    prompt TEXT,
-    caption TEXT,
-    image_path TEXT,
-    FOREIGN KEY(char_id) REFERENCES characters(id)
+    content VARCHAR,
+    image_post BOOLEAN,
+    image_description VARCHAR,
+    prompt VARCHAR,
+    image_path VARCHAR,
+    token_count INTEGER,
+    tokenizer VARCHAR,
+    PRIMARY KEY (id),
+    FOREIGN KEY(char_id) REFERENCES characters (id)
 );
 
-CREATE TABLE IF NOT EXISTS phases (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    stage INTEGER NOT NULL,
+CREATE INDEX IF NOT EXISTS ix_posts_char_id_timestamp ON posts (char_id, timestamp);
+
+CREATE TABLE IF NOT EXISTS threads (
+    id INTEGER NOT NULL,
+    started DATETIME,
+    user_id INTEGER NOT NULL,
     char_id INTEGER NOT NULL,
-    name TEXT NOT NULL,
-    description TEXT,
-    response_time TEXT,
-    min_rt INTEGER,
-    max_rt INTEGER,
-    names TEXT,
-    events TEXT,
-    advance_conditions TEXT,
-    FOREIGN KEY(char_id) REFERENCES characters(id)
+    PRIMARY KEY (id),
+    FOREIGN KEY(user_id) REFERENCES users (id),
+    FOREIGN KEY(char_id) REFERENCES characters (id)
 );
 
+CREATE INDEX IF NOT EXISTS ix_threads_user_id_char_id_started ON threads (user_id, char_id, started);
+
+CREATE TABLE IF NOT EXISTS comments (
+    id INTEGER NOT NULL,
+    timestamp DATETIME,
+    post_id INTEGER NOT NULL,
+    char_id INTEGER NOT NULL,
+    content VARCHAR NOT NULL,
+    token_count INTEGER,
+    tokenizer VARCHAR,
+    PRIMARY KEY (id),
+    FOREIGN KEY(post_id) REFERENCES posts (id),
+    FOREIGN KEY(char_id) REFERENCES characters (id)
+);
+
+CREATE INDEX IF NOT EXISTS ix_comments_post_id ON comments (post_id);
+
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER NOT NULL,
+    timestamp DATETIME,
+    thread_id INTEGER NOT NULL,
+    content VARCHAR NOT NULL,
+    role VARCHAR NOT NULL,
+    token_count INTEGER,
+    tokenizer VARCHAR,
+    PRIMARY KEY (id),
+    FOREIGN KEY(thread_id) REFERENCES threads (id)
+);
+
+CREATE INDEX IF NOT EXISTS ix_messages_thread_id_timestamp ON messages (thread_id, timestamp);
+
+CREATE TABLE IF NOT EXISTS likes (
+    id INTEGER NOT NULL,
+    timestamp DATETIME,
+    user_id INTEGER NOT NULL,
+    content_liked VARCHAR NOT NULL,
+    post_id INTEGER,
+    comment_id INTEGER,
+    PRIMARY KEY (id),
+    CONSTRAINT check_one_type_not_null CHECK ((post_id IS NOT NULL AND comment_id IS NULL) OR (post_id IS NULL AND comment_id IS NOT NULL)),
+    FOREIGN KEY(user_id) REFERENCES users (id),
+    FOREIGN KEY(post_id) REFERENCES posts (id),
+    FOREIGN KEY(comment_id) REFERENCES comments (id)
+);
+
+CREATE INDEX IF NOT EXISTS ix_likes_comment_id ON likes (comment_id);
+
+CREATE INDEX IF NOT EXISTS ix_likes_post_id ON likes (post_id);
+
+CREATE INDEX IF NOT EXISTS ix_likes_user_id_content_liked_comment_id ON likes (user_id, content_liked, comment_id);
+
+CREATE INDEX IF NOT EXISTS ix_likes_user_id_content_liked_post_id ON likes (user_id, content_liked, post_id);
@@ -5,7 +5,6 @@ This is the main file that runs the application.
 import argparse
 import importlib
 import os
-import threading
 from datetime import timedelta
 
 from flask import Flask, g
@@ -24,19 +23,25 @@ class App:
         self.port = int(os.getenv("PORT", "8080"))
         self.app = Flask(__name__)
         self.detached = detached
-        CORS(self.app)
+        CORS(self.app, expose_headers=["X-Next-Cursor"])
         routes.register_routes(self.app)
         self._setup_before_request()
         self.model = None
         self.new_model = None
         self.response_cycle = None
         self.schedule_events = None
+        self.new_response_coordinator = None
+        self.response_coordinator = None
         if not self.detached:
             self._import_functions()
             assert self.new_model is not None
             assert self.schedule_events is not None
+            assert self.new_response_coordinator is not None
             self.model = self.new_model(mocked=mocked)
             self.schedule_events(self.model)
+            self.response_coordinator = self.new_response_coordinator(
+                self.model, self.response_cycle
+            )
 
     def _setup_before_request(self) -> None:
         @self.app.before_request
@@ -53,14 +58,15 @@ class App:
     def trigger_response_cycle(
         self, thread_id: int, duration: timedelta | None = None
     ) -> None:
-        """Start the chatbot response cycle in a background thread."""
+        """
+        Start the chatbot response cycle in the background,
+        superseding any cycle already in flight for the thread.
+        """
         if self.detached:
             print("App is in detached mode. Cannot trigger response cycle.")
             return
-        thread = threading.Thread(
-            target=self.response_cycle, args=(self.model, thread_id, duration)
-        )
-        thread.start()
+        assert self.response_coordinator is not None
+        self.response_coordinator.trigger(thread_id, duration)
 
     def _import_functions(self) -> None:
         """
@@ -70,12 +76,14 @@ class App:
             self.new_model is not None
             and self.response_cycle is not None
             and self.schedule_events is not None
+            and self.new_response_coordinator is not None
         ):
             return
         module = importlib.import_module("chatbot")
         self.new_model = module.new_model
         self.response_cycle = module.response_cycle
         self.schedule_events = module.schedule_events
+        self.new_response_coordinator = module.ResponseCoordinator
 
 
 def main() -> None:
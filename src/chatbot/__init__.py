@@ -1,5 +1,6 @@
 """__init__.py for the chatbot package."""
 
+from .coordinator import ResponseCoordinator
 from .events import generate_event
 from .model import Model, new_model
 from .posts import generate_social_media_post
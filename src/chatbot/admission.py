@@ -0,0 +1,98 @@
+"""
+Admission control for scheduled background generation,
+so it backs off while the model is saturated instead of piling on.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Literal, Set, TypedDict
+
+from .model import Model
+
+# Queued chats, and mean seconds per generation, past which the model is saturated
+MAX_QUEUE_DEPTH = int(os.getenv("ADMISSION_MAX_QUEUE_DEPTH", "16"))
+MAX_LATENCY = float(os.getenv("ADMISSION_MAX_LATENCY", "60"))
+# Jobs postponed while saturated, rather than shed, since they're rare
+POSTPONABLE_KINDS = {"post", "comment"}
+POSTPONE_DELAY = 300.0
+MAX_POSTPONES = 3
+
+Decision = Literal["admit", "postpone", "shed"]
+_STATS = {"admit": "admitted", "postpone": "postponed", "shed": "shed"}
+
+
+class ShedJob(TypedDict):
+    """A scheduled job that was dropped, and the load it was dropped under."""
+
+    timestamp: float
+    char_id: int
+    kind: str
+    queue_depth: int
+    latency: float | None
+
+
+class AdmissionController:
+    """
+    Decides whether a scheduled generation runs now, from the model's queue
+    depth and recent generation latency. Past either threshold, postponable
+    jobs are put off up to max_postpones times and every other job is shed;
+    thoughts and events fire again soon enough anyway.
+    Keeps a log of the latest jobs shed.
+    """
+
+    def __init__(
+        self,
+        model: Model,
+        max_queue_depth: int = MAX_QUEUE_DEPTH,
+        max_latency: float = MAX_LATENCY,
+        postponable: Set[str] | None = None,
+        postpone_delay: float = POSTPONE_DELAY,
+        max_postpones: int = MAX_POSTPONES,
+        log_size: int = 100,
+    ) -> None:
+        self.model = model
+        self.max_queue_depth = max_queue_depth
+        self.max_latency = max_latency
+        self.postponable = POSTPONABLE_KINDS if postponable is None else postponable
+        self.postpone_delay = postpone_delay
+        self.max_postpones = max_postpones
+        self._shed: deque[ShedJob] = deque(maxlen=log_size)
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"admitted": 0, "postponed": 0, "shed": 0}
+
+    def decide(self, char_id: int, kind: str, postponed: int = 0) -> Decision:
+        """
+        Decide what to do with a due job,
+        given how many times it has already been postponed.
+        """
+        depth = self.model.queue_depth()
+        latency = self.model.router.recent_latency()
+        saturated = depth >= self.max_queue_depth or (
+            latency is not None and latency >= self.max_latency
+        )
+        decision: Decision = "admit"
+        if saturated:
+            can_postpone = postponed < self.max_postpones
+            decision = (
+                "postpone" if kind in self.postponable and can_postpone else "shed"
+            )
+        with self._lock:
+            self.stats[_STATS[decision]] += 1
+            if decision == "shed":
+                self._shed.append(
+                    ShedJob(
+                        timestamp=time.time(),
+                        char_id=char_id,
+                        kind=kind,
+                        queue_depth=depth,
+                        latency=latency,
+                    )
+                )
+        return decision
+
+    def shed_jobs(self) -> List[ShedJob]:
+        """Return the latest jobs shed, oldest first."""
+        with self._lock:
+            return list(self._shed)
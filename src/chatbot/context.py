@@ -0,0 +1,359 @@
+"""
+Serializes database rows into log entries, and keeps a rolling window of those
+entries in memory for each character so logs can be built without the database.
+"""
+
+import json
+import threading
+from bisect import insort
+from typing import Any, Dict, List, cast
+
+import database as db
+
+from .model import Model
+from .types import (
+    MAX_LOG_EVENTS,
+    MAX_LOG_MESSAGES,
+    MAX_LOG_POSTS,
+    ChatMessage,
+    ContextEntry,
+    FeedSnapshot,
+    StampedChatMessage,
+)
+
+
+def _message_to_chatmessage(
+    message: db.MessageWithParticipants,
+) -> StampedChatMessage:
+    content = {
+        "type": "message",
+        "time_message_was_sent": message["timestamp"].isoformat(),
+        "message": message["content"],
+    }
+    if message["role"] == "user":
+        content["sent_by"] = message["username"]
+        content["sent_to"] = message["char_name"]
+    else:
+        content["sent_by"] = message["char_name"]
+        content["sent_to"] = message["username"]
+    chatmessage = StampedChatMessage(
+        role=message["role"],
+        content=json.dumps(content),
+        timestamp=message["timestamp"],
+    )
+    return chatmessage
+
+
+def _event_to_chatmessage(event: db.Event) -> StampedChatMessage:
+    content = {
+        "type": event["type"],
+        "time_event_occurred": event["timestamp"].isoformat(),
+        "event": event["content"],
+    }
+    chatmessage = StampedChatMessage(
+        role="assistant",
+        content=json.dumps(content),
+        timestamp=event["timestamp"],
+    )
+    return chatmessage
+
+
+def _post_to_chatmessage(post: db.Post) -> StampedChatMessage:
+    """
+    Convert a post to a chat message,
+    ensuring each post has a unique ID since the chatbot will need to reference it.
+    """
+    return _posts_to_chatmessages([post])[0]
+
+
+def _posts_to_chatmessages(posts: List[db.Post]) -> List[StampedChatMessage]:
+    """
+    Convert posts to chat messages, loading their comments and the names of
+    everyone involved in two queries, however many posts there are.
+    """
+    if not posts:
+        return []
+    comments = db.select_comments_from_posts(post["id"] for post in posts)
+    char_ids = {post["char_id"] for post in posts}
+    char_ids.update(c["char_id"] for cs in comments.values() for c in cs)
+    names = {
+        char_id: character["name"]
+        for char_id, character in db.select_characters_by_ids(char_ids).items()
+    }
+    return [_serialize_post(post, comments[post["id"]], names) for post in posts]
+
+
+def _serialize_post(
+    post: db.Post, comments: List[db.Comment], names: Dict[int, str]
+) -> StampedChatMessage:
+    coments_content = []
+    for comment in comments:
+        coments_content.append(
+            {
+                "comment": comment["content"],
+                "commented_by": names[comment["char_id"]],
+            }
+        )
+    content = {
+        "id": post["id"],
+        "time_post_was_made": post["timestamp"].isoformat(),
+        "posted_by": names[post["char_id"]],
+        "comments": coments_content,
+    }
+    if post["image_post"]:
+        content["type"] = "image_post"
+        content["image_description"] = post["image_description"]
+        content["caption"] = post["content"]
+    else:
+        content["type"] = "text_post"
+        content["post"] = post["content"]
+    chatmessage = StampedChatMessage(
+        role="assistant",
+        content=json.dumps(content),
+        timestamp=post["timestamp"],
+    )
+    return chatmessage
+
+
+def _load_messages(char_id: int) -> List[ContextEntry]:
+    messages = db.select_recent_messages_by_character(char_id, MAX_LOG_MESSAGES)
+    entries = []
+    for message in reversed(messages):
+        if not all(
+            [
+                message["timestamp"],
+                message["content"],
+                message["role"],
+                message["thread_id"],
+            ]
+        ):
+            continue
+        entries.append(_message_entry(message))
+    return entries
+
+
+def _message_entry(message: db.MessageWithParticipants) -> ContextEntry:
+    return ContextEntry(
+        id=message["id"],
+        parent_id=message["thread_id"],
+        message=_message_to_chatmessage(message),
+    )
+
+
+def _load_events(char_id: int) -> List[ContextEntry]:
+    event_filter = db.Event(char_id=char_id)
+    options = db.QueryOptions(limit=MAX_LOG_EVENTS, orderby="timestamp", order="desc")
+    events = db.events.select_events(event_filter, options)
+    return [_event_entry(event) for event in reversed(events)]
+
+
+def _event_entry(event: db.Event) -> ContextEntry:
+    return ContextEntry(
+        id=event["id"], parent_id=event["char_id"], message=_event_to_chatmessage(event)
+    )
+
+
+def _load_posts(char_id: int | None) -> List[ContextEntry]:
+    select_filter = db.Post()
+    options = db.QueryOptions(limit=MAX_LOG_POSTS, orderby="timestamp", order="desc")
+    # if other_characters is false, only show posts from the current character
+    if char_id:
+        select_filter["char_id"] = char_id
+    posts = list(reversed(db.posts.select_posts(select_filter, options)))
+    return [
+        ContextEntry(id=post["id"], parent_id=post["char_id"], message=message)
+        for post, message in zip(posts, _posts_to_chatmessages(posts))
+    ]
+
+
+def _post_entry(post: db.Post) -> ContextEntry:
+    return ContextEntry(
+        id=post["id"], parent_id=post["char_id"], message=_post_to_chatmessage(post)
+    )
+
+
+def _entry_timestamp(entry: ContextEntry) -> Any:
+    return entry["message"]["timestamp"]
+
+
+class ContextStore:
+    """
+    Rolling windows of serialized log entries, held in memory.
+    Messages and events are windowed per character, posts per feed (the global
+    feed under None, or a single character's posts). Windows are loaded from the
+    database on first use, then kept current by database hooks: inserts are
+    appended to any loaded window and deletes drop the windows they affect.
+    """
+
+    def __init__(self) -> None:
+        self._messages: Dict[int, List[ContextEntry]] = {}
+        self._events: Dict[int, List[ContextEntry]] = {}
+        self._posts: Dict[int | None, List[ContextEntry]] = {}
+        # thread id -> character id, learned from loaded messages
+        self._thread_chars: Dict[int, int] = {}
+        self._lock = threading.RLock()
+        self._hits = 0
+        self._misses = 0
+
+    def register_hooks(self) -> None:
+        """Keep the store up to date with changes made through the database package."""
+        db.register_hook("messages", self._on_message)
+        db.register_hook("events", self._on_event)
+        db.register_hook("posts", self._on_post)
+        db.register_hook("comments", self._on_comment)
+
+    def messages(self, char_id: int) -> List[StampedChatMessage]:
+        """Return the most recent messages sent to or by a character."""
+        with self._lock:
+            entries = self._messages.get(char_id)
+            if entries is None:
+                self._misses += 1
+                entries = _load_messages(char_id)
+                self._messages[char_id] = entries
+                for entry in entries:
+                    self._thread_chars[entry["parent_id"]] = char_id
+            else:
+                self._hits += 1
+            return [entry["message"] for entry in entries]
+
+    def events(self, char_id: int) -> List[StampedChatMessage]:
+        """Return the most recent events of a character."""
+        with self._lock:
+            entries = self._events.get(char_id)
+            if entries is None:
+                self._misses += 1
+                entries = _load_events(char_id)
+                self._events[char_id] = entries
+            else:
+                self._hits += 1
+            return [entry["message"] for entry in entries]
+
+    def posts(self, char_id: int | None = None) -> List[StampedChatMessage]:
+        """Return the most recent posts, optionally only those by one character."""
+        with self._lock:
+            entries = self._posts.get(char_id)
+            if entries is None:
+                self._misses += 1
+                entries = _load_posts(char_id)
+                self._posts[char_id] = entries
+            else:
+                self._hits += 1
+            return [entry["message"] for entry in entries]
+
+    def clear(self) -> None:
+        """Drop every loaded window."""
+        with self._lock:
+            self._messages.clear()
+            self._events.clear()
+            self._posts.clear()
+            self._thread_chars.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return how often logs were served from memory rather than the database."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "characters": len(self._messages.keys() | self._events.keys()),
+            }
+
+    def _on_message(self, action: str, values: Dict[str, Any]) -> None:
+        with self._lock:
+            thread_id = values.get("thread_id")
+            if thread_id in self._thread_chars:
+                char_id = self._thread_chars[thread_id]
+            else:
+                char_id = _find_entry(self._messages, values.get("id"))
+            if action != "insert":
+                # deletes and updates outside every loaded window can't change them
+                if char_id is not None:
+                    self._messages.pop(char_id, None)
+                return
+            if char_id is not None and char_id not in self._messages:
+                return
+            message = db.select_message_with_participants(values["id"])
+            self._thread_chars[message["thread_id"]] = message["char_id"]
+            if message["char_id"] in self._messages:
+                _append(
+                    self._messages[message["char_id"]],
+                    _message_entry(message),
+                    MAX_LOG_MESSAGES,
+                )
+
+    def _on_event(self, action: str, values: Dict[str, Any]) -> None:
+        with self._lock:
+            char_id = values.get("char_id")
+            if char_id is None:
+                char_id = _find_entry(self._events, values.get("id"))
+            if char_id is None or char_id not in self._events:
+                return
+            if action != "insert":
+                del self._events[char_id]
+                return
+            _append(
+                self._events[char_id],
+                _event_entry(cast(db.Event, values)),
+                MAX_LOG_EVENTS,
+            )
+
+    def _on_post(self, action: str, values: Dict[str, Any]) -> None:
+        with self._lock:
+            feeds = [None, values.get("char_id")]
+            if action != "insert":
+                for feed in feeds:
+                    self._posts.pop(feed, None)
+                return
+            entry = None
+            for feed in feeds:
+                if feed not in self._posts:
+                    continue
+                if entry is None:
+                    entry = _post_entry(cast(db.Post, values))
+                _append(self._posts[feed], entry, MAX_LOG_POSTS)
+
+    def _on_comment(self, _action: str, values: Dict[str, Any]) -> None:
+        # comments are serialized inside their post, so the post is re-serialized
+        with self._lock:
+            refreshed = None
+            for entries in self._posts.values():
+                for i, entry in enumerate(entries):
+                    if entry["id"] != values.get("post_id"):
+                        continue
+                    if refreshed is None:
+                        refreshed = _post_entry(db.select_post(entry["id"]))
+                    entries[i] = refreshed
+
+
+def _find_entry(windows: Dict[Any, List[ContextEntry]], entry_id: Any) -> Any:
+    """Return the key of the window holding an entry, if any."""
+    for key, entries in windows.items():
+        if any(entry["id"] == entry_id for entry in entries):
+            return key
+    return None
+
+
+def _append(entries: List[ContextEntry], entry: ContextEntry, limit: int) -> None:
+    """Insert an entry in timestamp order, keeping only the newest entries."""
+    insort(entries, entry, key=_entry_timestamp)
+    del entries[:-limit]
+
+
+CONTEXT_STORE = ContextStore()
+CONTEXT_STORE.register_hooks()
+
+
+def build_feed_snapshot(model: Model | None = None) -> FeedSnapshot:
+    """
+    Snapshot the global feed for a scheduler tick.
+    If a model is given, the token count of each post is taken (and cached by
+    the model) once here, rather than by each generation packing its context.
+    """
+    posts = CONTEXT_STORE.posts()
+    token_counts = []
+    if model is not None:
+        token_counts = [
+            model.message_token_count(cast(ChatMessage, post)) for post in posts
+        ]
+    return FeedSnapshot(posts=posts, token_counts=token_counts)
@@ -0,0 +1,116 @@
+"""
+Coordinates response cycles so each thread has at most one cycle in flight,
+running them on a bounded pool of workers.
+"""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import timedelta
+from typing import Callable, Dict, TypedDict
+
+from .model import Model
+from .response import response_cycle
+from .types import Priority
+
+ResponseCycle = Callable[..., None]
+
+
+class _Cycle(TypedDict):
+    """A response cycle that has been submitted for a thread."""
+
+    duration: timedelta | None
+    priority: Priority
+    cancelled: threading.Event
+
+
+class ResponseCoordinator:
+    """
+    Runs response cycles on a bounded executor, at most one per thread.
+    A cycle triggered while another is in flight for the same thread cancels
+    the in-flight cycle and waits for it to stop; if several are triggered in
+    the meantime only the latest is run.
+    """
+
+    def __init__(
+        self,
+        model: Model,
+        cycle: ResponseCycle = response_cycle,
+        max_workers: int = 4,
+    ) -> None:
+        self.model = model
+        self.cycle = cycle
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._running: Dict[int, _Cycle] = {}
+        self._pending: Dict[int, _Cycle] = {}
+        # reentrant, since a cycle finishing quickly runs its callback from _start
+        self._lock = threading.RLock()
+        self.stats: Dict[str, int] = {
+            "triggered": 0,
+            "started": 0,
+            "superseded": 0,
+            "failed": 0,
+        }
+
+    def trigger(self, thread_id: int, duration: timedelta | None = None) -> None:
+        """
+        Trigger a response cycle for a thread, superseding any in flight.
+        A cycle with a duration was asked for straight away, rather than
+        triggered by the user's message, and is generated at a lower priority.
+        """
+        priority = Priority.USER_REPLY if duration is None else Priority.RESPONSE_NOW
+        cycle = _Cycle(
+            duration=duration, priority=priority, cancelled=threading.Event()
+        )
+        with self._lock:
+            self.stats["triggered"] += 1
+            running = self._running.get(thread_id)
+            if running is None:
+                self._start(thread_id, cycle)
+                return
+            # the running cycle stops before submitting, then the latest one starts
+            if not running["cancelled"].is_set():
+                running["cancelled"].set()
+                self.stats["superseded"] += 1
+            if thread_id in self._pending:
+                self.stats["superseded"] += 1
+            self._pending[thread_id] = cycle
+
+    def in_flight(self) -> int:
+        """Return the number of threads with a cycle in flight."""
+        with self._lock:
+            return len(self._running)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Cancel every cycle and stop accepting new ones."""
+        with self._lock:
+            self._pending.clear()
+            for cycle in self._running.values():
+                cycle["cancelled"].set()
+        self._executor.shutdown(wait=wait)
+
+    def _start(self, thread_id: int, cycle: _Cycle) -> None:
+        """Submit a cycle to the executor. Must be called holding the lock."""
+        self._running[thread_id] = cycle
+        self.stats["started"] += 1
+        future = self._executor.submit(
+            self.cycle,
+            self.model,
+            thread_id,
+            cycle["duration"],
+            cancelled=cycle["cancelled"].is_set,
+            priority=cycle["priority"],
+        )
+        future.add_done_callback(lambda f: self._finished(thread_id, f))
+
+    def _finished(self, thread_id: int, future: Future) -> None:
+        with self._lock:
+            if future.exception() is not None:
+                self.stats["failed"] += 1
+                print(
+                    f"Response cycle for thread {thread_id} failed: "
+                    f"{future.exception()}"
+                )
+            del self._running[thread_id]
+            pending = self._pending.pop(thread_id, None)
+            if pending is not None:
+                self._start(thread_id, pending)
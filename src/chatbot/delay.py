@@ -0,0 +1,81 @@
+"""
+Policies deciding how long a character waits before sending its next message.
+"""
+
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import database as db
+
+DelayPolicy = Callable[[db.Thread], timedelta]
+
+# Number of recent messages of the character the estimate is drawn from
+HISTORY_MESSAGES = 200
+# Fewest replies needed before a narrower sample (thread, time of day) is used
+MIN_SAMPLES = 3
+# Used when the character has never replied
+DEFAULT_DELAY = timedelta(minutes=5)
+MIN_DELAY = timedelta(seconds=1)
+MAX_DELAY = timedelta(days=1)
+
+
+def historical_delay(thread: db.Thread, now: datetime | None = None) -> timedelta:
+    """
+    Estimate the response delay from how long the character took to reply before.
+    Samples one of its past reply delays, preferring replies in this thread and
+    replies made at the same time of day, when there are enough of them.
+    """
+    assert thread["char_id"]
+    now = now or datetime.now(timezone.utc)
+    messages = db.select_recent_messages_by_character(
+        thread["char_id"], HISTORY_MESSAGES, before=now
+    )
+    gaps = _reply_gaps([m for m in messages if m["thread_id"] == thread["id"]])
+    if len(gaps) < MIN_SAMPLES:
+        gaps = _reply_gaps(messages)
+    same_time = [gap for sent, gap in gaps if _time_of_day(sent) == _time_of_day(now)]
+    samples = same_time if len(same_time) >= MIN_SAMPLES else [gap for _, gap in gaps]
+    if not samples:
+        return DEFAULT_DELAY
+    delay = timedelta(seconds=random.choice(samples))
+    return min(max(delay, MIN_DELAY), MAX_DELAY)
+
+
+def _reply_gaps(
+    messages: Sequence[db.MessageWithParticipants],
+) -> List[Tuple[datetime, float]]:
+    """
+    Return when each user message that got a reply was sent,
+    and how many seconds the character took to reply.
+    """
+    threads: Dict[int, List[db.MessageWithParticipants]] = {}
+    for message in messages:
+        threads.setdefault(message["thread_id"], []).append(message)
+    gaps = []
+    for thread_messages in threads.values():
+        waiting = None
+        for message in sorted(thread_messages, key=lambda m: m["timestamp"]):
+            if message["role"] == "user":
+                # the reply is timed from the latest message sent before it
+                waiting = message["timestamp"]
+            elif waiting is not None:
+                gap = (message["timestamp"] - waiting).total_seconds()
+                gaps.append((waiting, gap))
+                waiting = None
+    return gaps
+
+
+def _time_of_day(timestamp: datetime) -> int:
+    """Bucket a time into night, morning, afternoon or evening."""
+    return timestamp.hour // 6
+
+
+DELAY_POLICIES: Dict[str, DelayPolicy] = {
+    "history": historical_delay,
+}
+
+
+def register_delay_policy(name: str, policy: DelayPolicy) -> None:
+    """Make a delay policy available to the response cycle under a name."""
+    DELAY_POLICIES[name] = policy
@@ -0,0 +1,162 @@
+"""Micro-batching dispatcher sitting in front of the text generation pipeline."""
+
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Tuple, TypedDict
+
+from .types import ChatMessage, GenerationProfile, Priority
+
+BatchGenerator = Callable[
+    [List[List[ChatMessage]], GenerationProfile], List[ChatMessage]
+]
+
+
+class _PendingChat(TypedDict):
+    """A chat waiting to be generated, along with the future for its result."""
+
+    chat: List[ChatMessage]
+    profile: GenerationProfile
+    priority: Priority
+    future: Future
+
+
+# queued as (priority, submission order, chat), so equal priorities are FIFO
+_QueueItem = Tuple[int, int, _PendingChat]
+
+
+class InferenceDispatcher:
+    """
+    Collects chats submitted from any thread for a short window and
+    generates them together in a single batched call.
+    All generation happens on the dispatcher's worker thread, so the
+    underlying pipeline is never used concurrently.
+    Chats are taken in priority order, and once a batch is split by profile,
+    groups of lower priority than a chat queued in the meantime are deferred
+    back to the queue, so background work never holds up users for long.
+    """
+
+    def __init__(
+        self,
+        generate_batch: BatchGenerator,
+        window: float = 0.05,
+        max_batch_size: int = 8,
+    ) -> None:
+        self.generate_batch = generate_batch
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.stats = {"requests": 0, "batches": 0, "deferred": 0}
+        self._queue: queue.PriorityQueue[_QueueItem] = queue.PriorityQueue()
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+        self._worker: threading.Thread | None = None
+
+    def submit(
+        self,
+        chat: List[ChatMessage],
+        profile: GenerationProfile,
+        priority: Priority = Priority.BACKGROUND,
+    ) -> "Future[ChatMessage]":
+        """
+        Queue a chat for generation, returning a future for the response.
+        """
+        future: Future = Future()
+        self._put(
+            _PendingChat(chat=chat, profile=profile, priority=priority, future=future)
+        )
+        self._ensure_worker()
+        return future
+
+    def generate(
+        self,
+        chat: List[ChatMessage],
+        profile: GenerationProfile,
+        priority: Priority = Priority.BACKGROUND,
+    ) -> ChatMessage:
+        """
+        Queue a chat for generation and block until the response is ready.
+        """
+        return self.submit(chat, profile, priority).result()
+
+    def _put(self, pending: _PendingChat, order: int | None = None) -> None:
+        if order is None:
+            order = next(self._order)
+        self._queue.put((pending["priority"], order, pending))
+
+    def depth(self) -> int:
+        """Return the number of chats waiting to be generated."""
+        return self._queue.qsize()
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, daemon=True)
+                self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect_batch()
+            groups = sorted(_group_by_profile(batch).values(), key=lambda g: g[0][0])
+            for i, group in enumerate(groups):
+                if i and self._preempted(group[0][0]):
+                    self._defer([item for rest in groups[i:] for item in rest])
+                    break
+                self._generate_group([pending for _, _, pending in group])
+
+    def _collect_batch(self) -> List[_QueueItem]:
+        """
+        Block for the most urgent pending chat, then gather any others that
+        arrive within the batching window.
+        """
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _preempted(self, priority: int) -> bool:
+        """Whether a more urgent chat than the priority is waiting."""
+        with self._queue.mutex:
+            return bool(self._queue.queue) and self._queue.queue[0][0] < priority
+
+    def _defer(self, items: List[_QueueItem]) -> None:
+        """Return chats to the queue, keeping their place in it."""
+        with self._lock:
+            self.stats["deferred"] += len(items)
+        for _, order, pending in items:
+            self._put(pending, order)
+
+    def _generate_group(self, group: List[_PendingChat]) -> None:
+        """Generate one batch and hand each result back to its caller."""
+        chats = [pending["chat"] for pending in group]
+        with self._lock:
+            self.stats["requests"] += len(group)
+            self.stats["batches"] += 1
+        try:
+            responses = self.generate_batch(chats, group[0]["profile"])
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            for pending in group:
+                pending["future"].set_exception(e)
+            return
+        for pending, response in zip(group, responses):
+            pending["future"].set_result(response)
+
+
+def _group_by_profile(batch: List[_QueueItem]) -> Dict[Tuple, List[_QueueItem]]:
+    """
+    Chats can only share a pipeline call if they share generation arguments.
+    Each group keeps the priority order of the batch.
+    """
+    groups: Dict[Tuple, List[_QueueItem]] = {}
+    for item in sorted(batch, key=lambda item: item[:2]):
+        key = tuple(sorted(item[2]["profile"].items()))
+        groups.setdefault(key, []).append(item)
+    return groups
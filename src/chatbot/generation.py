@@ -0,0 +1,249 @@
+"""Generation controls used by the Hugging Face pipeline."""
+
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Sequence
+
+import torch
+from transformers import LogitsProcessor, PreTrainedTokenizerBase, StoppingCriteria
+
+
+class JsonObjectScanner:
+    """
+    Incrementally scans generated text, tracking whether the first JSON object
+    in it has been closed. Text before the object is ignored.
+    """
+
+    def __init__(self) -> None:
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.closed = False
+
+    def feed(self, text: str) -> bool:
+        """Scan the next piece of text, returning True once the object has closed."""
+        for char in text:
+            if self.closed:
+                break
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == "{" or (char == "[" and self.depth):
+                self.depth += 1
+            elif char in "}]" and self.depth:
+                self.depth -= 1
+                self.closed = self.depth == 0
+            elif char == '"' and self.depth:
+                self.in_string = True
+        return self.closed
+
+
+class JsonObjectStoppingCriteria(StoppingCriteria):
+    """
+    Stops each sequence of a batch as soon as its JSON object closes.
+    Only the tokens generated since the previous step are decoded.
+    """
+
+    def __init__(self, tokenizer: PreTrainedTokenizerBase) -> None:
+        self.tokenizer = tokenizer
+        self._scanners: List[JsonObjectScanner] = []
+        self._scanned = 0
+
+    def __call__(
+        self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs: Any
+    ) -> torch.BoolTensor:
+        if not self._scanners:
+            self._scanners = [JsonObjectScanner() for _ in range(input_ids.shape[0])]
+            # the first call is made once the first new token has been generated
+            self._scanned = input_ids.shape[1] - 1
+        new_tokens = input_ids[:, self._scanned :].tolist()
+        self._scanned = input_ids.shape[1]
+        closed = [
+            scanner.feed(self.tokenizer.decode(tokens, skip_special_tokens=True))
+            for scanner, tokens in zip(self._scanners, new_tokens)
+        ]
+        return torch.tensor(closed, dtype=torch.bool, device=input_ids.device)
+
+
+def _object_schema(required: List[str], optional: Sequence[str] = ()) -> Dict[str, Any]:
+    """Build the schema of a flat object whose properties are all strings."""
+    properties = {name: {"type": "string"} for name in list(required) + list(optional)}
+    return {"type": "object", "properties": properties, "required": required}
+
+
+# JSON schemas the responses of each task must follow, keyed by task
+RESPONSE_SCHEMAS: Dict[str, Dict[str, Any]] = {
+    "chat": _object_schema(
+        ["message"], ["type", "time_message_was_sent", "sent_by", "sent_to"]
+    ),
+    "chat_timed": _object_schema(["delay", "message"]),
+    "comment_choice": {
+        "type": "object",
+        "properties": {"postID": {"type": "integer"}},
+        "required": ["postID"],
+    },
+    "comment_content": _object_schema(["comment"], ["commented_by"]),
+    "event": _object_schema(["type", "event"], ["time_event_occurred"]),
+    "photo": _object_schema(
+        ["image_description", "caption"], ["type", "time_post_was_made", "posted_by"]
+    ),
+    "text_post": _object_schema(["post"], ["type", "time_post_was_made", "posted_by"]),
+}
+
+
+class _SchemaState(NamedTuple):
+    """Position of a JSON schema validator within the text generated so far."""
+
+    mode: str
+    key: str = ""
+    used: FrozenSet[str] = frozenset()
+    value_type: str = ""
+
+
+_WHITESPACE = " \t\n\r"
+_ESCAPES = '"\\/bfnrtu'
+
+
+class JsonSchemaValidator:
+    """
+    Checks, one character at a time, that text is a valid prefix of a flat JSON
+    object following a schema: only listed properties, each at most once, with
+    string or integer values, closed only once every required property is set.
+    States are immutable, so candidate continuations can be tried cheaply.
+    """
+
+    def __init__(self, schema: Dict[str, Any]) -> None:
+        self.types = {name: prop["type"] for name, prop in schema["properties"].items()}
+        self.required = frozenset(schema.get("required", []))
+        self.initial = _SchemaState("start")
+
+    def feed(self, state: _SchemaState | None, text: str) -> _SchemaState | None:
+        """Advance a state over some text, returning None if the text is invalid."""
+        for char in text:
+            if state is None or state.mode == "done":
+                return state
+            state = self._advance(state, char)
+        return state
+
+    def _advance(  # pylint: disable=too-many-return-statements too-many-branches
+        self, state: _SchemaState, char: str
+    ) -> _SchemaState | None:
+        mode = state.mode
+        if mode == "string":
+            if char == "\\":
+                return state._replace(mode="escape")
+            if char == '"':
+                return state._replace(mode="after_value")
+            return state if char >= " " else None
+        if mode == "escape":
+            return state._replace(mode="string") if char in _ESCAPES else None
+        if mode == "key":
+            if char == '"':
+                if state.key in self.types and state.key not in state.used:
+                    return state._replace(mode="colon")
+                return None
+            key = state.key + char
+            unused = [name for name in self.types if name not in state.used]
+            if any(name.startswith(key) for name in unused):
+                return state._replace(key=key)
+            return None
+        if mode in ("integer", "sign"):
+            if char.isdigit():
+                return state._replace(mode="integer")
+            if mode == "sign":
+                return None
+            return self._advance(state._replace(mode="after_value"), char)
+        if char in _WHITESPACE:
+            return state
+        if mode == "start":
+            return _SchemaState("first_key") if char == "{" else None
+        if mode in ("first_key", "next_key") and char == '"':
+            return state._replace(mode="key", key="")
+        if mode in ("first_key", "after_value") and char == "}":
+            return _SchemaState("done") if self.required <= state.used else None
+        if mode == "after_value" and char == ",":
+            return state._replace(mode="next_key")
+        if mode == "colon" and char == ":":
+            used = state.used | {state.key}
+            return state._replace(
+                mode="value", used=used, value_type=self.types[state.key]
+            )
+        if mode == "value":
+            if state.value_type == "string" and char == '"':
+                return state._replace(mode="string")
+            if state.value_type == "integer" and char.isdigit():
+                return state._replace(mode="integer")
+            if state.value_type == "integer" and char == "-":
+                return state._replace(mode="sign")
+        return None
+
+
+class JsonSchemaLogitsProcessor(LogitsProcessor):
+    """
+    Constrains each sequence of a batch to a JSON schema. At each step the top-k
+    candidate tokens are checked against the validator and the invalid ones are
+    masked, so the most likely valid token is chosen instead. If none of the
+    top-k tokens are valid the step is left unconstrained.
+    Counts the sequences whose most likely token had to be replaced at least
+    once, each of which would otherwise have failed to parse.
+    """
+
+    def __init__(
+        self,
+        tokenizer: PreTrainedTokenizerBase,
+        schema: Dict[str, Any],
+        top_k: int = 20,
+    ) -> None:
+        self.tokenizer = tokenizer
+        self.validator = JsonSchemaValidator(schema)
+        self.top_k = top_k
+        self.special_ids = set(tokenizer.all_special_ids)
+        self._token_text: Dict[int, str] = {}
+        self._states: List[_SchemaState | None] = []
+        self._corrected: List[bool] = []
+
+    @property
+    def corrected(self) -> int:
+        """Number of sequences steered away from invalid output."""
+        return sum(self._corrected)
+
+    def __call__(
+        self, input_ids: torch.LongTensor, scores: torch.FloatTensor
+    ) -> torch.FloatTensor:
+        if not self._states:
+            self._states = [self.validator.initial] * input_ids.shape[0]
+            self._corrected = [False] * input_ids.shape[0]
+        else:
+            last_tokens = input_ids[:, -1].tolist()
+            self._states = [
+                self.validator.feed(state, self._text(token))
+                for state, token in zip(self._states, last_tokens)
+            ]
+        k = min(self.top_k, scores.shape[-1])
+        candidates = torch.topk(scores, k, dim=-1).indices.tolist()
+        for row, state in enumerate(self._states):
+            if state is None or state.mode == "done":
+                continue
+            valid = [token for token in candidates[row] if self._allowed(state, token)]
+            if not valid:
+                continue
+            if valid[0] != candidates[row][0]:
+                self._corrected[row] = True
+            mask = torch.full_like(scores[row], float("-inf"))
+            mask[valid] = 0
+            scores[row] = scores[row] + mask
+        return scores
+
+    def _allowed(self, state: _SchemaState, token: int) -> bool:
+        text = self._text(token)
+        if token in self.special_ids or not text:
+            # generation can't end before the object is complete
+            return False
+        return self.validator.feed(state, text) is not None
+
+    def _text(self, token: int) -> str:
+        if token not in self._token_text:
+            self._token_text[token] = self.tokenizer.decode([token])
+        return self._token_text[token]
@@ -0,0 +1,186 @@
+"""
+Tracks image generation jobs submitted to Civitai, polling every outstanding job
+from one background thread so callers never wait for an image to be generated.
+"""
+
+import io
+import threading
+import time
+from typing import Any, Callable, Dict, List, Protocol, TypedDict
+
+import civitai
+import requests
+from google.cloud import storage
+
+import database as db
+
+from .types import ImageGenerationFailedException
+
+
+class ImageJob(TypedDict):
+    """Represents an image generation job waiting on Civitai."""
+
+    post_id: int
+    token: str
+    char_name: str
+    attempts: int
+    next_poll: float
+
+
+class ImageClient(Protocol):
+    """Interface to the image generation API."""
+
+    def create(self, civitai_input: Dict[str, Any]) -> Dict[str, Any]:
+        """Submit an image generation job, returning its token."""
+
+    def get(self, token: str) -> Dict[str, Any]:
+        """Return the status of the jobs submitted under a token."""
+
+
+class CivitaiClient:
+    """Image client backed by the Civitai SDK."""
+
+    def create(self, civitai_input: Dict[str, Any]) -> Dict[str, Any]:
+        """Submit an image generation job, returning its token."""
+        return civitai.image.create(civitai_input)
+
+    def get(self, token: str) -> Dict[str, Any]:
+        """Return the status of the jobs submitted under a token."""
+        return civitai.jobs.get(token=token)
+
+
+def _upload_image_to_gcs(image_stream: io.BytesIO, destination_blob_name: str) -> None:
+    """Uploads an image to a GCS bucket."""
+    storage_client = storage.Client()
+    bucket = storage_client.bucket("echoesai-public-images")
+    blob = bucket.blob(destination_blob_name)
+    blob.upload_from_file(image_stream, rewind=True)
+
+
+class ImageJobTracker:
+    """
+    Records submitted image jobs and polls them all from one background thread.
+    Each job is polled with exponential backoff; when its image is available it
+    is uploaded to GCS and the post is updated with the image path.
+    """
+
+    def __init__(
+        self,
+        client: ImageClient | None = None,
+        upload: Callable[[io.BytesIO, str], None] | None = None,
+        base_delay: float = 15,
+        max_delay: float = 120,
+        max_attempts: int = 30,
+    ) -> None:
+        self.client = client or CivitaiClient()
+        self.upload = upload
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self._jobs: List[ImageJob] = []
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self.stats: Dict[str, int] = {"submitted": 0, "completed": 0, "failed": 0}
+
+    def submit(
+        self, civitai_input: Dict[str, Any], post_id: int, char_name: str
+    ) -> str:
+        """Submit an image generation job for a post and start tracking it."""
+        response = self.client.create(civitai_input)
+        self.track(post_id, response["token"], char_name)
+        return response["token"]
+
+    def track(self, post_id: int, token: str, char_name: str) -> None:
+        """Start polling a job that has already been submitted."""
+        job = ImageJob(
+            post_id=post_id,
+            token=token,
+            char_name=char_name,
+            attempts=0,
+            next_poll=time.monotonic() + self.base_delay,
+        )
+        with self._cond:
+            self._jobs.append(job)
+            self.stats["submitted"] += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def outstanding(self) -> List[ImageJob]:
+        """Return the jobs still waiting on an image."""
+        with self._cond:
+            return list(self._jobs)
+
+    def join(self, timeout: float | None = None) -> bool:
+        """Wait until every job has finished, returning False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._jobs, timeout=timeout)
+
+    def poll(self, now: float | None = None) -> None:
+        """Poll every job that is due, finishing those whose image is available."""
+        now = time.monotonic() if now is None else now
+        with self._cond:
+            due = [job for job in self._jobs if job["next_poll"] <= now]
+        for job in due:
+            finished = self._poll_job(job)
+            with self._cond:
+                if finished:
+                    self._jobs.remove(job)
+                else:
+                    job["attempts"] += 1
+                    delay = min(self.base_delay * 2 ** job["attempts"], self.max_delay)
+                    job["next_poll"] = now + delay
+                self._cond.notify_all()
+
+    def _poll_job(self, job: ImageJob) -> bool:
+        """Check on a single job, returning True once it needs no more polling."""
+        try:
+            return self._check_job(job)
+        except ImageGenerationFailedException as e:
+            error: Exception = e
+        except (requests.exceptions.RequestException, IOError) as e:
+            # download and upload errors are retried until the job runs out of attempts
+            if job["attempts"] + 1 < self.max_attempts:
+                return False
+            error = e
+        print(f"Image for post {job['post_id']} failed: {error}")
+        with self._cond:
+            self.stats["failed"] += 1
+        return True
+
+    def _check_job(self, job: ImageJob) -> bool:
+        response = self.client.get(job["token"])
+        result = response["jobs"][0]["result"]
+        # if image is available, download it
+        if result["available"]:
+            image_r = requests.get(result["blobUrl"], stream=True, timeout=5)
+            image_r.raise_for_status()  # Raise an HTTPError for bad resposne
+            destination_blob_name = f"{job['char_name']}/posts/{job['post_id']}.jpg"
+            upload = self.upload or _upload_image_to_gcs
+            upload(io.BytesIO(image_r.content), destination_blob_name)
+            db.posts.update_post_with_image_path(job["post_id"], destination_blob_name)
+            with self._cond:
+                self.stats["completed"] += 1
+            return True
+        # if image is not available and not scheduled, raise an exception
+        if not response["jobs"][0]["scheduled"]:
+            raise ImageGenerationFailedException(
+                "Image generation failed on Civitai's side."
+            )
+        # if image is not available but scheduled, give up after too many attempts
+        if job["attempts"] + 1 >= self.max_attempts:
+            raise ImageGenerationFailedException("Image generation timed out.")
+        return False
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._jobs)
+                wait = min(job["next_poll"] for job in self._jobs) - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(timeout=wait)
+            self.poll()
+
+
+IMAGE_JOBS = ImageJobTracker()
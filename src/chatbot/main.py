@@ -1,31 +1,75 @@
 """Utility functions for the chatbot package."""
 
+import os
 import re
+import threading
+from bisect import bisect_left
 from datetime import timedelta
-from typing import List, cast
+from typing import Any, Dict, List, Sequence, Tuple, cast
 
 from jinja2 import Template
 
 import database as db
 
+from .cache import LRUCache
 from .model import Model
-from .types import MAX_NEW_TOKENS, ChatMessage
+from .types import (
+    DEFAULT_PROFILE,
+    GENERATION_PROFILES,
+    MAX_TOKENS,
+    ChatMessage,
+    Priority,
+)
+
+TEMPLATE_DIR = "templates"
+# template path -> (mtime, compiled template)
+_TEMPLATES: Dict[str, Tuple[float, Template]] = {}
+_TEMPLATES_LOCK = threading.Lock()
+# rendered templates may themselves contain template syntax (e.g. a
+# description referencing {{char}}), so intermediate renders are compiled too
+_COMPILED: LRUCache[Template] = LRUCache(256)
+_RENDERED: LRUCache[str] = LRUCache(1024)
 
 
 def _generate_text(
     model: Model,
     system_message: ChatMessage,
     chat: List[ChatMessage],
+    task: str | None = None,
+    priority: Priority = Priority.BACKGROUND,
 ) -> ChatMessage:
     """
-    Generate a response from the chatbot.
+    Generate a response from the chatbot, with the model the task is routed to,
+    using the generation profile of the task if it has one.
+    Generation is queued at the priority, background by default.
     """
+    profile = GENERATION_PROFILES.get(task or "", DEFAULT_PROFILE)
     response = model.generate_response(
-        [system_message] + chat, max_new_tokens=MAX_NEW_TOKENS
+        [system_message] + chat, profile=profile, task=task, priority=priority
     )
     return cast(ChatMessage, response)
 
 
+def _pack_context(
+    model: Model,
+    chatlog: List[ChatMessage],
+    reserved: Sequence[ChatMessage] = (),
+) -> List[ChatMessage]:
+    """
+    Truncate a chronologically sorted chatlog to the most recent messages that fit
+    in MAX_TOKENS, leaving room for the reserved messages (the system message and
+    any trailing instructions) that will be sent alongside it.
+    """
+    budget = MAX_TOKENS - model.token_count(list(reserved))
+    # negated suffix sums: -suffix[i] is minus the token count of chatlog[i:],
+    # which is non-decreasing so the cut point can be binary searched
+    suffix = [0] * (len(chatlog) + 1)
+    for i in range(len(chatlog) - 1, -1, -1):
+        suffix[i] = suffix[i + 1] - model.message_token_count(chatlog[i])
+    cut = bisect_left(suffix, -budget)
+    return chatlog[cut:]
+
+
 def _get_system_message(
     system_type: str,
     data: db.Character | db.Thread,
@@ -34,9 +78,6 @@ def _get_system_message(
     """
     Change the system message between several preconfigured options.
     """
-    with open(f"templates/{system_type}.txt", "r", encoding="utf-8") as file:
-        template_content = file.read()
-
     if "started" in data:  # Is a thread.
         # TypedDicts apparently don't support type checking.
         # Almost makes you wonder wtf the point of them is.
@@ -67,15 +108,47 @@ def _get_system_message(
         context["user"] = user["username"]
         # TODO: Phase-specific messages
 
-    # Render the template until no more changes are detected
+    mtime, template = _load_template(system_type)
+    key = (system_type, mtime, tuple(sorted(context.items())))
+    content = _RENDERED.get(key)
+    if content is None:
+        content = _render_until_stable(template, context)
+        _RENDERED.put(key, content)
+    return ChatMessage(role="system", content=content)
+
+
+def _load_template(system_type: str) -> Tuple[float, Template]:
+    """
+    Return the compiled template for a system type,
+    only reading it from disk again if the file has been modified.
+    """
+    path = os.path.join(TEMPLATE_DIR, f"{system_type}.txt")
+    mtime = os.stat(path).st_mtime
+    with _TEMPLATES_LOCK:
+        cached = _TEMPLATES.get(path)
+        if cached and cached[0] == mtime:
+            return cached
+    with open(path, "r", encoding="utf-8") as file:
+        template = Template(file.read())
+    with _TEMPLATES_LOCK:
+        _TEMPLATES[path] = (mtime, template)
+    return mtime, template
+
+
+def _render_until_stable(template: Template, context: Dict[str, Any]) -> str:
+    """
+    Render the template until no more changes are detected.
+    """
     previous_content = None
-    current_content = template_content
+    current_content = template.render(context)
     while previous_content != current_content:
         previous_content = current_content
-        template = Template(current_content)
-        current_content = template.render(context)
-
-    return ChatMessage(role="system", content=current_content)
+        compiled = _COMPILED.get(current_content)
+        if compiled is None:
+            compiled = Template(current_content)
+            _COMPILED.put(current_content, compiled)
+        current_content = compiled.render(context)
+    return current_content
 
 
 def _parse_time(time: str) -> timedelta:
@@ -1,13 +1,49 @@
 """Module for Hugging face pipeline for text generation."""
 
+import hashlib
+import json
 import os
+import threading
 import time
-from typing import List, Protocol, Tuple
+from collections import deque
+from functools import partial
+from multiprocessing.connection import Client, Connection
+from typing import Any, Dict, List, Protocol, Tuple
 
 import torch
-from transformers import AutoTokenizer, Pipeline, pipeline
+from transformers import (
+    AutoTokenizer,
+    DynamicCache,
+    LogitsProcessorList,
+    Pipeline,
+    StoppingCriteriaList,
+    pipeline,
+)
 
-from .types import ChatMessage
+from .cache import LRUCache
+from .dispatcher import InferenceDispatcher
+from .generation import (
+    RESPONSE_SCHEMAS,
+    JsonObjectStoppingCriteria,
+    JsonSchemaLogitsProcessor,
+)
+from .prefix_cache import PrefixCache
+from .types import ChatMessage, GenerationProfile, Priority
+
+# host and port, or the path of a unix socket
+Address = Tuple[str, int] | str
+
+DEFAULT_MODEL = "meta-llama/Llama-3.2-3B-Instruct"
+# Address of an inference worker (see server.py) to generate with, if any
+INFERENCE_SERVER = os.getenv("INFERENCE_SERVER")
+INFERENCE_AUTHKEY = os.getenv("INFERENCE_AUTHKEY", "echoes-inference").encode()
+# Where the model runs when it's loaded in this process, "cuda" or "cpu"
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "cuda")
+# Weight quantization of the cpu backend, "int8" or "none"
+MODEL_QUANTIZATION = os.getenv("MODEL_QUANTIZATION", "int8")
+# Tasks sent to other models than the main one,
+# e.g. "time,comment_choice=meta-llama/Llama-3.2-1B-Instruct;sd-prompt=..."
+MODEL_ROUTES = os.getenv("MODEL_ROUTES", "")
 
 
 class ModelInterface(Protocol):
@@ -22,30 +58,211 @@ class ModelInterface(Protocol):
         Generate a new message based on the chat history.
         """
 
+    def generate_responses(
+        self,
+        chats: List[List[ChatMessage]],
+        max_new_tokens: int = 512,
+        stop_on_json: bool = False,
+        schema: str | None = None,
+    ) -> List[ChatMessage]:
+        """
+        Generate a new message for each chat history in a single batch.
+        If stop_on_json is set, each message ends once its JSON object closes.
+        If a schema is named, each message is constrained to it.
+        """
+
 
 class Model:
     """
     Class to manage the model instance.
     """
 
-    def __init__(self, model: ModelInterface) -> None:
+    def __init__(
+        self,
+        model: ModelInterface,
+        batch_window: float = 0.05,
+        max_batch_size: int = 8,
+        token_cache_size: int = 50000,
+        routes: Dict[str, ModelInterface] | None = None,
+    ) -> None:
         self.model = model
         self.tokenizer = AutoTokenizer.from_pretrained(self.model.model_name)
         self.mocked = isinstance(model, ModelMocked)
+        self.token_cache: LRUCache[int] = LRUCache(token_cache_size)
+        self.router = ModelRouter(model, routes)
+        # one dispatcher per model, so models generate independently of each other
+        self._dispatchers = {
+            id(m): InferenceDispatcher(
+                partial(self._generate_batch, m), batch_window, max_batch_size
+            )
+            for m in self.router.models()
+        }
+        self.dispatcher = self._dispatchers[id(model)]
 
     def generate_response(
-        self, chat: List[ChatMessage], max_new_tokens: int = 512
+        self,
+        chat: List[ChatMessage],
+        max_new_tokens: int = 512,
+        profile: GenerationProfile | None = None,
+        task: str | None = None,
+        priority: Priority = Priority.BACKGROUND,
     ) -> ChatMessage:
         """
         Generate a new message based on the chat history.
+        The profile, if given, replaces max_new_tokens.
+        The task decides which model generates the message.
+        Concurrent calls are batched together by the dispatcher,
+        more urgent priorities first.
         """
-        return self.model.generate_response(chat, max_new_tokens)
+        if profile is None:
+            profile = GenerationProfile(
+                max_new_tokens=max_new_tokens, stop_on_json=False, schema=None
+            )
+        dispatcher = self._dispatchers[id(self.router.model_for(task))]
+        start = time.perf_counter()
+        try:
+            response = dispatcher.generate(chat, profile, priority)
+        except Exception:
+            self.router.record(task, time.perf_counter() - start, failed=True)
+            raise
+        self.router.record(task, time.perf_counter() - start)
+        return response
+
+    def queue_depth(self) -> int:
+        """
+        Return the number of chats waiting to be generated, across every model.
+        """
+        return sum(dispatcher.depth() for dispatcher in self._dispatchers.values())
+
+    def _generate_batch(
+        self,
+        model: ModelInterface,
+        chats: List[List[ChatMessage]],
+        profile: GenerationProfile,
+    ) -> List[ChatMessage]:
+        return model.generate_responses(
+            chats,
+            max_new_tokens=profile["max_new_tokens"],
+            stop_on_json=profile["stop_on_json"],
+            schema=profile["schema"],
+        )
 
     def token_count(self, chat: List[ChatMessage]) -> int:
         """
         Return the number of tokens of a chat.
         """
-        return sum(len(self.tokenizer.encode(m["content"])) for m in chat)
+        return sum(self.message_token_count(m) for m in chat)
+
+    def message_token_count(self, message: ChatMessage) -> int:
+        """
+        Return the number of tokens of a single message.
+        """
+        return self.text_token_count(message["content"])
+
+    def text_token_count(self, text: str) -> int:
+        """
+        Return the number of tokens of a text.
+        Counts are cached by content hash so each text is only tokenized once.
+        """
+        key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        count = self.token_cache.get(key)
+        if count is None:
+            count = len(self.tokenizer.encode(text))
+            self.token_cache.put(key, count)
+        return count
+
+
+class ModelRouter:
+    """
+    Maps tasks to the models generating them, so cheap tasks can be sent to
+    small models. Tasks without a route of their own go to the default model.
+    Keeps latency metrics for each route, from submission to response,
+    over its most recent requests.
+    """
+
+    def __init__(
+        self,
+        default: ModelInterface,
+        routes: Dict[str, ModelInterface] | None = None,
+        window: int = 1000,
+        recent: int = 20,
+    ) -> None:
+        self.default = default
+        self.routes = dict(routes or {})
+        self.window = window
+        self._latencies: Dict[str, deque[float]] = {}
+        # latest requests of any route
+        self._recent: deque[float] = deque(maxlen=recent)
+        self._failures: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def route(self, task: str | None) -> str:
+        """Name of the route a task takes."""
+        return task if task in self.routes else "default"
+
+    def model_for(self, task: str | None) -> ModelInterface:
+        """Model generating a task."""
+        return self.routes.get(task or "", self.default)
+
+    def models(self) -> List[ModelInterface]:
+        """Every model routed to, the default first."""
+        models = [self.default]
+        for model in self.routes.values():
+            if all(model is not m for m in models):
+                models.append(model)
+        return models
+
+    def record(self, task: str | None, seconds: float, failed: bool = False) -> None:
+        """Record the latency of a request for a task."""
+        route = self.route(task)
+        with self._lock:
+            if route not in self._latencies:
+                self._latencies[route] = deque(maxlen=self.window)
+                self._failures[route] = 0
+            self._latencies[route].append(seconds)
+            self._recent.append(seconds)
+            self._failures[route] += failed
+
+    def recent_latency(self) -> float | None:
+        """Mean latency of the latest requests of any route, if there were any."""
+        with self._lock:
+            if not self._recent:
+                return None
+            return sum(self._recent) / len(self._recent)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return the latency metrics of each route that has been used."""
+        stats = {}
+        with self._lock:
+            for route, latencies in self._latencies.items():
+                ordered = sorted(latencies)
+                stats[route] = {
+                    "model": self.model_for(route).model_name,
+                    "requests": len(ordered),
+                    "failures": self._failures[route],
+                    "mean": sum(ordered) / len(ordered),
+                    "p50": ordered[len(ordered) // 2],
+                    "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                    "max": ordered[-1],
+                }
+        return stats
+
+
+def parse_routes(spec: str) -> Dict[str, str]:
+    """
+    Parse routes of the form "task,task=model_name;task=model_name"
+    into the model name of each task.
+    """
+    routes = {}
+    for entry in spec.split(";"):
+        if not entry.strip():
+            continue
+        tasks, _, model_name = entry.partition("=")
+        if not model_name.strip():
+            raise ValueError(f"Route has no model: {entry}")
+        for task in tasks.split(","):
+            routes[task.strip()] = model_name.strip()
+    return routes
 
 
 class ModelActual(ModelInterface):
@@ -53,9 +270,16 @@ class ModelActual(ModelInterface):
     Class to manage the Hugging Face pipeline for text generation.
     """
 
-    def __init__(self, model_name: str) -> None:
+    def __init__(self, model_name: str, prefix_cache_bytes: int = 2**30) -> None:
         self.model_name = model_name
         self.pipe, self.max_tokens = self._load_model()
+        # key/values of recent prompt prefixes, reused by unbatched generations
+        self.prefix_cache = (
+            PrefixCache(prefix_cache_bytes) if prefix_cache_bytes else None
+        )
+        # responses constrained to a schema, and how many of those were steered
+        # away from output that would have failed to parse and been retried
+        self.constraint_stats = {"constrained": 0, "retries_avoided": 0}
 
     def _load_model(self) -> Tuple[Pipeline, int]:
         """
@@ -74,6 +298,9 @@ class ModelActual(ModelInterface):
             torch_dtype=torch.float16,
             device_map="auto",
         )
+        # batched generation needs left padding, llama has no pad token
+        pipe.tokenizer.pad_token = pipe.tokenizer.eos_token
+        pipe.tokenizer.padding_side = "left"
         max_tokens = pipe.model.config.max_position_embeddings
         return pipe, max_tokens
 
@@ -83,10 +310,171 @@ class ModelActual(ModelInterface):
         """
         Generate a new message based on the chat history.
         """
-        if chat[-1]["role"] == "assistant":
-            raise ValueError("Most recent message in chat is from assistant.")
-        response = self.pipe(chat, max_new_tokens=max_new_tokens)
-        return response[0]["generated_text"][-1]
+        return self.generate_responses([chat], max_new_tokens)[0]
+
+    def generate_responses(
+        self,
+        chats: List[List[ChatMessage]],
+        max_new_tokens: int = 256,
+        stop_on_json: bool = False,
+        schema: str | None = None,
+    ) -> List[ChatMessage]:
+        """
+        Generate a new message for each chat history in a single batch.
+        If stop_on_json is set, each message ends once its JSON object closes.
+        If a schema is named, each message is constrained to it.
+        """
+        for chat in chats:
+            if chat[-1]["role"] == "assistant":
+                raise ValueError("Most recent message in chat is from assistant.")
+        kwargs: Dict[str, Any] = {}
+        if stop_on_json:
+            kwargs["stopping_criteria"] = StoppingCriteriaList(
+                [JsonObjectStoppingCriteria(self.pipe.tokenizer)]
+            )
+        processor = None
+        if schema is not None:
+            processor = JsonSchemaLogitsProcessor(
+                self.pipe.tokenizer, RESPONSE_SCHEMAS[schema]
+            )
+            kwargs["logits_processor"] = LogitsProcessorList([processor])
+        if len(chats) == 1 and self.prefix_cache is not None:
+            messages = [
+                self._generate_with_prefix_cache(chats[0], max_new_tokens, kwargs)
+            ]
+        else:
+            responses = self.pipe(
+                chats, max_new_tokens=max_new_tokens, batch_size=len(chats), **kwargs
+            )
+            messages = [response[0]["generated_text"][-1] for response in responses]
+        if processor is not None:
+            self.constraint_stats["constrained"] += len(chats)
+            self.constraint_stats["retries_avoided"] += processor.corrected
+        return messages
+
+    def _generate_with_prefix_cache(
+        self, chat: List[ChatMessage], max_new_tokens: int, kwargs: Dict[str, Any]
+    ) -> ChatMessage:
+        """
+        Generate a single response, resuming from the longest cached prefix of
+        the prompt. The prefixes ending with the system message and with the
+        whole prompt are cached for later calls.
+        """
+        assert self.prefix_cache is not None
+        tokenizer = self.pipe.tokenizer
+        model = self.pipe.model
+        input_ids = tokenizer.apply_chat_template(
+            chat, add_generation_prompt=True, return_tensors="pt"
+        ).to(model.device)
+        token_ids = input_ids[0].tolist()
+        _, past_key_values = self.prefix_cache.lookup(token_ids)
+        if past_key_values is None:
+            past_key_values = DynamicCache()
+        output = model.generate(
+            input_ids,
+            attention_mask=torch.ones_like(input_ids),
+            past_key_values=past_key_values,
+            max_new_tokens=max_new_tokens,
+            pad_token_id=tokenizer.pad_token_id,
+            **kwargs,
+        )
+        prefix_lengths = [len(token_ids)]
+        if chat[0]["role"] == "system":
+            prefix_lengths.append(len(tokenizer.apply_chat_template(chat[:1])))
+        self.prefix_cache.store(token_ids, past_key_values, prefix_lengths)
+        content = tokenizer.decode(
+            output[0, input_ids.shape[1] :], skip_special_tokens=True
+        )
+        return ChatMessage(role="assistant", content=content)
+
+
+class ModelCPU(ModelActual):
+    """
+    Runs the model on the CPU, with the weights of its linear layers
+    quantized to int8 unless quantization is "none".
+    Uses one thread per available core unless told otherwise,
+    and keeps track of the generation speed in tokens/sec.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        quantization: str = "int8",
+        threads: int | None = None,
+        prefix_cache_bytes: int = 2**30,
+    ) -> None:
+        if quantization not in ("int8", "none"):
+            raise ValueError(f"Unsupported quantization: {quantization}")
+        self.quantization = quantization
+        self.threads = threads or available_cores()
+        self.generation_stats = {"tokens": 0, "seconds": 0.0}
+        super().__init__(model_name, prefix_cache_bytes)
+
+    def _load_model(self) -> Tuple[Pipeline, int]:
+        """
+        Load the model.
+        """
+        torch.set_num_threads(self.threads)
+        pipe = pipeline(
+            "text-generation",
+            model=self.model_name,
+            torch_dtype=torch.float32,
+            device="cpu",
+        )
+        if self.quantization == "int8":
+            pipe.model = quantize_int8(pipe.model)
+        # batched generation needs left padding, llama has no pad token
+        pipe.tokenizer.pad_token = pipe.tokenizer.eos_token
+        pipe.tokenizer.padding_side = "left"
+        max_tokens = pipe.model.config.max_position_embeddings
+        return pipe, max_tokens
+
+    def generate_responses(
+        self,
+        chats: List[List[ChatMessage]],
+        max_new_tokens: int = 256,
+        stop_on_json: bool = False,
+        schema: str | None = None,
+    ) -> List[ChatMessage]:
+        """
+        Generate a new message for each chat history in a single batch,
+        recording how many tokens were generated and how long it took.
+        """
+        start = time.perf_counter()
+        responses = super().generate_responses(
+            chats, max_new_tokens, stop_on_json, schema
+        )
+        seconds = time.perf_counter() - start
+        tokens = sum(
+            len(self.pipe.tokenizer.encode(r["content"], add_special_tokens=False))
+            for r in responses
+        )
+        self.generation_stats["tokens"] += tokens
+        self.generation_stats["seconds"] += seconds
+        print(f"Generated {tokens} tokens at {tokens / seconds:.1f} tokens/sec")
+        return responses
+
+    def tokens_per_second(self) -> float:
+        """Average generation speed so far."""
+        seconds = self.generation_stats["seconds"]
+        return self.generation_stats["tokens"] / seconds if seconds else 0.0
+
+
+def quantize_int8(model: torch.nn.Module) -> torch.nn.Module:
+    """
+    Dynamically quantize the weights of a model's linear layers to int8,
+    for faster CPU inference with a quarter of the memory.
+    """
+    return torch.ao.quantization.quantize_dynamic(
+        model, {torch.nn.Linear}, dtype=torch.qint8
+    )
+
+
+def available_cores() -> int:
+    """Number of CPU cores this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
 
 
 class ModelMocked(ModelInterface):
@@ -118,6 +506,12 @@ class ModelMocked(ModelInterface):
                 return {"content": "1s", "role": "assistant"}
             return {"content": "10s", "role": "assistant"}
 
+        # combined time and message behavior
+        if "First decide how long it will take" in chat[0]["content"]:
+            delay = "1s" if self.time_to_respond == "short" else "10s"
+            content = json.dumps({"delay": delay, "message": "Mock response"})
+            return {"content": content, "role": "assistant"}
+
         # event behavior
         if "short description of what you're currently doing" in chat[0]["content"]:
             return {"content": "Mock event", "role": "assistant"}
@@ -141,11 +535,148 @@ class ModelMocked(ModelInterface):
         # chat message behavior
         return {"content": "Mock response", "role": "assistant"}
 
+    def generate_responses(
+        self,
+        chats: List[List[ChatMessage]],
+        max_new_tokens: int = 512,
+        stop_on_json: bool = False,
+        schema: str | None = None,
+    ) -> List[ChatMessage]:
+        """
+        Mocked generate_responses method.
+        """
+        return [self.generate_response(chat, max_new_tokens) for chat in chats]
+
+
+class ModelRemote(ModelInterface):
+    """
+    Client for a model served by an inference worker process (see server.py).
+    Generation happens in the worker, so it doesn't hold this process's GIL,
+    and one loaded model can be shared by several web workers.
+    """
+
+    def __init__(
+        self, model_name: str, address: str, authkey: bytes = INFERENCE_AUTHKEY
+    ) -> None:
+        self.model_name = model_name
+        self.address = parse_address(address)
+        self.authkey = authkey
+        self.pipe = None
+        self._conn: Connection | None = None
+        # a connection carries one request at a time
+        self._lock = threading.Lock()
+
+    @property
+    def max_tokens(self) -> int:
+        """Context length of the served model."""
+        return self._request({"op": "info"})["max_tokens"]
+
+    def generate_response(
+        self, chat: List[ChatMessage], max_new_tokens: int = 512
+    ) -> ChatMessage:
+        """
+        Generate a new message based on the chat history.
+        """
+        return self.generate_responses([chat], max_new_tokens)[0]
+
+    def generate_responses(
+        self,
+        chats: List[List[ChatMessage]],
+        max_new_tokens: int = 512,
+        stop_on_json: bool = False,
+        schema: str | None = None,
+    ) -> List[ChatMessage]:
+        """
+        Generate a new message for each chat history in a single batch.
+        If stop_on_json is set, each message ends once its JSON object closes.
+        If a schema is named, each message is constrained to it.
+        """
+        return self._request(
+            {
+                "op": "generate",
+                "chats": chats,
+                "max_new_tokens": max_new_tokens,
+                "stop_on_json": stop_on_json,
+                "schema": schema,
+            }
+        )
+
+    def close(self) -> None:
+        """Close the connection to the worker."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _request(self, request: Dict[str, Any]) -> Any:
+        """
+        Send a request to the worker and return its result.
+        Reconnects once if the connection was lost, e.g. by a worker restart.
+        """
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._conn is None:
+                        self._conn = Client(self.address, authkey=self.authkey)
+                    self._conn.send(request)
+                    response = self._conn.recv()
+                    break
+                except (EOFError, OSError):
+                    if self._conn is not None:
+                        self._conn.close()
+                        self._conn = None
+                    if attempt:
+                        raise
+        if "error" in response:
+            raise RuntimeError(f"Inference worker error: {response['error']}")
+        return response["result"]
+
+
+def parse_address(address: str) -> Address:
+    """
+    Parse an inference worker address,
+    either host:port or the path of a unix socket.
+    """
+    host, _, port = address.rpartition(":")
+    if host and port.isdigit():
+        return (host, int(port))
+    return address
+
 
 def new_model(
-    model_name: str = "meta-llama/Llama-3.2-3B-Instruct", mocked: bool = False
+    model_name: str = DEFAULT_MODEL,
+    mocked: bool = False,
+    server_address: str | None = INFERENCE_SERVER,
+    backend: str = MODEL_BACKEND,
+    routes: str = MODEL_ROUTES,
 ) -> Model:
-    """Create a new model instance."""
+    """
+    Create a new model instance.
+    If a server address is given, generation is delegated to that inference worker.
+    Tasks are routed to the models named by the routes (see parse_routes),
+    which are loaded in this process, each model once.
+    """
+    if server_address is not None:
+        model = ModelRemote(model_name, server_address)
+    else:
+        model = new_model_interface(model_name, mocked, backend)
+    loaded: Dict[str, ModelInterface] = {model_name: model}
+    routed = {}
+    for task, routed_name in parse_routes(routes).items():
+        if routed_name not in loaded:
+            loaded[routed_name] = new_model_interface(routed_name, mocked, backend)
+        routed[task] = loaded[routed_name]
+    return Model(model, routes=routed)
+
+
+def new_model_interface(
+    model_name: str = DEFAULT_MODEL, mocked: bool = False, backend: str = MODEL_BACKEND
+) -> ModelInterface:
+    """Load a model in this process on the backend, "cuda" or "cpu"."""
     if mocked:
-        return Model(ModelMocked(model_name, "short"))
-    return Model(ModelActual(model_name))
+        return ModelMocked(model_name, "short")
+    if backend == "cpu":
+        return ModelCPU(model_name, MODEL_QUANTIZATION)
+    if backend != "cuda":
+        raise ValueError(f"Unknown model backend: {backend}")
+    return ModelActual(model_name)
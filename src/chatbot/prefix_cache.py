@@ -0,0 +1,130 @@
+"""
+Cache of attention key/values for recently generated prompt prefixes, so
+generation can resume from the longest cached prefix instead of prefilling
+the whole prompt again.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Sequence, Tuple
+
+from transformers import DynamicCache
+
+
+def _slice_cache(cache: DynamicCache, length: int) -> DynamicCache:
+    """Copy the key/values of the first length tokens of a cache."""
+    return DynamicCache.from_legacy_cache(
+        tuple(
+            (keys[..., :length, :].clone(), values[..., :length, :].clone())
+            for keys, values in zip(cache.key_cache, cache.value_cache)
+        )
+    )
+
+
+def _cache_bytes(cache: DynamicCache) -> int:
+    return sum(
+        tensor.numel() * tensor.element_size()
+        for tensor in list(cache.key_cache) + list(cache.value_cache)
+    )
+
+
+class PrefixCache:
+    """
+    Bounded LRU cache of key/values keyed by token prefix.
+    Prefixes are cached at block boundaries and keyed by a hash chained over
+    their blocks, so a lookup finds the longest cached prefix of a prompt with
+    one hash per block. Memory use is capped at max_bytes.
+    """
+
+    def __init__(self, max_bytes: int, block_size: int = 64) -> None:
+        self.max_bytes = max_bytes
+        self.block_size = block_size
+        self._entries: OrderedDict[bytes, Tuple[DynamicCache, int]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._tokens_reused = 0
+
+    def _block_hashes(self, token_ids: Sequence[int]) -> List[bytes]:
+        """Return the chained hash of every whole block of the tokens."""
+        hashes = []
+        digest = b""
+        for end in range(self.block_size, len(token_ids) + 1, self.block_size):
+            block = token_ids[end - self.block_size : end]
+            data = digest + b"".join(t.to_bytes(4, "little") for t in block)
+            digest = hashlib.blake2b(data, digest_size=16).digest()
+            hashes.append(digest)
+        return hashes
+
+    def lookup(self, token_ids: Sequence[int]) -> Tuple[int, DynamicCache | None]:
+        """
+        Return the length and a copy of the key/values of the longest cached
+        prefix of the tokens, leaving at least one token to be processed.
+        """
+        hashes = self._block_hashes(token_ids[:-1])
+        with self._lock:
+            for key in reversed(hashes):
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    cache, _ = self._entries[key]
+                    length = cache.get_seq_length()
+                    self._hits += 1
+                    self._tokens_reused += length
+                    return length, _slice_cache(cache, length)
+            self._misses += 1
+        return 0, None
+
+    def store(
+        self, token_ids: Sequence[int], cache: DynamicCache, lengths: Sequence[int]
+    ) -> None:
+        """
+        Cache the key/values of the prefixes of the tokens ending at the
+        block boundaries at or below each of the given lengths.
+        """
+        hashes = self._block_hashes(token_ids)
+        for length in lengths:
+            blocks = min(length, len(token_ids)) // self.block_size
+            if blocks == 0:
+                continue
+            key = hashes[blocks - 1]
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    continue
+            entry = _slice_cache(cache, blocks * self.block_size)
+            size = _cache_bytes(entry)
+            if size > self.max_bytes:
+                continue
+            with self._lock:
+                if key in self._entries:
+                    continue
+                self._entries[key] = (entry, size)
+                self._bytes += size
+                while self._bytes > self.max_bytes:
+                    _, (_, evicted_size) = self._entries.popitem(last=False)
+                    self._bytes -= evicted_size
+                    self._evictions += 1
+
+    def clear(self) -> None:
+        """Remove every entry from the cache."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the current memory use and hit statistics of the cache."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "tokens_reused": self._tokens_reused,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+            }
@@ -4,22 +4,40 @@ I.E. Events between a user and a character
 """
 
 import json
+import os
 from datetime import datetime, timedelta, timezone
-from typing import List, cast
+from typing import Any, Callable, List, Sequence, Tuple, cast
 
 import database as db
 
-from .events import _message_to_chatmessage
-from .main import _generate_text, _get_system_message, _parse_time
+from .context import _message_to_chatmessage
+from .delay import DELAY_POLICIES
+from .main import _generate_text, _get_system_message, _pack_context, _parse_time
 from .model import Model
-from .types import MAX_TOKENS, ChatMessage, StampedChatMessage
+from .types import MAX_TOKENS, ChatMessage, Priority, StampedChatMessage
+
+# How the response time is decided, either a policy in DELAY_POLICIES or "llm"
+DELAY_POLICY = os.getenv("DELAY_POLICY", "history")
+# With the llm policy, ask for the response time and message in separate generations
+SEPARATE_RESPONSE_TIME = os.getenv("SEPARATE_RESPONSE_TIME", "false").lower() == "true"
 
 
 def _create_message_log(
-    thread_id: int, model: Model | None = None
+    thread_id: int,
+    model: Model | None = None,
+    reserved: Sequence[ChatMessage] = (),
 ) -> List[ChatMessage]:
     chatlog: List[StampedChatMessage] = []
-    messages = db.select_messages(db.Message(thread_id=thread_id))
+    if model:
+        # only fetch the messages whose stored token counts fit the context,
+        # the serialized messages are packed exactly below
+        messages = db.select_messages_with_participants(
+            thread_id=thread_id,
+            token_budget=MAX_TOKENS - model.token_count(list(reserved)),
+            tokenizer=model.model.model_name,
+        )
+    else:
+        messages = db.select_messages_with_participants(thread_id=thread_id)
     for message in messages:
         if not all(
             [
@@ -36,33 +54,53 @@ def _create_message_log(
     if not model:
         # if no model is provided, don't truncate and return early
         return sorted_chatlog
-    truncated_log = sorted_chatlog[:]
-    while model.token_count(truncated_log) > MAX_TOKENS:
-        truncated_log.pop(0)
-    return truncated_log
+    return _pack_context(model, sorted_chatlog, reserved)
 
 
 def response_cycle(
-    model: Model, thread_id: int, duration: timedelta | None = None
+    model: Model,
+    thread_id: int,
+    duration: timedelta | None = None,
+    cancelled: Callable[[], bool] | None = None,
+    separate_time: bool | None = None,
+    delay_policy: str | None = None,
+    priority: Priority = Priority.USER_REPLY,
 ) -> None:
     """
     Handles the entire response cycle for recieving and generating a new message.
+    Unless a duration is given, the response time is decided by the delay policy
+    (DELAY_POLICY by default). The "llm" policy asks the model, generating the
+    response time and message together, or in two generations if separate_time
+    (or the SEPARATE_RESPONSE_TIME environment variable) is set.
+    If cancelled is given and returns True, the cycle stops without submitting.
+    Generation is queued at the priority, ahead of background content.
     """
     # delete previous scheduled messages
     thread = db.select_thread(thread_id)
     db.delete_scheduled_messages(thread_id)
+    delay_policy = delay_policy or DELAY_POLICY
+    if duration is None and delay_policy != "llm":
+        duration = DELAY_POLICIES[delay_policy](thread)
+    if separate_time is None:
+        separate_time = SEPARATE_RESPONSE_TIME
+    if duration is None and not separate_time:
+        _get_timed_response_and_submit(model, thread, cancelled, priority)
+        return
     # get response time
     if duration is None:
-        duration = _get_response_time(model, thread)
+        duration = _get_response_time(model, thread, priority)
+    if cancelled is not None and cancelled():
+        return
     timestamp = datetime.now(timezone.utc) + duration
     # get a response from the model
-    _get_response_and_submit(model, thread, timestamp)
+    _get_response_and_submit(model, thread, timestamp, cancelled, priority)
 
 
-def _get_response_time(model: Model, thread: db.Thread) -> timedelta:
+def _get_response_time(
+    model: Model, thread: db.Thread, priority: Priority = Priority.USER_REPLY
+) -> timedelta:
     assert thread["id"]
     sys_message = _get_system_message("time", thread)
-    chatlog = _create_message_log(thread["id"], model=model)
     now = datetime.now(timezone.utc).isoformat()
     user = db.select_user_by_id(thread["user_id"])
     content = (
@@ -70,8 +108,12 @@ def _get_response_time(model: Model, thread: db.Thread) -> timedelta:
         f"message to {user['username']}?\n "
         "Reminder to write the time in the format 'nd nh nm ns'."
     )
-    chatlog.append(ChatMessage(role="user", content=content))
-    response = _generate_text(model, sys_message, chatlog)
+    instruction = ChatMessage(role="user", content=content)
+    chatlog = _create_message_log(
+        thread["id"], model=model, reserved=[sys_message, instruction]
+    )
+    chatlog.append(instruction)
+    response = _generate_text(model, sys_message, chatlog, "time", priority)
     return _parse_time(response["content"])
 
 
@@ -79,23 +121,28 @@ def _get_response_and_submit(
     model: Model,
     thread: db.Thread,
     timestamp: datetime,
+    cancelled: Callable[[], bool] | None = None,
+    priority: Priority = Priority.USER_REPLY,
 ) -> None:
     assert thread["id"]
     sys_message = _get_system_message("chat", thread)
-    chatlog = _create_message_log(thread["id"], model=model)
     now = datetime.now(timezone.utc).isoformat()
     user = db.select_user_by_id(thread["user_id"])
     content = (
         f"The time is currently {now}, and you have decided to send {user['username']} "
         f"another message. Please generate message to {user['username']}.\n"
     )
-    chatlog.append(
-        {
-            "role": "user",
-            "content": content,
-        }
+    instruction = ChatMessage(role="user", content=content)
+    chatlog = _create_message_log(
+        thread["id"], model=model, reserved=[sys_message, instruction]
+    )
+    chatlog.append(instruction)
+    response = _prompt_model_for_message_response(
+        model, sys_message, chatlog, priority=priority
     )
-    response = _prompt_model_for_message_response(model, sys_message, chatlog)
+    # a newer cycle for this thread supersedes this response
+    if cancelled is not None and cancelled():
+        return
     message = db.Message(
         thread_id=thread["id"],
         content=response,
@@ -105,19 +152,67 @@ def _get_response_and_submit(
     db.insert_message(message)
 
 
+def _get_timed_response_and_submit(
+    model: Model,
+    thread: db.Thread,
+    cancelled: Callable[[], bool] | None = None,
+    priority: Priority = Priority.USER_REPLY,
+) -> None:
+    """Generate the response time and message in a single generation."""
+    assert thread["id"]
+    sys_message = _get_system_message("chat_timed", thread)
+    now = datetime.now(timezone.utc).isoformat()
+    user = db.select_user_by_id(thread["user_id"])
+    content = (
+        f"The time is currently {now}. Decide how long until you next send a "
+        f"message to {user['username']}, and generate that message.\n"
+        "Reminder to write the delay in the format 'nd nh nm ns'."
+    )
+    instruction = ChatMessage(role="user", content=content)
+    chatlog = _create_message_log(
+        thread["id"], model=model, reserved=[sys_message, instruction]
+    )
+    chatlog.append(instruction)
+    duration, response = _prompt_model_for_message_response(
+        model,
+        sys_message,
+        chatlog,
+        _parse_response_timed_message,
+        "chat_timed",
+        priority,
+    )
+    # a newer cycle for this thread supersedes this response
+    if cancelled is not None and cancelled():
+        return
+    message = db.Message(
+        thread_id=thread["id"],
+        content=response,
+        role="assistant",
+        timestamp=datetime.now(timezone.utc) + duration,
+    )
+    db.insert_message(message)
+
+
 def _prompt_model_for_message_response(
-    model: Model, sys_message: ChatMessage, chatlog: List[ChatMessage]
-) -> str:
+    model: Model,
+    sys_message: ChatMessage,
+    chatlog: List[ChatMessage],
+    parse: Callable[[str], Any] | None = None,
+    task: str = "chat",
+    priority: Priority = Priority.USER_REPLY,
+) -> Any:
     """
     Continue to prompt the model to generate a response until a
     valid response is received or the retry limit is reached
     """
+    if parse is None:
+        parse = _parse_response_message
     max_retries = 5
     retry_count = 0
     while retry_count < max_retries:
         try:
-            response = _generate_text(model, sys_message, chatlog)
-            content = _parse_response_message(response["content"])
+            response = _generate_text(model, sys_message, chatlog, task, priority)
+            content = parse(response["content"])
             break  # Break out of the retry loop if the response is valid
         except ValueError as e:
             retry_count += 1
@@ -135,3 +230,17 @@ def _parse_response_message(response_json: str) -> str:
         return response_data.get("message", "")
     except json.JSONDecodeError as e:
         raise ValueError(f"Error decoding JSON: {e}") from e
+
+
+def _parse_response_timed_message(response_json: str) -> Tuple[timedelta, str]:
+    """
+    Parses the JSON string from the model response and returns the
+    'delay' and 'message' components.
+    """
+    try:
+        response_data = json.loads(response_json)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Error decoding JSON: {e}") from e
+    if not isinstance(response_data, dict) or "delay" not in response_data:
+        raise ValueError("Response is missing the delay.")
+    return _parse_time(str(response_data["delay"])), response_data.get("message", "")
@@ -1,46 +1,229 @@
 """Handles code to schedule events for the chatbot."""
 
 import atexit
+import heapq
+import itertools
 import random
-
-from apscheduler.schedulers.background import BackgroundScheduler
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Set, Tuple
 
 import database as db
 
+from .admission import AdmissionController
 from .comments import generate_comment
+from .context import build_feed_snapshot
 from .events import generate_event
 from .model import Model
 from .posts import generate_social_media_post
+from .types import FeedSnapshot
+
+# Average number of minutes between each kind of generation, per character
+GENERATION_INTERVALS = {
+    "thought": 30,  # Thoughts happen twice an hour on average
+    "event": 30,  # Events happen twice an hour on average
+    "post": 180,  # Posts happen once every three hours on average
+    "comment": 60,  # Comments happen once an hour on average
+}
+# How often the character list is reloaded to pick up new characters, in seconds
+REFRESH_INTERVAL = 60
 
 
-def schedule_events(model: Model) -> None:
-    """Schedule events for the chatbot."""
-    scheduler = BackgroundScheduler()
-    scheduler.add_job(
-        _scheduled_generation,
-        trigger="interval",
-        minutes=1,
-        args=[model],
-    )
+def schedule_events(model: Model) -> "GenerationScheduler":
+    """
+    Schedule events for the chatbot.
+    Rows inserted from now on have their tokens counted with the model's
+    tokenizer, and rows counted by no or another tokenizer are counted
+    in the background.
+    """
+    db.register_token_counter(model.model.model_name, model.text_token_count)
+    threading.Thread(target=db.backfill_token_counts, daemon=True).start()
+    scheduler = GenerationScheduler(model, admission=AdmissionController(model))
     scheduler.start()
-    atexit.register(scheduler.shutdown)
+    atexit.register(scheduler.stop)
+    return scheduler
 
 
-def _scheduled_generation(model: Model) -> None:
+def _next_delay(kind: str) -> float:
     """
-    Called once a minute and uses internal logic decide what to generate.
+    Draw the number of seconds until a kind of generation next fires.
+    Exponential delays give the same rates as rolling once a minute.
     """
-    char_ids = db.select_character_ids()
-    for char_id in char_ids:
-        if random.random() < 1 / 30:
-            # Thoughts happen twice an hour on average
-            generate_event(model, char_id, "thought")
-        if random.random() < 1 / 30:
-            # Events happen twice an hour on average
-            generate_event(model, char_id, "event")
-        if random.random() < 1 / 180:
-            # Posts happen once every three hours on average
-            generate_social_media_post(model, char_id)
-        if random.random() < 1 / 60:
-            # Comments happen once an hour on average
-            generate_comment(model, char_id)
+    return random.expovariate(1 / (GENERATION_INTERVALS[kind] * 60))
+
+
+def _run_job(
+    model: Model, char_id: int, kind: str, feed: FeedSnapshot | None = None
+) -> None:
+    """Run a single generation for a character, with the tick's feed snapshot."""
+    match kind:
+        case "thought":
+            generate_event(model, char_id, "thought", feed)
+        case "event":
+            generate_event(model, char_id, "event", feed)
+        case "post":
+            generate_social_media_post(model, char_id, feed)
+        case "comment":
+            generate_comment(model, char_id, feed)
+
+
+class GenerationScheduler:
+    """
+    Keeps the next fire time of every (character, generation) pair in a heap
+    and only wakes when the earliest one is due. Due jobs are handed to a
+    bounded pool of workers, so a slow generation doesn't delay the others.
+    The jobs due in a tick share one snapshot of the global feed.
+    If an admission controller is given, it decides whether each due job runs,
+    is postponed (kept in a separate heap, as it isn't rescheduled) or is shed.
+    """
+
+    def __init__(
+        self,
+        model: Model,
+        max_workers: int = 4,
+        admission: AdmissionController | None = None,
+    ) -> None:
+        self.model = model
+        self.admission = admission
+        self._heap: List[Tuple[float, int, int, str]] = []
+        self._postponed: List[Tuple[float, int, int, str]] = []
+        self._postponements: Dict[Tuple[int, str], int] = {}
+        self._counter = itertools.count()
+        self._characters: Set[int] = set()
+        self._in_flight: Set[Tuple[int, str]] = set()
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._thread: threading.Thread | None = None
+        self._stopped = False
+        self.stats: Dict[str, int] = {"submitted": 0, "skipped": 0, "failed": 0}
+
+    def start(self) -> None:
+        """Start waiting for due generations in a background thread."""
+        self._refresh_characters()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop scheduling, waiting for running generations to finish."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _push(self, fire_at: float, char_id: int, kind: str) -> None:
+        heapq.heappush(self._heap, (fire_at, next(self._counter), char_id, kind))
+
+    def _refresh_characters(self) -> None:
+        """Seed fire times for new characters, and forget deleted ones."""
+        char_ids = set(db.select_character_ids())
+        now = time.monotonic()
+        with self._cond:
+            for char_id in char_ids - self._characters:
+                for kind in GENERATION_INTERVALS:
+                    self._push(now + _next_delay(kind), char_id, kind)
+            # removed characters are discarded lazily when their jobs come due
+            self._characters = char_ids
+            self._cond.notify()
+
+    def _pop_due(self, now: float) -> List[Tuple[int, str]]:
+        """
+        Pop every job due at or before now, scheduling the next firing of each.
+        Must be called holding the condition.
+        """
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, _, char_id, kind = heapq.heappop(self._heap)
+            if char_id not in self._characters:
+                continue
+            self._push(now + _next_delay(kind), char_id, kind)
+            due.append((char_id, kind))
+        return due
+
+    def _pop_postponed(self, now: float) -> List[Tuple[int, str]]:
+        """
+        Pop every postponed job due at or before now.
+        Must be called holding the condition.
+        """
+        due = []
+        while self._postponed and self._postponed[0][0] <= now:
+            _, _, char_id, kind = heapq.heappop(self._postponed)
+            if char_id in self._characters:
+                due.append((char_id, kind))
+        return due
+
+    def _admit(self, char_id: int, kind: str) -> bool:
+        """Ask the admission controller whether a due job runs now."""
+        if self.admission is None:
+            return True
+        key = (char_id, kind)
+        with self._cond:
+            postponed = self._postponements.pop(key, 0)
+        decision = self.admission.decide(char_id, kind, postponed)
+        if decision == "postpone":
+            with self._cond:
+                self._postponements[key] = postponed + 1
+                fire_at = time.monotonic() + self.admission.postpone_delay
+                heapq.heappush(
+                    self._postponed, (fire_at, next(self._counter), char_id, kind)
+                )
+        return decision == "admit"
+
+    def _run(self) -> None:
+        next_refresh = time.monotonic() + REFRESH_INTERVAL
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                wake_at = next_refresh
+                for heap in (self._heap, self._postponed):
+                    if heap:
+                        wake_at = min(wake_at, heap[0][0])
+                if not self._stopped and wake_at > now:
+                    self._cond.wait(timeout=wake_at - now)
+                if self._stopped:
+                    return
+                now = time.monotonic()
+                due = self._pop_postponed(now) + self._pop_due(now)
+            admitted = [job for job in due if self._admit(*job)]
+            if admitted:
+                feed = self._feed_snapshot()
+                for char_id, kind in admitted:
+                    self._submit(char_id, kind, feed)
+            if time.monotonic() >= next_refresh:
+                self._refresh_characters()
+                next_refresh = time.monotonic() + REFRESH_INTERVAL
+
+    def _feed_snapshot(self) -> FeedSnapshot | None:
+        """
+        Snapshot the global feed for a tick's jobs.
+        If that fails, each job loads the feed itself.
+        """
+        try:
+            return build_feed_snapshot(self.model)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            print(f"Failed to snapshot the feed: {e}")
+            return None
+
+    def _submit(
+        self, char_id: int, kind: str, feed: FeedSnapshot | None = None
+    ) -> None:
+        """Hand a job to the workers, unless the same job is still running."""
+        key = (char_id, kind)
+        with self._cond:
+            if key in self._in_flight:
+                self.stats["skipped"] += 1
+                return
+            self._in_flight.add(key)
+            self.stats["submitted"] += 1
+        future = self._executor.submit(_run_job, self.model, char_id, kind, feed)
+        future.add_done_callback(lambda f: self._finished(key, f))
+
+    def _finished(self, key: Tuple[int, str], future: Future) -> None:
+        with self._cond:
+            self._in_flight.discard(key)
+            if not future.cancelled() and future.exception() is not None:
+                self.stats["failed"] += 1
+                print(
+                    f"Scheduled {key[1]} for character {key[0]} failed: "
+                    f"{future.exception()}"
+                )
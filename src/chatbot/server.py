@@ -0,0 +1,153 @@
+"""
+Inference worker serving a model to other processes over a local socket,
+so generation runs outside the web server and one loaded model can be shared.
+Clients connect with ModelRemote.
+"""
+
+import argparse
+import multiprocessing
+import threading
+from multiprocessing.connection import Connection, Listener
+from multiprocessing.process import BaseProcess
+from typing import Any, Dict, Tuple
+
+from .model import (
+    DEFAULT_MODEL,
+    INFERENCE_AUTHKEY,
+    ModelInterface,
+    new_model_interface,
+    parse_address,
+)
+
+
+class InferenceServer:
+    """
+    Serves generation requests from any number of client connections.
+    The socket is bound before the model is loaded, so clients can connect
+    straight away; their requests wait until the model is ready.
+    Generation is serialized, as the model isn't thread safe.
+    """
+
+    def __init__(self, address: str, authkey: bytes = INFERENCE_AUTHKEY) -> None:
+        self.listener = Listener(parse_address(address), authkey=authkey)
+        self.model: ModelInterface | None = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def address(self) -> str:
+        """Address the server is listening on."""
+        address = self.listener.address
+        if isinstance(address, tuple):
+            return f"{address[0]}:{address[1]}"
+        return address
+
+    def set_model(self, model: ModelInterface) -> None:
+        """Start serving requests with a loaded model."""
+        self.model = model
+        self._ready.set()
+
+    def serve_forever(self) -> None:
+        """Accept connections, handling each in its own thread."""
+        while True:
+            try:
+                conn = self.listener.accept()
+            except OSError:
+                # the listener was closed
+                return
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                # e.g. a client with the wrong authkey
+                print(f"Rejected inference client: {e}")
+                continue
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def close(self) -> None:
+        """Stop accepting connections."""
+        self.listener.close()
+
+    def _handle(self, conn: Connection) -> None:
+        with conn:
+            while True:
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError):
+                    return
+                conn.send(self._respond(request))
+
+    def _respond(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        self._ready.wait()
+        assert self.model is not None
+        try:
+            if request["op"] == "info":
+                result: Any = {
+                    "model_name": self.model.model_name,
+                    "max_tokens": self.model.max_tokens,
+                }
+            elif request["op"] == "generate":
+                with self._lock:
+                    result = self.model.generate_responses(
+                        request["chats"],
+                        max_new_tokens=request["max_new_tokens"],
+                        stop_on_json=request["stop_on_json"],
+                        schema=request["schema"],
+                    )
+            else:
+                raise ValueError(f"Unknown request: {request['op']}")
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            return {"error": f"{type(e).__name__}: {e}"}
+        return {"result": result}
+
+
+def run_server(
+    address: str,
+    model_name: str = DEFAULT_MODEL,
+    mocked: bool = False,
+    bound: Connection | None = None,
+) -> None:
+    """
+    Load a model and serve it until the process is stopped.
+    The bound address is sent on the bound connection, if given,
+    before the model is loaded.
+    """
+    server = InferenceServer(address)
+    if bound is not None:
+        bound.send(server.address)
+        bound.close()
+    print(f"Inference worker listening on {server.address}")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    server.set_model(new_model_interface(model_name, mocked))
+    threading.Event().wait()
+
+
+def start_server(
+    address: str = "127.0.0.1:0",
+    model_name: str = DEFAULT_MODEL,
+    mocked: bool = False,
+) -> Tuple[BaseProcess, str]:
+    """
+    Start an inference worker in a new process, returning it and its address.
+    Returns once the worker is listening, without waiting for the model to load.
+    """
+    # spawned, so the worker doesn't inherit this process's torch/CUDA state
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(
+        target=run_server, args=(address, model_name, mocked, sender), daemon=True
+    )
+    process.start()
+    sender.close()
+    return process, receiver.recv()
+
+
+def main() -> None:
+    """Run an inference worker from the command line."""
+    parser = argparse.ArgumentParser(description="Run the inference worker.")
+    parser.add_argument("--address", default="127.0.0.1:6000")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--test", action="store_true", help="Use a mocked model")
+    args = parser.parse_args()
+    run_server(args.address, args.model, args.test)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,65 @@
 """Type definitions and variable decarations for chatbot package."""
 
 from datetime import datetime
-from typing import TypedDict
+from enum import IntEnum
+from typing import List, TypedDict
 
 MAX_TOKENS = 4096
 MAX_NEW_TOKENS = 512
+# most recent messages considered when building a character's event log
+MAX_LOG_MESSAGES = 200
+MAX_LOG_EVENTS = 20
+MAX_LOG_POSTS = 20
+
+
+class GenerationProfile(TypedDict):
+    """
+    Generation arguments for a kind of task.
+    stop_on_json ends generation as soon as the response's JSON object closes.
+    schema names the JSON schema (see generation.RESPONSE_SCHEMAS) the response
+    is constrained to, if any.
+    """
+
+    max_new_tokens: int
+    stop_on_json: bool
+    schema: str | None
+
+
+DEFAULT_PROFILE = GenerationProfile(
+    max_new_tokens=MAX_NEW_TOKENS, stop_on_json=False, schema=None
+)
+
+
+def _json_profile(task: str, max_new_tokens: int) -> GenerationProfile:
+    return GenerationProfile(
+        max_new_tokens=max_new_tokens, stop_on_json=True, schema=task
+    )
+
+
+# keyed by the system message template used for the task
+GENERATION_PROFILES = {
+    "time": GenerationProfile(max_new_tokens=16, stop_on_json=False, schema=None),
+    "comment_choice": _json_profile("comment_choice", 32),
+    "sd-prompt": GenerationProfile(max_new_tokens=128, stop_on_json=False, schema=None),
+    "event": _json_profile("event", 256),
+    "comment_content": _json_profile("comment_content", 256),
+    "text_post": _json_profile("text_post", 384),
+    "photo": _json_profile("photo", 384),
+    "chat": _json_profile("chat", MAX_NEW_TOKENS),
+    "chat_timed": _json_profile("chat_timed", MAX_NEW_TOKENS),
+}
+
+
+class Priority(IntEnum):
+    """
+    Priority classes of generation requests, most urgent first.
+    USER_REPLY answers a message the user just sent, RESPONSE_NOW is a response
+    the user asked for straight away, and BACKGROUND is scheduled content.
+    """
+
+    USER_REPLY = 0
+    RESPONSE_NOW = 1
+    BACKGROUND = 2
 
 
 class ChatMessage(TypedDict):
@@ -22,5 +77,26 @@ class StampedChatMessage(TypedDict):
     timestamp: datetime
 
 
+class ContextEntry(TypedDict):
+    """
+    Serialized log entry held in memory, along with the ids needed to keep it current.
+    parent_id is the thread of a message, or the character of an event or post.
+    """
+
+    id: int
+    parent_id: int
+    message: StampedChatMessage
+
+
+class FeedSnapshot(TypedDict):
+    """
+    The global feed serialized once for a scheduler tick, with the token count
+    of each post, shared read-only by every generation of the tick.
+    """
+
+    posts: List[StampedChatMessage]
+    token_counts: List[int]
+
+
 class ImageGenerationFailedException(Exception):
     """Exception raised when image generation fails on Civitai's side."""
@@ -6,15 +6,17 @@ from .characters import (
     select_character_by_id,
     select_character_ids,
     select_characters,
+    select_characters_by_ids,
     update_character,
 )
-from .comments import insert_comment, select_comments
+from .comments import insert_comment, select_comments, select_comments_from_posts
 from .db_types import (
     Character,
     Comment,
     Event,
     Like,
     Message,
+    MessageWithParticipants,
     Post,
     QueryOptions,
     Thread,
@@ -22,6 +24,7 @@ from .db_types import (
     metadata_obj,
 )
 from .events import delete_event, insert_event, select_events, select_most_recent_event
+from .hooks import register_hook
 from .likes import count_likes, delete_like, has_user_liked, insert_like, select_likes
 from .main import create_db
 from .messages import (
@@ -30,11 +33,29 @@ from .messages import (
     delete_scheduled_messages,
     insert_message,
     select_message,
+    select_message_with_participants,
     select_messages,
     select_messages_by_character,
+    select_messages_with_participants,
+    select_recent_messages_by_character,
     select_scheduled_message,
     update_message,
 )
+from .migrations import migrate, schema_version
+from .pagination import decode_cursor, next_cursor
 from .posts import insert_post, select_post, select_posts, update_post_with_image_path
-from .threads import insert_thread, select_latest_thread, select_thread, select_threads
-from .users import insert_user, select_user, select_user_by_id, update_user
+from .threads import (
+    insert_thread,
+    select_latest_thread,
+    select_thread,
+    select_threads,
+    select_threads_by_ids,
+)
+from .tokens import backfill_token_counts, register_token_counter
+from .users import (
+    insert_user,
+    select_user,
+    select_user_by_id,
+    select_users_by_ids,
+    update_user,
+)
@@ -1,6 +1,6 @@
 """Database operations for the characters table."""
 
-from typing import Any, List
+from typing import Any, Dict, Iterable, List
 
 from sqlalchemy import insert, select
 from sqlalchemy.engine import Row
@@ -66,6 +66,14 @@ def select_character_by_id(character_id: int) -> Character:
         return _row_to_character(character)
 
 
+def select_characters_by_ids(character_ids: Iterable[int]) -> Dict[int, Character]:
+    """Select several characters by id in one query, keyed by id."""
+    stmt = select(characters_table).where(characters_table.c.id.in_(set(character_ids)))
+    with ENGINE.connect() as conn:
+        result = conn.execute(stmt)
+        return {row.id: _row_to_character(row) for row in result}
+
+
 def select_characters(character_query: Character = Character()) -> List[Character]:
     """Select characters from the database, optionally with a query."""
     conditions = []
@@ -1,12 +1,14 @@
 """Database operations for the comments table."""
 
-from typing import Any, List
+from typing import Any, Dict, Iterable, List
 
 from sqlalchemy import insert, select
 from sqlalchemy.engine import Row
 
 from .db_types import Comment, comments_table
+from .hooks import _run_hooks
 from .main import ENGINE
+from .tokens import _with_token_count
 
 
 def _row_to_comment(row: Row[Any]) -> Comment:
@@ -22,10 +24,15 @@ def _row_to_comment(row: Row[Any]) -> Comment:
 
 def insert_comment(values: Comment) -> int:
     """Insert a comment into the database."""
-    stmt = insert(comments_table).values(values)
+    stmt = (
+        insert(comments_table)
+        .values(_with_token_count("comments", dict(values)))
+        .returning(comments_table)
+    )
     with ENGINE.begin() as conn:
-        result = conn.execute(stmt)
-        return result.inserted_primary_key[0]
+        comment = _row_to_comment(conn.execute(stmt).one())
+    _run_hooks("comments", "insert", dict(comment))
+    return comment["id"]
 
 
 def select_comments(comment_query: Comment = Comment()) -> List[Comment]:
@@ -45,3 +52,18 @@ def select_comments_from_post(post_id: int) -> List[Comment]:
     with ENGINE.connect() as conn:
         result = conn.execute(stmt)
         return [_row_to_comment(row) for row in result]
+
+
+def select_comments_from_posts(post_ids: Iterable[int]) -> Dict[int, List[Comment]]:
+    """Select the comments of several posts in one query, keyed by post id."""
+    post_ids = set(post_ids)
+    stmt = (
+        select(comments_table)
+        .where(comments_table.c.post_id.in_(post_ids))
+        .order_by(comments_table.c.id)
+    )
+    comments: Dict[int, List[Comment]] = {post_id: [] for post_id in post_ids}
+    with ENGINE.connect() as conn:
+        for row in conn.execute(stmt):
+            comments[row.post_id].append(_row_to_comment(row))
+    return comments
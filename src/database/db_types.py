@@ -9,6 +9,7 @@ from sqlalchemy import (
     Column,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     MetaData,
     String,
@@ -70,6 +71,7 @@ characters_table = Table(
     Column("global_positive", String),
     Column("global_negative", String),
     Column("profile_path", String),
+    Index("ix_characters_path_name", "path_name"),
 )
 
 
@@ -81,6 +83,8 @@ class Event(TypedDict, total=False):
     char_id: NotRequired[int]
     type: NotRequired[str]
     content: NotRequired[str]
+    token_count: NotRequired[int]
+    tokenizer: NotRequired[str]
 
 
 events_table = Table(
@@ -91,6 +95,9 @@ events_table = Table(
     Column("char_id", ForeignKey("characters.id"), nullable=False),
     Column("type", String, nullable=False),
     Column("content", String, nullable=False),
+    Column("token_count", Integer),
+    Column("tokenizer", String),
+    Index("ix_events_char_id_timestamp", "char_id", "timestamp"),
 )
 
 
@@ -105,6 +112,8 @@ class Post(TypedDict, total=False):
     image_description: NotRequired[str]
     prompt: NotRequired[str]
     image_path: NotRequired[str]
+    token_count: NotRequired[int]
+    tokenizer: NotRequired[str]
 
 
 posts_table = Table(
@@ -118,6 +127,9 @@ posts_table = Table(
     Column("image_description", String, default=""),
     Column("prompt", String, default=""),
     Column("image_path", String, default=""),
+    Column("token_count", Integer),
+    Column("tokenizer", String),
+    Index("ix_posts_char_id_timestamp", "char_id", "timestamp"),
 )
 
 
@@ -129,6 +141,8 @@ class Comment(TypedDict, total=False):
     post_id: NotRequired[int]
     char_id: NotRequired[int]
     content: NotRequired[str]
+    token_count: NotRequired[int]
+    tokenizer: NotRequired[str]
 
 
 comments_table = Table(
@@ -139,6 +153,9 @@ comments_table = Table(
     Column("post_id", ForeignKey("posts.id"), nullable=False),
     Column("char_id", ForeignKey("characters.id"), nullable=False),
     Column("content", String, nullable=False),
+    Column("token_count", Integer),
+    Column("tokenizer", String),
+    Index("ix_comments_post_id", "post_id"),
 )
 
 
@@ -158,6 +175,7 @@ users_table = Table(
     Column("username", String, nullable=False),
     Column("password", String, nullable=False),
     Column("email", String, nullable=False),
+    Index("ix_users_username", "username"),
 )
 
 
@@ -177,6 +195,7 @@ threads_table = Table(
     Column("started", DateTime, default=func.now()),  # pylint: disable=not-callable
     Column("user_id", ForeignKey("users.id"), nullable=False),
     Column("char_id", ForeignKey("characters.id"), nullable=False),
+    Index("ix_threads_user_id_char_id_started", "user_id", "char_id", "started"),
 )
 
 
@@ -188,6 +207,17 @@ class Message(TypedDict, total=False):
     thread_id: NotRequired[int]
     content: NotRequired[str]
     role: NotRequired[str]
+    token_count: NotRequired[int]
+    tokenizer: NotRequired[str]
+
+
+class MessageWithParticipants(Message, total=False):
+    """Message type joined with the character and user of its thread."""
+
+    char_id: NotRequired[int]
+    user_id: NotRequired[int]
+    char_name: NotRequired[str]
+    username: NotRequired[str]
 
 
 messages_table = Table(
@@ -198,6 +228,9 @@ messages_table = Table(
     Column("thread_id", ForeignKey("threads.id"), nullable=False),
     Column("content", String, nullable=False),
     Column("role", String, nullable=False),
+    Column("token_count", Integer),
+    Column("tokenizer", String),
+    Index("ix_messages_thread_id_timestamp", "thread_id", "timestamp"),
 )
 
 
@@ -225,6 +258,26 @@ likes_table = Table(
         "(post_id IS NULL AND comment_id IS NOT NULL)",
         name="check_one_type_not_null",
     ),
+    Index(
+        "ix_likes_user_id_content_liked_post_id", "user_id", "content_liked", "post_id"
+    ),
+    Index(
+        "ix_likes_user_id_content_liked_comment_id",
+        "user_id",
+        "content_liked",
+        "comment_id",
+    ),
+    Index("ix_likes_post_id", "post_id"),
+    Index("ix_likes_comment_id", "comment_id"),
+)
+
+
+schema_version_table = Table(
+    "schema_version",
+    metadata_obj,
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("description", String, nullable=False),
+    Column("applied", DateTime, default=func.now()),  # pylint: disable=not-callable
 )
 
 
@@ -235,3 +288,4 @@ class QueryOptions(TypedDict, total=False):
     offset: NotRequired[int]
     orderby: NotRequired[str]
     order: NotRequired[str]
+    cursor: NotRequired[str]  # from next_cursor, pages after its row by (timestamp, id)
@@ -6,7 +6,10 @@ from sqlalchemy import insert, select
 from sqlalchemy.engine import Row
 
 from .db_types import Event, QueryOptions, events_table
+from .hooks import _run_hooks
 from .main import ENGINE
+from .pagination import _apply_query_options
+from .tokens import _with_token_count
 
 
 def _row_to_event(row: Row[Any]) -> Event:
@@ -22,10 +25,15 @@ def _row_to_event(row: Row[Any]) -> Event:
 
 def insert_event(values: Event) -> int:
     """Insert a event into the database."""
-    stmt = insert(events_table).values(values)
+    stmt = (
+        insert(events_table)
+        .values(_with_token_count("events", dict(values)))
+        .returning(events_table)
+    )
     with ENGINE.begin() as conn:
-        result = conn.execute(stmt)
-        return result.inserted_primary_key[0]
+        event = _row_to_event(conn.execute(stmt).one())
+    _run_hooks("events", "insert", dict(event))
+    return event["id"]
 
 
 def select_events(
@@ -36,15 +44,7 @@ def select_events(
     for key, value in event_query.items():
         conditions.append(getattr(events_table.c, key) == value)
     stmt = select(events_table).where(*conditions)
-    if options.get("limit"):
-        stmt = stmt.limit(options["limit"])
-    if options.get("offset"):
-        stmt = stmt.offset(options["offset"])
-    if options.get("orderby"):
-        if options.get("order") == "desc":
-            stmt = stmt.order_by(getattr(events_table.c, options["orderby"]).desc())
-        else:
-            stmt = stmt.order_by(getattr(events_table.c, options["orderby"]).asc())
+    stmt = _apply_query_options(stmt, events_table, options)
     with ENGINE.connect() as conn:
         result = conn.execute(stmt)
         return [_row_to_event(row) for row in result]
@@ -71,3 +71,4 @@ def delete_event(event_id: int) -> None:
     stmt = events_table.delete().where(events_table.c.id == event_id)
     with ENGINE.begin() as conn:
         conn.execute(stmt)
+    _run_hooks("events", "delete", {"id": event_id})
@@ -0,0 +1,22 @@
+"""Hooks allowing other packages to react to changes in the database."""
+
+from typing import Any, Callable, Dict, List
+
+Hook = Callable[[str, Dict[str, Any]], None]
+
+_HOOKS: Dict[str, List[Hook]] = {}
+
+
+def register_hook(table: str, hook: Hook) -> None:
+    """
+    Register a function to be called whenever rows of a table change.
+    The hook is called with the action ("insert", "update" or "delete")
+    and the values known about the affected row(s).
+    """
+    _HOOKS.setdefault(table, []).append(hook)
+
+
+def _run_hooks(table: str, action: str, values: Dict[str, Any]) -> None:
+    """Call every hook registered for a table."""
+    for hook in _HOOKS.get(table, []):
+        hook(action, values)
@@ -7,6 +7,7 @@ from google.cloud.sql.connector import Connector
 from sqlalchemy import Engine, create_engine
 
 from .db_types import metadata_obj
+from .migrations import migrate
 
 connector = Connector()
 # Used for GCP SQL psql connection
@@ -46,7 +47,11 @@ else:
 
 
 def create_db(engine: Engine | None = None) -> None:
-    """Create the database."""
+    """
+    Create the database, or bring an existing one up to date by creating
+    any missing tables and applying pending migrations.
+    """
     if not engine:
         engine = ENGINE
-    metadata_obj.create_all(ENGINE)
+    metadata_obj.create_all(engine)
+    migrate(engine)
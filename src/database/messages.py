@@ -1,12 +1,24 @@
 """Database operations for the messages table."""
 
+from datetime import datetime
 from typing import Any, List
 
-from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy import Select, case, delete, func, insert, select, update
 from sqlalchemy.engine import Row
 
-from .db_types import Message, QueryOptions, messages_table, threads_table
+from .db_types import (
+    Message,
+    MessageWithParticipants,
+    QueryOptions,
+    characters_table,
+    messages_table,
+    threads_table,
+    users_table,
+)
+from .hooks import _run_hooks
 from .main import ENGINE
+from .pagination import _apply_query_options
+from .tokens import _with_token_count
 
 
 def _row_to_message(row: Row[Any]) -> Message:
@@ -20,12 +32,49 @@ def _row_to_message(row: Row[Any]) -> Message:
     )
 
 
+def _row_to_message_with_participants(row: Row[Any]) -> MessageWithParticipants:
+    """Convert a row joined with its thread participants to a message."""
+    return MessageWithParticipants(
+        id=row.id,
+        timestamp=row.timestamp,
+        thread_id=row.thread_id,
+        content=row.content,
+        role=row.role,
+        char_id=row.char_id,
+        user_id=row.user_id,
+        char_name=row.char_name,
+        username=row.username,
+    )
+
+
+def _select_with_participants() -> Select:
+    """Select messages joined with the character and user of their thread."""
+    return select(
+        messages_table,
+        threads_table.c.char_id,
+        threads_table.c.user_id,
+        characters_table.c.name.label("char_name"),
+        users_table.c.username,
+    ).select_from(
+        messages_table.join(
+            threads_table, messages_table.c.thread_id == threads_table.c.id
+        )
+        .join(characters_table, threads_table.c.char_id == characters_table.c.id)
+        .join(users_table, threads_table.c.user_id == users_table.c.id)
+    )
+
+
 def insert_message(values: Message) -> int:
     """Insert a message into the database."""
-    stmt = insert(messages_table).values(values)
+    stmt = (
+        insert(messages_table)
+        .values(_with_token_count("messages", dict(values)))
+        .returning(messages_table)
+    )
     with ENGINE.begin() as conn:
-        result = conn.execute(stmt)
-        return result.inserted_primary_key[0]
+        message = _row_to_message(conn.execute(stmt).one())
+    _run_hooks("messages", "insert", dict(message))
+    return message["id"]
 
 
 def select_message(message_id: int) -> Message:
@@ -47,15 +96,7 @@ def select_messages(
     for key, value in message_query.items():
         conditions.append(getattr(messages_table.c, key) == value)
     stmt = select(messages_table).where(*conditions)
-    if options.get("limit"):
-        stmt = stmt.limit(options["limit"])
-    if options.get("offset"):
-        stmt = stmt.offset(options["offset"])
-    if options.get("orderby"):
-        if options.get("order") == "desc":
-            stmt = stmt.order_by(getattr(messages_table.c, options["orderby"]).desc())
-        else:
-            stmt = stmt.order_by(getattr(messages_table.c, options["orderby"]).asc())
+    stmt = _apply_query_options(stmt, messages_table, options)
     with ENGINE.connect() as conn:
         result = conn.execute(stmt)
         return [_row_to_message(row) for row in result]
@@ -94,36 +135,124 @@ def select_messages_by_character(char_id: int) -> List[Message]:
         return [_row_to_message(row) for row in result]
 
 
+def select_message_with_participants(message_id: int) -> MessageWithParticipants:
+    """
+    Select a message along with the names of the character and user in its thread.
+    """
+    stmt = _select_with_participants().where(messages_table.c.id == message_id)
+    with ENGINE.connect() as conn:
+        result = conn.execute(stmt)
+        message = result.fetchone()
+        if message is None:
+            raise ValueError(f"no message found with id: {message_id}")
+        return _row_to_message_with_participants(message)
+
+
+def select_messages_with_participants(
+    thread_id: int | None = None,
+    char_id: int | None = None,
+    token_budget: int | None = None,
+    tokenizer: str | None = None,
+) -> List[MessageWithParticipants]:
+    """
+    Select messages along with the names of the character and user in their
+    thread, in a single query. Optionally filtered by thread or character.
+    With a token budget, only the most recent messages whose stored token
+    counts from the tokenizer sum to within it are selected. Messages without
+    a count from the tokenizer count as free, so they're always selected.
+    """
+    stmt = _select_with_participants()
+    if thread_id is not None:
+        stmt = stmt.where(messages_table.c.thread_id == thread_id)
+    if char_id is not None:
+        stmt = stmt.where(threads_table.c.char_id == char_id)
+    if token_budget is not None:
+        cost = case(
+            (messages_table.c.tokenizer == tokenizer, messages_table.c.token_count),
+            else_=0,
+        )
+        running = (
+            func.sum(cost)
+            .over(
+                order_by=(messages_table.c.timestamp.desc(), messages_table.c.id.desc())
+            )
+            .label("running_tokens")
+        )
+        windowed = stmt.add_columns(running).subquery()
+        stmt = select(windowed).where(windowed.c.running_tokens <= token_budget)
+    with ENGINE.connect() as conn:
+        result = conn.execute(stmt)
+        return [_row_to_message_with_participants(row) for row in result]
+
+
+def select_recent_messages_by_character(
+    char_id: int,
+    limit: int,
+    per_thread_limit: int | None = None,
+    before: datetime | None = None,
+) -> List[MessageWithParticipants]:
+    """
+    Select the most recent messages of a character across all its threads,
+    newest first, joined with the names of the thread participants.
+    Optionally caps the number of messages taken from any one thread,
+    and only considers messages sent before a given time.
+    """
+    stmt = _select_with_participants().where(threads_table.c.char_id == char_id)
+    if before is not None:
+        stmt = stmt.where(messages_table.c.timestamp < before)
+    if per_thread_limit is not None:
+        thread_rank = (
+            func.row_number()  # pylint: disable=not-callable
+            .over(
+                partition_by=messages_table.c.thread_id,
+                order_by=messages_table.c.timestamp.desc(),
+            )
+            .label("thread_rank")
+        )
+        ranked = stmt.add_columns(thread_rank).subquery()
+        stmt = (
+            select(ranked)
+            .where(ranked.c.thread_rank <= per_thread_limit)
+            .order_by(ranked.c.timestamp.desc(), ranked.c.id.desc())
+        )
+    else:
+        stmt = stmt.order_by(
+            messages_table.c.timestamp.desc(), messages_table.c.id.desc()
+        )
+    stmt = stmt.limit(limit)
+    with ENGINE.connect() as conn:
+        result = conn.execute(stmt)
+        return [_row_to_message_with_participants(row) for row in result]
+
+
 def delete_message(message_id: int) -> None:
     """Delete a message from the database."""
     stmt = delete(messages_table).where(messages_table.c.id == message_id)
     with ENGINE.begin() as conn:
         conn.execute(stmt)
+    _run_hooks("messages", "delete", {"id": message_id})
 
 
 def delete_messages_more_recent(message_id: int) -> None:
     """Deletes the given message and all messages more recent than it in the same thread."""
-    subquery_thread_id = (
-        select(messages_table.c.thread_id)
-        .where(messages_table.c.id == message_id)
-        .scalar_subquery()
-    )
-    subquery_timestamp = (
-        select(messages_table.c.timestamp)
-        .where(messages_table.c.id == message_id)
-        .scalar_subquery()
+    # the message is read up front rather than in subqueries of the delete,
+    # which the planner may evaluate after the message itself has been deleted
+    select_stmt = select(messages_table.c.thread_id, messages_table.c.timestamp).where(
+        messages_table.c.id == message_id
     )
-
-    stmt = delete(messages_table).where(
-        (messages_table.c.id == message_id)
-        | (
-            (messages_table.c.thread_id == subquery_thread_id)
-            & (messages_table.c.timestamp > subquery_timestamp)
-        )
-    )
-
     with ENGINE.begin() as conn:
+        message = conn.execute(select_stmt).fetchone()
+        if message is None:
+            return
+        stmt = delete(messages_table).where(
+            (messages_table.c.id == message_id)
+            | (
+                (messages_table.c.thread_id == message.thread_id)
+                & (messages_table.c.timestamp > message.timestamp)
+            )
+        )
         conn.execute(stmt)
+    _run_hooks("messages", "delete", {"id": message_id, "thread_id": message.thread_id})
 
 
 def delete_scheduled_messages(thread_id: int) -> None:
@@ -134,6 +263,7 @@ def delete_scheduled_messages(thread_id: int) -> None:
     )
     with ENGINE.begin() as conn:
         conn.execute(stmt)
+    _run_hooks("messages", "delete", {"thread_id": thread_id})
 
 
 def update_message(message: Message) -> None:
@@ -141,7 +271,8 @@ def update_message(message: Message) -> None:
     stmt = (
         update(messages_table)
         .where(messages_table.c.id == message["id"])
-        .values(message)
+        .values(_with_token_count("messages", dict(message)))
     )
     with ENGINE.begin() as conn:
         conn.execute(stmt)
+    _run_hooks("messages", "update", dict(message))
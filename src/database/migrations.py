@@ -0,0 +1,125 @@
+"""
+Versioned schema migrations, bringing existing SQLite and PostgreSQL databases
+up to date with the table definitions in db_types.
+"""
+
+from typing import Any, Callable, List, Tuple
+
+from sqlalchemy import Connection, Engine, Table, func, insert, inspect, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from .db_types import (
+    comments_table,
+    events_table,
+    messages_table,
+    metadata_obj,
+    posts_table,
+    schema_version_table,
+)
+
+Migration = Tuple[int, str, Callable[[Connection], None]]
+
+
+def _add_columns(conn: Connection, table: Table, *columns: str) -> None:
+    """Add columns of a table's definition missing from the database."""
+    existing = {column["name"] for column in inspect(conn).get_columns(table.name)}
+    for name in columns:
+        if name not in existing:
+            column = table.c[name]
+            column_type = column.type.compile(dialect=conn.dialect)
+            conn.exec_driver_sql(
+                f"ALTER TABLE {table.name} ADD COLUMN {name} {column_type}"
+            )
+
+
+def _create_indexes(conn: Connection, *indexes: str) -> None:
+    """Create indexes of the table definitions missing from the database."""
+    by_name = {
+        index.name: index
+        for table in metadata_obj.sorted_tables
+        for index in table.indexes
+    }
+    for name in indexes:
+        by_name[name].create(conn, checkfirst=True)
+
+
+def _add_token_counts(conn: Connection) -> None:
+    for table in (messages_table, events_table, posts_table, comments_table):
+        _add_columns(conn, table, "token_count", "tokenizer")
+
+
+def _add_hot_path_indexes(conn: Connection) -> None:
+    _create_indexes(
+        conn,
+        "ix_messages_thread_id_timestamp",
+        "ix_events_char_id_timestamp",
+        "ix_posts_char_id_timestamp",
+        "ix_comments_post_id",
+        "ix_threads_user_id_char_id_started",
+        "ix_likes_user_id_content_liked_post_id",
+        "ix_likes_user_id_content_liked_comment_id",
+        "ix_likes_post_id",
+        "ix_likes_comment_id",
+        "ix_users_username",
+        "ix_characters_path_name",
+    )
+
+
+# Applied in order, each once. As create_db creates missing tables from the
+# current definitions first, migrations skip whatever already exists.
+MIGRATIONS: List[Migration] = [
+    (1, "add token counts", _add_token_counts),
+    (2, "add indexes for hot query paths", _add_hot_path_indexes),
+]
+
+
+def schema_version(engine: Engine) -> int:
+    """Return the version of the newest migration applied to the database."""
+    stmt = select(func.max(schema_version_table.c.version))
+    with engine.connect() as conn:
+        return conn.execute(stmt).scalar() or 0
+
+
+def migrate(engine: Engine) -> List[int]:
+    """
+    Apply the migrations newer than the database's schema version, each in its
+    own transaction. Returns the versions applied.
+    """
+    schema_version_table.create(engine, checkfirst=True)
+    current = schema_version(engine)
+    applied = []
+    for version, description, upgrade in MIGRATIONS:
+        if version <= current:
+            continue
+        with engine.begin() as conn:
+            upgrade(conn)
+            conn.execute(
+                insert(schema_version_table).values(
+                    version=version, description=description
+                )
+            )
+        applied.append(version)
+    return applied
+
+
+def _format_statement(statement: Any) -> str:
+    """Compile a statement with indented lines and no trailing whitespace."""
+    lines = str(statement).strip().replace("\t", "    ").splitlines()
+    return "\n".join(line.rstrip() for line in lines) + ";"
+
+
+def schema_sql(dialect: str) -> str:
+    """
+    Return the statements creating the current schema in a dialect,
+    "sqlite" or "postgresql", as kept in the sql directory.
+    """
+    compiler = {"sqlite": sqlite.dialect(), "postgresql": postgresql.dialect()}[dialect]
+    statements = []
+    for table in metadata_obj.sorted_tables:
+        create = CreateTable(table, if_not_exists=True)
+        statements.append(_format_statement(create.compile(dialect=compiler)))
+        for index in sorted(table.indexes, key=lambda index: str(index.name)):
+            create_index = CreateIndex(index, if_not_exists=True)
+            statements.append(_format_statement(create_index.compile(dialect=compiler)))
+    return "\n\n".join(statements) + "\n"
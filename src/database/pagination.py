@@ -0,0 +1,87 @@
+"""
+Query options shared by the select functions, including keyset pagination:
+a page starts after the (timestamp, id) of the last row of the previous page,
+given as an opaque cursor, so every page costs the same however deep it is.
+"""
+
+import base64
+import binascii
+from datetime import datetime
+from typing import Any, Mapping, Sequence, Tuple
+
+from sqlalchemy import Column, Select, Table
+
+from .db_types import QueryOptions
+
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    """Return the cursor of the page after a row."""
+    key = f"{timestamp.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(key).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Return the (timestamp, id) of the row a cursor follows."""
+    try:
+        key = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, row_id = key.rsplit("|", 1)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f"invalid cursor: {cursor}") from e
+
+
+def next_cursor(
+    rows: Sequence[Mapping[str, Any]],
+    options: QueryOptions,
+    key: str = "timestamp",
+) -> str | None:
+    """
+    Return the cursor of the page after rows selected with the options,
+    or None if they were the last page. key names the timestamp of the rows.
+    """
+    if not options.get("limit") or len(rows) < options["limit"]:
+        return None
+    return encode_cursor(rows[-1][key], rows[-1]["id"])
+
+
+def _apply_query_options(
+    stmt: Select,
+    table: Table,
+    options: QueryOptions,
+    timestamp: Column | None = None,
+) -> Select:
+    """
+    Apply the limit, offset, order and cursor of the options to a statement.
+    With a cursor, rows are ordered by (timestamp, id) and start after it.
+    """
+    if timestamp is None:
+        timestamp = table.c.timestamp
+    descending = options.get("order") == "desc"
+    if options.get("cursor"):
+        if options.get("orderby", timestamp.name) != timestamp.name:
+            raise ValueError(f"cursors only page through {timestamp.name} order")
+        after_timestamp, after_id = decode_cursor(options["cursor"])
+        if descending:
+            stmt = stmt.where(
+                (timestamp < after_timestamp)
+                | ((timestamp == after_timestamp) & (table.c.id < after_id))
+            )
+        else:
+            stmt = stmt.where(
+                (timestamp > after_timestamp)
+                | ((timestamp == after_timestamp) & (table.c.id > after_id))
+            )
+    if options.get("cursor") or options.get("orderby") == timestamp.name:
+        # ties are broken by id, so pages line up with the cursor
+        if descending:
+            stmt = stmt.order_by(timestamp.desc(), table.c.id.desc())
+        else:
+            stmt = stmt.order_by(timestamp.asc(), table.c.id.asc())
+    elif options.get("orderby"):
+        column = getattr(table.c, options["orderby"])
+        stmt = stmt.order_by(column.desc() if descending else column.asc())
+    if options.get("limit"):
+        stmt = stmt.limit(options["limit"])
+    if options.get("offset"):
+        stmt = stmt.offset(options["offset"])
+    return stmt
@@ -6,7 +6,10 @@ from sqlalchemy import insert, select
 from sqlalchemy.engine import Row
 
 from .db_types import Post, QueryOptions, posts_table
+from .hooks import _run_hooks
 from .main import ENGINE
+from .pagination import _apply_query_options
+from .tokens import _with_token_count
 
 
 def _row_to_post(row: Row[Any]) -> Post:
@@ -25,10 +28,15 @@ def _row_to_post(row: Row[Any]) -> Post:
 
 def insert_post(values: Post) -> int:
     """Insert a post into the database."""
-    stmt = insert(posts_table).values(values)
+    stmt = (
+        insert(posts_table)
+        .values(_with_token_count("posts", dict(values)))
+        .returning(posts_table)
+    )
     with ENGINE.begin() as conn:
-        result = conn.execute(stmt)
-        return result.inserted_primary_key[0]
+        post = _row_to_post(conn.execute(stmt).one())
+    _run_hooks("posts", "insert", dict(post))
+    return post["id"]
 
 
 def select_post(post_id: int) -> Post:
@@ -61,15 +69,7 @@ def select_posts(
     for key, value in post_query.items():
         conditions.append(getattr(posts_table.c, key) == value)
     stmt = select(posts_table).where(*conditions)
-    if options.get("limit"):
-        stmt = stmt.limit(options["limit"])
-    if options.get("offset"):
-        stmt = stmt.offset(options["offset"])
-    if options.get("orderby"):
-        if options.get("order") == "desc":
-            stmt = stmt.order_by(getattr(posts_table.c, options["orderby"]).desc())
-        else:
-            stmt = stmt.order_by(getattr(posts_table.c, options["orderby"]).asc())
+    stmt = _apply_query_options(stmt, posts_table, options)
     with ENGINE.connect() as conn:
         result = conn.execute(stmt)
         return [_row_to_post(row) for row in result]
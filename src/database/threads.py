@@ -1,12 +1,13 @@
 """Database operations for the threads table."""
 
-from typing import Any, List
+from typing import Any, Dict, Iterable, List
 
 from sqlalchemy import insert, select
 from sqlalchemy.engine import Row
 
 from .db_types import QueryOptions, Thread, threads_table
 from .main import ENGINE
+from .pagination import _apply_query_options
 
 
 def _row_to_thread(row: Row[Any]) -> Thread:
@@ -38,6 +39,14 @@ def select_thread(thread_id: int) -> Thread:
         return _row_to_thread(thread)
 
 
+def select_threads_by_ids(thread_ids: Iterable[int]) -> Dict[int, Thread]:
+    """Select several threads by id in one query, keyed by id."""
+    stmt = select(threads_table).where(threads_table.c.id.in_(set(thread_ids)))
+    with ENGINE.connect() as conn:
+        result = conn.execute(stmt)
+        return {row.id: _row_to_thread(row) for row in result}
+
+
 def select_threads(
     thread_query: Thread = Thread(), options: QueryOptions = QueryOptions()
 ) -> List[Thread]:
@@ -46,15 +55,7 @@ def select_threads(
     for key, value in thread_query.items():
         conditions.append(getattr(threads_table.c, key) == value)
     stmt = select(threads_table).where(*conditions)
-    if options.get("limit"):
-        stmt = stmt.limit(options["limit"])
-    if options.get("offset"):
-        stmt = stmt.offset(options["offset"])
-    if options.get("orderby"):
-        if options.get("order") == "desc":
-            stmt = stmt.order_by(getattr(threads_table.c, options["orderby"]).desc())
-        else:
-            stmt = stmt.order_by(getattr(threads_table.c, options["orderby"]).asc())
+    stmt = _apply_query_options(stmt, threads_table, options, threads_table.c.started)
     with ENGINE.connect() as conn:
         result = conn.execute(stmt)
         return [_row_to_thread(row) for row in result]
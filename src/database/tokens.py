@@ -0,0 +1,85 @@
+"""
+Token counts stored alongside the text of messages, events, posts and comments,
+so context windows can be chosen in SQL rather than by tokenizing whole histories.
+"""
+
+from typing import Any, Callable, Dict, Tuple
+
+from sqlalchemy import Table, or_, select, update
+
+from .db_types import comments_table, events_table, messages_table, posts_table
+from .main import ENGINE
+
+TokenCounter = Callable[[str], int]
+
+# Tables with token counts, and the columns holding their text
+COUNTED_TABLES: Dict[str, Tuple[Table, Tuple[str, ...]]] = {
+    "messages": (messages_table, ("content",)),
+    "events": (events_table, ("content",)),
+    "posts": (posts_table, ("content", "image_description")),
+    "comments": (comments_table, ("content",)),
+}
+
+_COUNTER: Tuple[str, TokenCounter] | None = None
+
+
+def register_token_counter(tokenizer: str, counter: TokenCounter) -> None:
+    """
+    Count the tokens of every row inserted from now on with the counter,
+    recording the id of its tokenizer alongside the count.
+    """
+    global _COUNTER  # pylint: disable=global-statement
+    _COUNTER = (tokenizer, counter)
+
+
+def current_tokenizer() -> str | None:
+    """Return the id of the tokenizer counting inserted rows, if any."""
+    return _COUNTER[0] if _COUNTER else None
+
+
+def _with_token_count(table: str, values: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Return the values of a row to insert or update, with its token count
+    filled in if a counter is registered and the values include its text.
+    """
+    _, columns = COUNTED_TABLES[table]
+    if _COUNTER is None or not any(column in values for column in columns):
+        return values
+    tokenizer, counter = _COUNTER
+    text = "\n".join(values[column] for column in columns if values.get(column))
+    return {**values, "token_count": counter(text), "tokenizer": tokenizer}
+
+
+def backfill_token_counts(batch_size: int = 500) -> Dict[str, int]:
+    """
+    Count the tokens of existing rows without a count from the current
+    tokenizer, a batch at a time. Returns the number of rows counted per table.
+    """
+    if _COUNTER is None:
+        raise ValueError("No token counter registered.")
+    tokenizer, counter = _COUNTER
+    counted = {}
+    for name, (table, columns) in COUNTED_TABLES.items():
+        counted[name] = 0
+        stale = or_(table.c.tokenizer.is_(None), table.c.tokenizer != tokenizer)
+        stmt = (
+            select(table.c.id, *[table.c[column] for column in columns])
+            .where(stale)
+            .order_by(table.c.id)
+            .limit(batch_size)
+        )
+        while True:
+            with ENGINE.connect() as conn:
+                rows = conn.execute(stmt).fetchall()
+            if not rows:
+                break
+            with ENGINE.begin() as conn:
+                for row in rows:
+                    text = "\n".join(value for value in row[1:] if value)
+                    conn.execute(
+                        update(table)
+                        .where(table.c.id == row.id)
+                        .values(token_count=counter(text), tokenizer=tokenizer)
+                    )
+            counted[name] += len(rows)
+    return counted
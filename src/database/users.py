@@ -1,6 +1,6 @@
 """Database operations for the users table."""
 
-from typing import Any
+from typing import Any, Dict, Iterable
 
 from sqlalchemy import insert, select, update
 from sqlalchemy.engine import Row
@@ -49,6 +49,14 @@ def select_user_by_id(user_id: int) -> User:
         return _row_to_user(user)
 
 
+def select_users_by_ids(user_ids: Iterable[int]) -> Dict[int, User]:
+    """Select several users by id in one query, keyed by id."""
+    stmt = select(users_table).where(users_table.c.id.in_(set(user_ids)))
+    with ENGINE.connect() as conn:
+        result = conn.execute(stmt)
+        return {row.id: _row_to_user(row) for row in result}
+
+
 def update_user(user: User) -> None:
     """Update a user in the database."""
     stmt = update(users_table).where(users_table.c.id == user["id"]).values(user)
@@ -22,9 +22,10 @@ def get_comments_by_post(post_id: int) -> Response:
     except ValueError:
         return make_response("post not found", 404)
     comments = db.select_comments(db.Comment(post_id=post_id))
+    characters = db.select_characters_by_ids(c["char_id"] for c in comments)
     response: List[Comment] = []
     for comment in comments:
-        character = db.select_character_by_id(comment["char_id"])
+        character = characters[comment["char_id"]]
         response.append(
             {
                 "id": comment["id"],
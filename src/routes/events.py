@@ -4,19 +4,20 @@ from flask import Response, jsonify, make_response, request
 
 import database as db
 
-from .main import bp
+from .main import _create_query_params, _make_page_response, bp
 
 
 @bp.route("/v1/events", methods=["GET"])
 def get_events() -> Response:
-    """Get events, optionally with a query."""
+    """Get events, optionally with a query, a page at a time with a limit."""
     query_params = request.args.to_dict()
     try:
         event_query = _create_event_query_params(query_params)
+        options = _create_query_params(query_params)
     except ValueError:
         return make_response(jsonify([]), 200)
-    events = db.select_events(event_query)
-    return make_response(jsonify(events), 200)
+    events = db.select_events(event_query, options)
+    return _make_page_response(events, events, options)
 
 
 def _create_event_query_params(query_params: dict[str, str]) -> db.Event:
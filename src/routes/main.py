@@ -1,8 +1,9 @@
 """Sets up routing blueprint and holds miscellaneous routes."""
 
 from datetime import timedelta
+from typing import Any, Mapping, Sequence
 
-from flask import Blueprint, Response, g, make_response, request
+from flask import Blueprint, Response, g, jsonify, make_response, request
 from google.cloud import storage
 
 import database as db
@@ -48,9 +49,29 @@ def _create_query_params(query_params: dict[str, str]) -> db.QueryOptions:
         options["orderby"] = query_params["orderby"]
     if "order" in query_params:
         options["order"] = query_params["order"]
+    if "cursor" in query_params:
+        db.decode_cursor(query_params["cursor"])
+        options["cursor"] = query_params["cursor"]
     return options
 
 
+def _make_page_response(
+    body: Any,
+    rows: Sequence[Mapping[str, Any]],
+    options: db.QueryOptions,
+    key: str = "timestamp",
+) -> Response:
+    """
+    Make the response of a page of rows, with the cursor of the next page
+    in the X-Next-Cursor header if there is one.
+    """
+    response = make_response(jsonify(body), 200)
+    cursor = db.next_cursor(rows, options, key)
+    if cursor is not None:
+        response.headers["X-Next-Cursor"] = cursor
+    return response
+
+
 def _generate_gcs_signed_url(file_name: str, file_type: str) -> str:
     """Generates a signed URL for a file in the GCS bucket."""
     if file_type not in ("jpg", "jpeg", "png"):
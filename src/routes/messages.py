@@ -6,18 +6,22 @@ from flask import Response, g, jsonify, make_response, request
 
 import database as db
 
-from .main import bp
+from .main import _create_query_params, _make_page_response, bp
 
 
 @bp.route("/v1/threads/<int:thread_id>/messages", methods=["GET"])
 def get_messages_by_thread(thread_id: int) -> Response:
-    """Gets all messages for a thread."""
+    """Gets the messages of a thread, a page at a time with a limit."""
     try:
         db.select_thread(thread_id)
     except ValueError:
         return make_response("thread not found", 404)
-    messages = db.select_messages(db.Message(thread_id=thread_id))
-    return make_response(jsonify(messages), 200)
+    try:
+        options = _create_query_params(request.args.to_dict())
+    except ValueError:
+        return make_response(jsonify([]), 200)
+    messages = db.select_messages(db.Message(thread_id=thread_id), options)
+    return _make_page_response(messages, messages, options)
 
 
 @bp.route("/v1/threads/<int:thread_id>/messages", methods=["POST"])
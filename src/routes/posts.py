@@ -6,7 +6,7 @@ from flask import Response, jsonify, make_response, request
 
 import database as db
 
-from .main import _create_query_params, bp
+from .main import _create_query_params, _make_page_response, bp
 from .route_types import PostedBy, PostWithComments
 
 
@@ -21,7 +21,7 @@ def get_posts() -> Response:
         return make_response(jsonify([]), 200)
     posts = db.select_posts(post_query, options)
     response = _convert_posts_to_post_with_comments(posts)
-    return make_response(jsonify(response), 200)
+    return _make_page_response(response, posts, options)
 
 
 def _create_post_query_params(query_params: dict[str, str]) -> db.Post:
@@ -51,26 +51,32 @@ def _create_post_query_params(query_params: dict[str, str]) -> db.Post:
 def _convert_posts_to_post_with_comments(
     posts: List[db.Post],
 ) -> List[PostWithComments]:
-    """Converts a list of posts to a list of posts with comments."""
+    """
+    Converts a list of posts to a list of posts with comments.
+    The comments and characters of every post are selected in one query each.
+    """
+    comments_by_post = db.select_comments_from_posts(post["id"] for post in posts)
+    char_ids = {post["char_id"] for post in posts}
+    char_ids.update(c[0]["char_id"] for c in comments_by_post.values() if c)
+    characters = db.select_characters_by_ids(char_ids)
     posts_w_comments: PostWithComments = []
     for post in posts:
-        comment_character = db.select_character_by_id(post["char_id"])
         post_with_comments = {
             "id": post["id"],
             "timestamp": post["timestamp"],
-            "posted_by": _convert_character_to_posted_by(comment_character),
+            "posted_by": _convert_character_to_posted_by(characters[post["char_id"]]),
             "content": post["content"],
             "image_post": post["image_post"],
             "image_path": post["image_path"],
             "image_description": post["image_description"],
             "prompt": post["prompt"],
         }
-        comments = db.select_comments(db.Comment(post_id=post["id"]))
+        comments = comments_by_post.get(post["id"], [])
         count = len(comments)
         post_with_comments["comments_count"] = count
         post_with_comments["comments"] = []
         if count > 0:
-            comment_character = db.select_character_by_id(comments[0]["char_id"])
+            comment_character = characters[comments[0]["char_id"]]
             # only provide the first comment - others are obtained on request
             post_with_comments["comments"] = [
                 {
@@ -4,7 +4,7 @@ from flask import Response, jsonify, make_response, request
 
 import database as db
 
-from .main import _create_query_params, bp
+from .main import _create_query_params, _make_page_response, bp
 
 
 @bp.route("/v1/threads", methods=["POST"])
@@ -37,7 +37,7 @@ def get_threads() -> Response:
     except ValueError:
         return make_response(jsonify([]), 200)
     threads = db.select_threads(thread_query, options)
-    return make_response(jsonify(threads), 200)
+    return _make_page_response(threads, threads, options, key="started")
 
 
 def _create_thread_params(query_params: dict[str, str]) -> db.Thread:
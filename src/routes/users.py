@@ -55,9 +55,10 @@ def get_threads_by_user(username: str) -> Response:
     thread_query["user_id"] = user["id"]
     options = _create_query_params(query_params)
     threads = db.select_threads(thread_query, options)
+    characters = db.select_characters_by_ids(t["char_id"] for t in threads)
     response = []
     for thread in threads:
-        character = db.select_character_by_id(thread["char_id"])
+        character = characters[thread["char_id"]]
         response.append(
             {
                 "id": thread["id"],
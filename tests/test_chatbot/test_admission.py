@@ -0,0 +1,49 @@
+"""This file contains the tests for the chatbot/admission.py file."""
+
+# pylint: disable=redefined-outer-name unused-argument unused-import
+
+import importlib
+from unittest.mock import MagicMock
+
+admission_module = importlib.import_module("chatbot.admission")
+AdmissionController = getattr(admission_module, "AdmissionController")
+
+
+def _model(queue_depth: int, latency: float | None) -> MagicMock:
+    """Model stand-in under the given load."""
+    model = MagicMock()
+    model.queue_depth.return_value = queue_depth
+    model.router.recent_latency.return_value = latency
+    return model
+
+
+def test_admits_under_thresholds() -> None:
+    """Test jobs run while the model isn't saturated."""
+    controller = AdmissionController(_model(3, None), max_queue_depth=4, max_latency=10)
+    assert controller.decide(1, "thought") == "admit"
+    controller.model = _model(3, 9.9)
+    assert controller.decide(1, "post") == "admit"
+    assert controller.stats == {"admitted": 2, "postponed": 0, "shed": 0}
+
+
+def test_sheds_when_queue_is_deep() -> None:
+    """Test frequent jobs are shed, and recorded, when the queue is too deep."""
+    controller = AdmissionController(_model(4, 1.0), max_queue_depth=4)
+    assert controller.decide(1, "thought") == "shed"
+    assert controller.decide(2, "event") == "shed"
+    shed = controller.shed_jobs()
+    assert [(job["char_id"], job["kind"]) for job in shed] == [
+        (1, "thought"),
+        (2, "event"),
+    ]
+    assert shed[0]["queue_depth"] == 4
+    assert shed[0]["latency"] == 1.0
+
+
+def test_postpones_rare_jobs_when_slow() -> None:
+    """Test rare jobs are postponed a limited number of times before being shed."""
+    controller = AdmissionController(_model(0, 30.0), max_latency=10, max_postpones=2)
+    assert controller.decide(1, "post", postponed=0) == "postpone"
+    assert controller.decide(1, "post", postponed=1) == "postpone"
+    assert controller.decide(1, "post", postponed=2) == "shed"
+    assert controller.stats == {"admitted": 0, "postponed": 2, "shed": 1}
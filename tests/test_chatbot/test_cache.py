@@ -0,0 +1,43 @@
+"""This file contains the tests for the chatbot/cache.py file."""
+
+# pylint: disable=redefined-outer-name unused-argument unused-import
+
+import importlib
+
+cache_module = importlib.import_module("chatbot.cache")
+LRUCache = getattr(cache_module, "LRUCache")
+
+
+def test_get_and_put() -> None:
+    """Test values can be cached and retrieved."""
+    cache = LRUCache(2)
+    assert cache.get("a") is None
+    cache.put("a", 1)
+    assert cache.get("a") == 1
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+
+def test_evicts_least_recently_used() -> None:
+    """Test the least recently used entry is evicted when full."""
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+    assert cache.stats()["evictions"] == 1
+
+
+def test_clear() -> None:
+    """Test clearing the cache removes every entry."""
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.clear()
+    assert cache.get("a") is None
+    assert len(cache) == 0
@@ -0,0 +1,149 @@
+"""This file contains the tests for the chatbot/context.py file."""
+
+# pylint: disable=redefined-outer-name unused-argument unused-import protected-access
+
+import importlib
+import json
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+
+import database as db
+from tests.test_database.fixtures import (
+    character,
+    characters,
+    comments,
+    post,
+    posts,
+    thread,
+    user,
+)
+from tests.test_database.test_main import test_db
+
+context_module = importlib.import_module("chatbot.context")
+ContextStore = getattr(context_module, "ContextStore")
+build_feed_snapshot = getattr(context_module, "build_feed_snapshot")
+
+
+@patch("database.select_thread")
+@patch("database.select_character_by_id")
+@patch("database.select_user_by_id")
+def test_message_to_chatmessage(
+    mock_select_user_by_id: MagicMock,
+    mock_select_character_by_id: MagicMock,
+    mock_select_thread: MagicMock,
+) -> None:
+    """Test the _message_to_chatmessage function doesn't query the database."""
+    message = db.MessageWithParticipants(
+        id=1,
+        thread_id=1,
+        role="user",
+        content="Hi!",
+        timestamp=datetime.now(timezone.utc) - timedelta(minutes=20),
+        char_id=1,
+        user_id=1,
+        char_name="test character",
+        username="test user",
+    )
+    chat_message = context_module._message_to_chatmessage(message)
+    content = json.loads(chat_message["content"])
+    assert chat_message["role"] == message["role"]
+    assert chat_message["timestamp"] == message["timestamp"]
+    assert content["sent_by"] == "test user"
+    assert content["sent_to"] == "test character"
+    assert not mock_select_thread.called
+    assert not mock_select_character_by_id.called
+    assert not mock_select_user_by_id.called
+
+
+def test_messages_window_appends_inserts(thread: db.Thread) -> None:
+    """Test inserted messages are appended to a loaded window."""
+    store = ContextStore()
+    store.register_hooks()
+    db.insert_message(db.Message(thread_id=thread["id"], content="first", role="user"))
+    assert len(store.messages(thread["char_id"])) == 1
+    db.insert_message(
+        db.Message(thread_id=thread["id"], content="second", role="assistant")
+    )
+    with patch("chatbot.context._load_messages") as mock_load_messages:
+        messages = store.messages(thread["char_id"])
+        assert not mock_load_messages.called
+    assert [json.loads(m["content"])["message"] for m in messages] == [
+        "first",
+        "second",
+    ]
+    assert store.stats()["hits"] == 1
+    assert store.stats()["misses"] == 1
+
+
+def test_messages_window_invalidated_on_delete(thread: db.Thread) -> None:
+    """Test deleting a message drops the window holding it."""
+    store = ContextStore()
+    store.register_hooks()
+    message_id = db.insert_message(
+        db.Message(thread_id=thread["id"], content="first", role="user")
+    )
+    assert len(store.messages(thread["char_id"])) == 1
+    db.delete_message(message_id)
+    assert store.messages(thread["char_id"]) == []
+    assert store.stats()["misses"] == 2
+
+
+def test_events_window_appends_inserts(character: db.Character) -> None:
+    """Test inserted events are appended to a loaded window."""
+    store = ContextStore()
+    store.register_hooks()
+    assert store.events(character["id"]) == []
+    db.insert_event(
+        db.Event(char_id=character["id"], type="thought", content="test thought")
+    )
+    events = store.events(character["id"])
+    assert len(events) == 1
+    assert json.loads(events[0]["content"])["event"] == "test thought"
+    assert store.stats()["hit_rate"] == 0.5
+
+
+def test_posts_feed_refreshes_comments(post: db.Post) -> None:
+    """Test commenting on a post re-serializes it in loaded feeds."""
+    store = ContextStore()
+    store.register_hooks()
+    assert json.loads(store.posts()[0]["content"])["comments"] == []
+    db.insert_comment(
+        db.Comment(post_id=post["id"], char_id=post["char_id"], content="nice")
+    )
+    comments = json.loads(store.posts()[0]["content"])["comments"]
+    assert comments[0]["comment"] == "nice"
+    assert store.stats()["misses"] == 1
+
+
+@patch("database.select_character_by_id", side_effect=AssertionError)
+def test_posts_loaded_in_batch(
+    mock_select_character_by_id: MagicMock,
+    characters: list[db.Character],
+    comments: list[db.Comment],
+) -> None:
+    """Test a feed is serialized from batched queries rather than per post."""
+    store = ContextStore()
+    feed = {}
+    for message in store.posts():
+        content = json.loads(message["content"])
+        feed[content["id"]] = content
+    assert len(feed) == 3
+    first, second = comments[0]["post_id"], comments[2]["post_id"]
+    assert [c["commented_by"] for c in feed[first]["comments"]] == [
+        characters[0]["name"],
+        characters[1]["name"],
+    ]
+    assert feed[second]["comments"][0]["comment"] == "test comment 3"
+    assert sum(len(post["comments"]) for post in feed.values()) == 3
+
+
+def test_build_feed_snapshot(post: db.Post) -> None:
+    """Test the snapshot holds the global feed with each post's token count."""
+    model = MagicMock()
+    model.message_token_count.return_value = 7
+    with patch.object(context_module, "CONTEXT_STORE", ContextStore()):
+        snapshot = build_feed_snapshot(model)
+        assert build_feed_snapshot()["token_counts"] == []
+    assert len(snapshot["posts"]) == 1
+    assert json.loads(snapshot["posts"][0]["content"])["id"] == post["id"]
+    assert snapshot["token_counts"] == [7]
@@ -0,0 +1,85 @@
+"""This file contains the tests for the chatbot/coordinator.py file."""
+
+# pylint: disable=redefined-outer-name unused-argument unused-import
+
+import importlib
+import threading
+import time
+from datetime import timedelta
+from typing import Callable, List, Tuple
+from unittest.mock import MagicMock
+
+coordinator_module = importlib.import_module("chatbot.coordinator")
+ResponseCoordinator = getattr(coordinator_module, "ResponseCoordinator")
+
+
+class _BlockingCycle:
+    """Response cycle stand-in that blocks until released."""
+
+    def __init__(self) -> None:
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calls: List[Tuple[int, timedelta | None, bool]] = []
+
+    def __call__(
+        self,
+        model: MagicMock,
+        thread_id: int,
+        duration: timedelta | None,
+        cancelled: Callable[[], bool],
+        priority: int = 0,
+    ) -> None:
+        self.started.set()
+        self.release.wait(timeout=5)
+        self.calls.append((thread_id, duration, cancelled()))
+
+
+def _wait_for(condition: Callable[[], bool]) -> None:
+    """Wait up to five seconds for a condition to hold."""
+    deadline = time.monotonic() + 5
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert condition()
+
+
+def test_single_cycle_runs() -> None:
+    """Test a triggered cycle runs with the given arguments."""
+    cycle = _BlockingCycle()
+    cycle.release.set()
+    coordinator = ResponseCoordinator(MagicMock(), cycle)
+    coordinator.trigger(1, timedelta())
+    _wait_for(lambda: coordinator.in_flight() == 0)
+    assert cycle.calls == [(1, timedelta(), False)]
+    assert coordinator.in_flight() == 0
+
+
+def test_new_trigger_supersedes_in_flight_cycle() -> None:
+    """Test triggers during a cycle cancel it, and only the latest is run after."""
+    cycle = _BlockingCycle()
+    coordinator = ResponseCoordinator(MagicMock(), cycle)
+    coordinator.trigger(1)
+    assert cycle.started.wait(timeout=5)
+    coordinator.trigger(1, timedelta(minutes=1))
+    coordinator.trigger(1, timedelta(minutes=2))
+    assert coordinator.in_flight() == 1
+    cycle.release.set()
+    _wait_for(lambda: coordinator.in_flight() == 0)
+    assert cycle.calls == [(1, None, True), (1, timedelta(minutes=2), False)]
+    assert coordinator.stats == {
+        "triggered": 3,
+        "started": 2,
+        "superseded": 2,
+        "failed": 0,
+    }
+
+
+def test_threads_run_independently() -> None:
+    """Test cycles for different threads don't supersede each other."""
+    cycle = _BlockingCycle()
+    coordinator = ResponseCoordinator(MagicMock(), cycle)
+    coordinator.trigger(1)
+    coordinator.trigger(2)
+    assert coordinator.in_flight() == 2
+    cycle.release.set()
+    _wait_for(lambda: coordinator.in_flight() == 0)
+    assert sorted(cycle.calls) == [(1, None, False), (2, None, False)]
@@ -0,0 +1,66 @@
+"""This file contains the tests for the chatbot/delay.py file."""
+
+# pylint: disable=redefined-outer-name unused-argument unused-import protected-access
+
+import importlib
+from datetime import datetime, timedelta, timezone
+import database as db
+from tests.test_database.fixtures import character, thread, user
+from tests.test_database.test_main import test_db
+
+delay_module = importlib.import_module("chatbot.delay")
+historical_delay = getattr(delay_module, "historical_delay")
+DEFAULT_DELAY = getattr(delay_module, "DEFAULT_DELAY")
+
+NOW = datetime(2024, 6, 1, 15, tzinfo=timezone.utc)
+
+
+def _insert_reply(thread_id: int, sent: datetime, gap: timedelta) -> None:
+    """Insert a user message, and a reply to it after a gap."""
+    db.insert_message(
+        db.Message(thread_id=thread_id, content="Hi!", role="user", timestamp=sent)
+    )
+    db.insert_message(
+        db.Message(
+            thread_id=thread_id,
+            content="Hello!",
+            role="assistant",
+            timestamp=sent + gap,
+        )
+    )
+
+
+def test_historical_delay_without_history(thread: db.Thread) -> None:
+    """Test the default delay is used when the character has never replied."""
+    assert historical_delay(thread, NOW) == DEFAULT_DELAY
+
+
+def test_historical_delay_from_thread(thread: db.Thread) -> None:
+    """Test the delay is sampled from the character's past replies."""
+    for day in range(1, 4):
+        _insert_reply(thread["id"], NOW - timedelta(days=day), timedelta(minutes=7))
+    # scheduled replies that haven't been sent yet are ignored
+    _insert_reply(thread["id"], NOW + timedelta(hours=1), timedelta(days=2))
+    assert historical_delay(thread, NOW) == timedelta(minutes=7)
+
+
+def test_historical_delay_prefers_time_of_day(thread: db.Thread) -> None:
+    """Test replies made at the same time of day are preferred."""
+    for day in range(1, 4):
+        afternoon = NOW - timedelta(days=day)
+        _insert_reply(thread["id"], afternoon, timedelta(minutes=2))
+        night = afternoon.replace(hour=2)
+        _insert_reply(thread["id"], night, timedelta(hours=6))
+    assert historical_delay(thread, NOW) == timedelta(minutes=2)
+    assert historical_delay(thread, NOW.replace(hour=3)) == timedelta(hours=6)
+
+
+def test_historical_delay_falls_back_to_character(thread: db.Thread) -> None:
+    """Test a new thread uses the character's replies in its other threads."""
+    for day in range(1, 4):
+        _insert_reply(thread["id"], NOW - timedelta(days=day), timedelta(hours=1))
+    new_thread_id = db.insert_thread(
+        db.Thread(user_id=thread["user_id"], char_id=thread["char_id"])
+    )
+    new_thread = db.select_thread(new_thread_id)
+    assert historical_delay(new_thread, NOW) == timedelta(hours=1)
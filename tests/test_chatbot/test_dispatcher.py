@@ -0,0 +1,149 @@
+"""This file contains the tests for the chatbot/dispatcher.py file."""
+
+# pylint: disable=redefined-outer-name unused-argument unused-import
+
+import importlib
+import threading
+from typing import List
+
+import pytest
+
+types_module = importlib.import_module("chatbot.types")
+ChatMessage = getattr(types_module, "ChatMessage")
+GenerationProfile = getattr(types_module, "GenerationProfile")
+Priority = getattr(types_module, "Priority")
+dispatcher_module = importlib.import_module("chatbot.dispatcher")
+InferenceDispatcher = getattr(dispatcher_module, "InferenceDispatcher")
+
+SHORT = GenerationProfile(max_new_tokens=16, stop_on_json=False, schema=None)
+LONG = GenerationProfile(max_new_tokens=256, stop_on_json=False, schema=None)
+
+
+def _echo_batch(
+    chats: List[List[ChatMessage]], profile: GenerationProfile
+) -> List[ChatMessage]:
+    """Respond to each chat with the content of its last message."""
+    return [
+        ChatMessage(role="assistant", content=chat[-1]["content"]) for chat in chats
+    ]
+
+
+def test_generate() -> None:
+    """Test a single chat is generated and returned to the caller."""
+    dispatcher = InferenceDispatcher(_echo_batch, window=0.01)
+    response = dispatcher.generate([ChatMessage(role="user", content="Hi!")], SHORT)
+    assert response["role"] == "assistant"
+    assert response["content"] == "Hi!"
+    assert dispatcher.stats == {"requests": 1, "batches": 1, "deferred": 0}
+
+
+def test_concurrent_chats_are_batched() -> None:
+    """Test chats submitted within the window share a single batch."""
+    batch_sizes = []
+
+    def generate_batch(
+        chats: List[List[ChatMessage]], profile: GenerationProfile
+    ) -> List[ChatMessage]:
+        batch_sizes.append(len(chats))
+        return _echo_batch(chats, profile)
+
+    dispatcher = InferenceDispatcher(generate_batch, window=0.5, max_batch_size=4)
+    futures = [
+        dispatcher.submit([ChatMessage(role="user", content=str(i))], SHORT)
+        for i in range(4)
+    ]
+    results = [future.result(timeout=5) for future in futures]
+    assert [result["content"] for result in results] == ["0", "1", "2", "3"]
+    assert batch_sizes == [4]
+
+
+def test_different_profiles_are_split() -> None:
+    """Test chats with different generation profiles are not batched together."""
+    calls = []
+
+    def generate_batch(
+        chats: List[List[ChatMessage]], profile: GenerationProfile
+    ) -> List[ChatMessage]:
+        calls.append((len(chats), profile["max_new_tokens"], profile["stop_on_json"]))
+        return _echo_batch(chats, profile)
+
+    dispatcher = InferenceDispatcher(generate_batch, window=0.5, max_batch_size=3)
+    futures = [
+        dispatcher.submit([ChatMessage(role="user", content="a")], SHORT),
+        dispatcher.submit(
+            [ChatMessage(role="user", content="b")],
+            GenerationProfile(max_new_tokens=16, stop_on_json=True, schema=None),
+        ),
+        dispatcher.submit([ChatMessage(role="user", content="c")], SHORT),
+    ]
+    for future in futures:
+        future.result(timeout=5)
+    assert sorted(calls) == [(1, 16, True), (2, 16, False)]
+
+
+def test_exception_is_returned_to_callers() -> None:
+    """Test a failing batch raises in every waiting caller."""
+
+    def generate_batch(
+        chats: List[List[ChatMessage]], profile: GenerationProfile
+    ) -> List[ChatMessage]:
+        raise ValueError("generation failed")
+
+    dispatcher = InferenceDispatcher(generate_batch, window=0.01)
+    with pytest.raises(ValueError):
+        dispatcher.generate([ChatMessage(role="user", content="Hi!")], SHORT)
+
+
+def test_urgent_chats_go_first() -> None:
+    """Test queued chats are generated by priority, then in submission order."""
+    calls = []
+    release = threading.Event()
+
+    def generate_batch(
+        chats: List[List[ChatMessage]], profile: GenerationProfile
+    ) -> List[ChatMessage]:
+        release.wait(timeout=5)
+        calls.append(chats[0][-1]["content"])
+        return _echo_batch(chats, profile)
+
+    dispatcher = InferenceDispatcher(generate_batch, window=0.01, max_batch_size=1)
+    first = dispatcher.submit([ChatMessage(role="user", content="first")], SHORT)
+    submitted = [
+        ("thought", Priority.BACKGROUND),
+        ("post", Priority.BACKGROUND),
+        ("now", Priority.RESPONSE_NOW),
+        ("reply", Priority.USER_REPLY),
+    ]
+    futures = [
+        dispatcher.submit([ChatMessage(role="user", content=content)], SHORT, priority)
+        for content, priority in submitted
+    ]
+    release.set()
+    for future in [first] + futures:
+        future.result(timeout=5)
+    assert calls == ["first", "reply", "now", "thought", "post"]
+
+
+def test_background_groups_are_deferred() -> None:
+    """Test background groups of a batch wait for a user chat queued meanwhile."""
+    calls = []
+    futures = []
+
+    def generate_batch(
+        chats: List[List[ChatMessage]], profile: GenerationProfile
+    ) -> List[ChatMessage]:
+        calls.append(chats[0][-1]["content"])
+        if not futures:
+            reply = [ChatMessage(role="user", content="reply")]
+            futures.append(dispatcher.submit(reply, LONG, Priority.USER_REPLY))
+        return _echo_batch(chats, profile)
+
+    dispatcher = InferenceDispatcher(generate_batch, window=0.2, max_batch_size=2)
+    background = [
+        dispatcher.submit([ChatMessage(role="user", content="short")], SHORT),
+        dispatcher.submit([ChatMessage(role="user", content="long")], LONG),
+    ]
+    for future in background + futures:
+        future.result(timeout=5)
+    assert calls[:2] == ["short", "reply"]
+    assert dispatcher.stats["deferred"] == 1
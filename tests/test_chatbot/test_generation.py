@@ -0,0 +1,91 @@
+"""This file contains the tests for the chatbot/generation.py file."""
+
+# pylint: disable=redefined-outer-name unused-argument unused-import
+
+import importlib
+from typing import List
+
+import torch
+
+generation_module = importlib.import_module("chatbot.generation")
+JsonObjectScanner = getattr(generation_module, "JsonObjectScanner")
+JsonObjectStoppingCriteria = getattr(generation_module, "JsonObjectStoppingCriteria")
+JsonSchemaValidator = getattr(generation_module, "JsonSchemaValidator")
+JsonSchemaLogitsProcessor = getattr(generation_module, "JsonSchemaLogitsProcessor")
+RESPONSE_SCHEMAS = getattr(generation_module, "RESPONSE_SCHEMAS")
+
+
+class _CharTokenizer:
+    """Tokenizer stand-in where each token id is a character code."""
+
+    all_special_ids = [0]
+
+    def decode(self, tokens: List[int], skip_special_tokens: bool = False) -> str:
+        """Decode token ids back into text."""
+        return "".join(chr(token) for token in tokens if token)
+
+
+def test_scanner_closes_after_object() -> None:
+    """Test the scanner reports the object closed only after its final brace."""
+    scanner = JsonObjectScanner()
+    assert not scanner.feed('Sure! {"message": "a }')
+    assert not scanner.feed(' \\" {", "list": [1, {"a": [2]}]')
+    assert scanner.feed("}")
+    assert scanner.feed(" trailing text")
+
+
+def test_scanner_ignores_text_before_object() -> None:
+    """Test quotes and brackets before the object don't affect the scanner."""
+    scanner = JsonObjectScanner()
+    assert not scanner.feed('"quoted" [list] ')
+    assert scanner.feed('{"postID": 1}')
+
+
+def test_stopping_criteria_stops_each_sequence() -> None:
+    """Test each sequence of a batch is stopped when its own object closes."""
+    prompt = [ord(c) for c in "prompt"]
+    outputs = ['{"a": 1}', '{"a": "}"}']
+    criteria = JsonObjectStoppingCriteria(_CharTokenizer())
+    stopped_at = [None, None]
+    for step in range(1, max(len(output) for output in outputs) + 1):
+        input_ids = torch.tensor(
+            [prompt + [ord(c) for c in output.ljust(10)[:step]] for output in outputs]
+        )
+        done = criteria(input_ids, torch.zeros(1))
+        for i, stopped in enumerate(done.tolist()):
+            if stopped and stopped_at[i] is None:
+                stopped_at[i] = step
+    assert stopped_at == [len(outputs[0]), len(outputs[1])]
+
+
+def test_schema_validator() -> None:
+    """Test the validator accepts prefixes of valid objects only."""
+    validator = JsonSchemaValidator(RESPONSE_SCHEMAS["chat_timed"])
+    state = validator.feed(validator.initial, ' {"delay": "1h", "mess')
+    assert state is not None
+    assert validator.feed(state, 'age": "a \\" }"}').mode == "done"
+    assert validator.feed(validator.initial, "Sure!") is None
+    assert validator.feed(validator.initial, '{"unknown": "a"}') is None
+    assert validator.feed(validator.initial, '{"delay": "1h"}') is None
+    assert validator.feed(validator.initial, '{"delay": 1}') is None
+    choice = JsonSchemaValidator(RESPONSE_SCHEMAS["comment_choice"])
+    assert choice.feed(choice.initial, '{"postID": 12 }').mode == "done"
+    assert choice.feed(choice.initial, '{"postID": "12"}') is None
+
+
+def test_logits_processor_masks_invalid_tokens() -> None:
+    """Test the most likely valid token is chosen, and corrections are counted."""
+    tokenizer = _CharTokenizer()
+    processor = JsonSchemaLogitsProcessor(
+        tokenizer, RESPONSE_SCHEMAS["comment_choice"], top_k=5
+    )
+    generated = [ord("p")]
+    for char in '{"postID": 7}':
+        # the model always prefers "S" (as in "Sure!"), then the expected character
+        scores = torch.zeros(1, 128)
+        scores[0, ord("S")] = 2
+        scores[0, ord(char)] = 1
+        scores = processor(torch.tensor([generated]), scores)
+        generated.append(int(scores[0].argmax()))
+    assert tokenizer.decode(generated[1:]) == '{"postID": 7}'
+    assert processor.corrected == 1
@@ -0,0 +1,150 @@
+"""This file contains the tests for the chatbot/images.py file."""
+
+# pylint: disable=redefined-outer-name unused-argument unused-import protected-access
+
+import importlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from io import BytesIO
+from typing import Any, Dict, Generator, List
+from unittest.mock import MagicMock, patch
+
+import pytest
+from google.cloud import storage
+
+from .fixtures import image_stream
+
+images_module = importlib.import_module("chatbot.images")
+ImageJobTracker = getattr(images_module, "ImageJobTracker")
+_upload_image_to_gcs = getattr(images_module, "_upload_image_to_gcs")
+
+
+class _ImageHandler(BaseHTTPRequestHandler):
+    """Serves the test image to every GET request."""
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        """Respond with the image bytes."""
+        with open("tests/test_chatbot/test_image.jpg", "rb") as image_file:
+            content = image_file.read()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args: Any) -> None:
+        """Keep the test output quiet."""
+
+
+@pytest.fixture
+def blob_url() -> Generator[str, None, None]:
+    """Serves the test image locally, yielding its URL."""
+    server = HTTPServer(("127.0.0.1", 0), _ImageHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/image.jpg"
+    server.shutdown()
+
+
+class FakeCivitai:
+    """Local fake of the Civitai jobs API, replaying a list of job states."""
+
+    def __init__(self, blob_url: str, states: List[str]) -> None:
+        self.blob_url = blob_url
+        self.states = states
+        self.created: List[Dict[str, Any]] = []
+        self.polls = 0
+
+    def create(self, civitai_input: Dict[str, Any]) -> Dict[str, Any]:
+        """Record the job and return its token."""
+        self.created.append(civitai_input)
+        return {"token": f"token-{len(self.created)}"}
+
+    def get(self, token: str) -> Dict[str, Any]:
+        """Return the next state of the job."""
+        state = self.states[min(self.polls, len(self.states) - 1)]
+        self.polls += 1
+        return {
+            "jobs": [
+                {
+                    "scheduled": state != "failed",
+                    "result": {
+                        "available": state == "available",
+                        "blobUrl": self.blob_url,
+                    },
+                }
+            ]
+        }
+
+
+@patch("database.posts.update_post_with_image_path")
+def test_completed_job_updates_post(
+    mock_update_post_with_image_path: MagicMock, blob_url: str
+) -> None:
+    """Test a job is polled until available, then uploaded and added to the post."""
+    client = FakeCivitai(blob_url, ["scheduled", "scheduled", "available"])
+    upload = MagicMock()
+    tracker = ImageJobTracker(client, upload=upload, base_delay=0.01)
+    token = tracker.submit({"model": "test"}, 1, "test")
+    assert token == "token-1"
+    assert tracker.join(timeout=5)
+    assert client.polls == 3
+    destination_blob_name = "test/posts/1.jpg"
+    assert upload.call_args[0][1] == destination_blob_name
+    assert len(upload.call_args[0][0].getvalue()) > 0
+    mock_update_post_with_image_path.assert_called_once_with(1, destination_blob_name)
+    assert tracker.stats == {"submitted": 1, "completed": 1, "failed": 0}
+
+
+@patch("database.posts.update_post_with_image_path")
+def test_failed_job_is_dropped(
+    mock_update_post_with_image_path: MagicMock, blob_url: str
+) -> None:
+    """Test a job Civitai failed to schedule stops being polled."""
+    client = FakeCivitai(blob_url, ["failed"])
+    tracker = ImageJobTracker(client, upload=MagicMock(), base_delay=0.01)
+    tracker.submit({"model": "test"}, 1, "test")
+    assert tracker.join(timeout=5)
+    assert client.polls == 1
+    assert not mock_update_post_with_image_path.called
+    assert tracker.stats["failed"] == 1
+
+
+def test_poll_backs_off(blob_url: str) -> None:
+    """Test pending jobs are polled with exponential backoff."""
+    client = FakeCivitai(blob_url, ["scheduled"])
+    tracker = ImageJobTracker(client, base_delay=60, max_delay=200, max_attempts=4)
+    tracker.track(1, "token", "test")
+    now = time.monotonic() + 60
+    delays = []
+    for _ in range(3):
+        tracker.poll(now)
+        job = tracker.outstanding()[0]
+        delays.append(job["next_poll"] - now)
+        now = job["next_poll"]
+    assert delays == [120, 200, 200]
+    # the job is abandoned once it runs out of attempts
+    tracker.poll(now)
+    assert not tracker.outstanding()
+    assert client.polls == 4
+
+
+def test_upload_image_to_gcs(
+    monkeypatch: pytest.MonkeyPatch, image_stream: BytesIO
+) -> None:
+    """Test the _upload_image_to_gcs function."""
+    monkeypatch.setenv(
+        "GOOGLE_APPLICATION_CREDENTIALS",
+        "/home/lorevi/workspace/keys/echoes-ai-deploy.json",
+    )
+    destination_blob_name = "test-folder/test-image.jpg"
+    _upload_image_to_gcs(image_stream, destination_blob_name)
+
+    # Verify the image was uploaded
+    storage_client = storage.Client()
+    bucket = storage_client.bucket("echoesai-public-images")
+    blob = bucket.blob(destination_blob_name)
+    assert blob.exists()
+
+    # Clean up the uploaded test image
+    blob.delete()
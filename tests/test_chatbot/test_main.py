@@ -3,7 +3,9 @@
 # pylint: disable=redefined-outer-name unused-argument unused-import
 
 import importlib
+import os
 from datetime import timedelta
+from pathlib import Path
 from unittest.mock import MagicMock, patch
 
 import pytest
@@ -17,9 +19,13 @@ main_module = importlib.import_module("chatbot.main")
 _get_system_message = getattr(main_module, "_get_system_message")
 _parse_time = getattr(main_module, "_parse_time")
 _generate_text = getattr(main_module, "_generate_text")
+_pack_context = getattr(main_module, "_pack_context")
+_load_template = getattr(main_module, "_load_template")
 
 types_module = importlib.import_module("chatbot.types")
 ChatMessage = getattr(types_module, "ChatMessage")
+GENERATION_PROFILES = getattr(types_module, "GENERATION_PROFILES")
+DEFAULT_PROFILE = getattr(types_module, "DEFAULT_PROFILE")
 
 
 def test_generate_text(model: Model) -> None:
@@ -45,6 +51,45 @@ def test_generate_text_no_input(model: Model) -> None:
     assert response["content"] == "Mock response"
 
 
+@patch("chatbot.main.MAX_TOKENS", 20)
+def test_generate_text_profile() -> None:
+    """Test the _generate_text function uses the generation profile of the task."""
+    model = MagicMock()
+    system_message = ChatMessage(role="system", content="system")
+    chat = [ChatMessage(role="user", content="Hi!")]
+    _generate_text(model, system_message, chat, "time")
+    assert (
+        model.generate_response.call_args[1]["profile"] == GENERATION_PROFILES["time"]
+    )
+    _generate_text(model, system_message, chat)
+    assert model.generate_response.call_args[1]["profile"] == DEFAULT_PROFILE
+
+
+def test_pack_context(model: Model) -> None:
+    """
+    Test the _pack_context function keeps the most recent messages that fit.
+    """
+    chat = [ChatMessage(role="user", content=f"Message number {i}") for i in range(10)]
+    per_message = model.message_token_count(chat[0])
+    packed = _pack_context(model, chat)
+    assert packed == chat[-(20 // per_message) :]
+    assert model.token_count(packed) <= 20
+
+
+@patch("chatbot.main.MAX_TOKENS", 20)
+def test_pack_context_reserved(model: Model) -> None:
+    """
+    Test the _pack_context function leaves room for the reserved messages.
+    """
+    chat = [ChatMessage(role="user", content=f"Message number {i}") for i in range(10)]
+    system_message = ChatMessage(role="system", content="You are an assistant.")
+    reserved = model.token_count([system_message])
+    packed = _pack_context(model, chat, [system_message])
+    assert model.token_count(packed) <= 20 - reserved
+    assert packed == chat[len(chat) - len(packed) :]
+    assert _pack_context(model, chat, [system_message] * 20) == []
+
+
 @patch("database.select_character_by_id")
 @patch("database.select_user_by_id")
 def test_get_system_message_chat(
@@ -100,6 +145,42 @@ def test_get_system_message_time(
     assert mock_select_character_by_id.called_once_with(thread["char_id"])
 
 
+def test_get_system_message_cached() -> None:
+    """
+    Test the _get_system_message function reuses previous renders.
+    """
+    character = db.Character(id=1, name="cached", description="{{char}} is cached")
+    first = _get_system_message("event", character)
+    hits = main_module._RENDERED.stats()["hits"]
+    second = _get_system_message("event", character)
+    assert first == second
+    assert "cached is cached" in first["content"]
+    assert main_module._RENDERED.stats()["hits"] == hits + 1
+    character["description"] = "{{char}} has changed"
+    third = _get_system_message("event", character)
+    assert "cached has changed" in third["content"]
+
+
+def test_load_template_reloads_on_change(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """
+    Test the _load_template function only reloads modified templates.
+    """
+    monkeypatch.setattr("chatbot.main.TEMPLATE_DIR", str(tmp_path))
+    path = os.path.join(str(tmp_path), "test.txt")
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("Hello {{char}}")
+    mtime, template = _load_template("test")
+    assert template.render(char="test") == "Hello test"
+    assert _load_template("test")[1] is template
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("Goodbye {{char}}")
+    os.utime(path, (mtime + 1, mtime + 1))
+    _, template = _load_template("test")
+    assert template.render(char="test") == "Goodbye test"
+
+
 def test_parse_time() -> None:
     """
     Test the _parse_time function.
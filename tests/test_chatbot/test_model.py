@@ -4,6 +4,8 @@
 
 import importlib
 
+import pytest
+import torch
 from transformers import Pipeline
 
 from chatbot import Model, new_model
@@ -15,6 +17,12 @@ ChatMessage = getattr(types_module, "ChatMessage")
 model_module = importlib.import_module("chatbot.model")
 ModelMocked = getattr(model_module, "ModelMocked")
 ModelActual = getattr(model_module, "ModelActual")
+ModelCPU = getattr(model_module, "ModelCPU")
+quantize_int8 = getattr(model_module, "quantize_int8")
+available_cores = getattr(model_module, "available_cores")
+new_model_interface = getattr(model_module, "new_model_interface")
+ModelRouter = getattr(model_module, "ModelRouter")
+parse_routes = getattr(model_module, "parse_routes")
 
 
 def test_new_model_mocked() -> None:
@@ -52,6 +60,21 @@ def test_token_count(model: Model) -> None:
     assert tokens == 16
 
 
+def test_token_count_cached(model: Model) -> None:
+    """Tests each message is only tokenized once by the token count function"""
+    chat = [
+        ChatMessage(role="user", content="Hi!"),
+        ChatMessage(role="assistant", content="Hello!"),
+    ]
+    first = model.token_count(chat)
+    second = model.token_count(chat + [ChatMessage(role="user", content="Hi!")])
+    stats = model.token_cache.stats()
+    assert second > first
+    assert stats["size"] == 2
+    assert stats["misses"] == 2
+    assert stats["hits"] == 3
+
+
 def test_generate_response(model: Model) -> None:
     """Tests the generate response function on a model"""
     system_message = ChatMessage(role="system", content="You are an assistant.")
@@ -64,3 +87,76 @@ def test_generate_response(model: Model) -> None:
     response = model.generate_response([system_message] + chat)
     assert response["role"] == "assistant"
     assert response["content"] == "Mock response"
+
+
+def test_quantize_int8() -> None:
+    """Tests linear layers are quantized without changing their outputs much"""
+    torch.manual_seed(0)
+    layers = torch.nn.Sequential(torch.nn.Linear(64, 64), torch.nn.ReLU())
+    inputs = torch.randn(4, 64)
+    quantized = quantize_int8(layers)
+    assert isinstance(quantized[0], torch.ao.nn.quantized.dynamic.Linear)
+    assert torch.allclose(quantized(inputs), layers(inputs), atol=0.05)
+
+
+def test_cpu_backend_options() -> None:
+    """Tests the cpu backend options are checked before the model is loaded"""
+    assert available_cores() >= 1
+    with pytest.raises(ValueError):
+        ModelCPU("meta-llama/Llama-3.2-3B-Instruct", quantization="int3")
+    with pytest.raises(ValueError):
+        new_model_interface(backend="tpu")
+
+
+def test_parse_routes() -> None:
+    """Tests the routes are parsed into the model name of each task"""
+    assert parse_routes("") == {}
+    assert parse_routes("time, comment_choice=small;sd-prompt=medium") == {
+        "time": "small",
+        "comment_choice": "small",
+        "sd-prompt": "medium",
+    }
+    with pytest.raises(ValueError):
+        parse_routes("time")
+
+
+def test_router_metrics() -> None:
+    """Tests tasks are routed to their models, and latencies recorded per route"""
+    main = ModelMocked("main", "short")
+    small = ModelMocked("small", "short")
+    router = ModelRouter(main, {"time": small, "comment_choice": small}, window=3)
+    assert router.recent_latency() is None
+    assert router.model_for("time") is small
+    assert router.model_for("chat") is main
+    assert router.model_for(None) is main
+    assert router.models() == [main, small]
+    for seconds in (1.0, 2.0, 3.0, 4.0):
+        router.record("time", seconds)
+    router.record("chat", 5.0, failed=True)
+    stats = router.stats()
+    assert stats["time"] == {
+        "model": "small",
+        "requests": 3,
+        "failures": 0,
+        "mean": 3.0,
+        "p50": 3.0,
+        "p95": 4.0,
+        "max": 4.0,
+    }
+    assert stats["default"]["model"] == "main"
+    assert stats["default"]["failures"] == 1
+    assert router.recent_latency() == 3.0
+
+
+def test_generate_response_routed() -> None:
+    """Tests generate response uses the model the task is routed to"""
+    main = ModelMocked("meta-llama/Llama-3.2-3B-Instruct", "short")
+    small = ModelMocked("meta-llama/Llama-3.2-3B-Instruct", "long")
+    model = Model(main, routes={"time": small})
+    system_message = ChatMessage(
+        role="system", content="You need to respond with the time."
+    )
+    chat = [system_message, ChatMessage(role="user", content="Hi!")]
+    assert model.generate_response(chat, task="time")["content"] == "10s"
+    assert model.generate_response(chat)["content"] == "1s"
+    assert set(model.router.stats()) == {"time", "default"}
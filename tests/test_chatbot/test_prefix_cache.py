@@ -0,0 +1,93 @@
+"""This file contains the tests for the chatbot/prefix_cache.py file."""
+
+# pylint: disable=redefined-outer-name unused-argument unused-import
+
+import importlib
+
+import torch
+from transformers import DynamicCache
+
+prefix_cache_module = importlib.import_module("chatbot.prefix_cache")
+PrefixCache = getattr(prefix_cache_module, "PrefixCache")
+
+BLOCK_SIZE = 4
+
+
+def _cache(length: int, layers: int = 2) -> DynamicCache:
+    """Build key/values whose values record each token's position."""
+    positions = torch.arange(length, dtype=torch.float32).view(1, 1, length, 1)
+    return DynamicCache.from_legacy_cache(
+        tuple((positions.clone(), positions.clone()) for _ in range(layers))
+    )
+
+
+def _entry_bytes(length: int, layers: int = 2) -> int:
+    """Memory used by the key/values of length tokens."""
+    return 2 * layers * length * 4
+
+
+def test_lookup_miss_then_hit() -> None:
+    """Test a stored prefix is found by a later prompt that extends it."""
+    cache = PrefixCache(max_bytes=10**6, block_size=BLOCK_SIZE)
+    tokens = list(range(10))
+    assert cache.lookup(tokens) == (0, None)
+    cache.store(tokens, _cache(10), [len(tokens)])
+    length, past = cache.lookup(tokens + [10, 11])
+    assert length == 8
+    assert past.get_seq_length() == 8
+    assert past.key_cache[0].flatten().tolist() == list(range(8))
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["tokens_reused"] == 8
+    assert stats["hit_rate"] == 0.5
+
+
+def test_lookup_longest_prefix() -> None:
+    """Test the longest cached prefix is used, and different prompts miss."""
+    cache = PrefixCache(max_bytes=10**6, block_size=BLOCK_SIZE)
+    tokens = list(range(12))
+    cache.store(tokens, _cache(12), [4, 12])
+    assert cache.stats()["entries"] == 2
+    assert cache.lookup(tokens + [12])[0] == 12
+    assert cache.lookup(tokens[:6] + [99] * 6)[0] == 4
+    assert cache.lookup([99] + tokens[1:])[0] == 0
+
+
+def test_lookup_leaves_a_token() -> None:
+    """Test a whole prompt is never served from the cache."""
+    cache = PrefixCache(max_bytes=10**6, block_size=BLOCK_SIZE)
+    tokens = list(range(8))
+    cache.store(tokens, _cache(8), [4, 8])
+    assert cache.lookup(tokens)[0] == 4
+
+
+def test_lookup_returns_copy() -> None:
+    """Test generating from a returned cache doesn't change the stored entry."""
+    cache = PrefixCache(max_bytes=10**6, block_size=BLOCK_SIZE)
+    tokens = list(range(5))
+    cache.store(tokens, _cache(5), [5])
+    _, past = cache.lookup(tokens)
+    past.update(torch.zeros(1, 1, 1, 1), torch.zeros(1, 1, 1, 1), 0)
+    assert cache.lookup(tokens)[1].get_seq_length() == 4
+
+
+def test_eviction() -> None:
+    """Test the least recently used entries are evicted to stay under the cap."""
+    cache = PrefixCache(max_bytes=2 * _entry_bytes(BLOCK_SIZE), block_size=BLOCK_SIZE)
+    first, second, third = [[n] * 5 for n in range(3)]
+    cache.store(first, _cache(5), [5])
+    cache.store(second, _cache(5), [5])
+    assert cache.lookup(first)[0] == 4
+    cache.store(third, _cache(5), [5])
+    assert cache.lookup(second)[0] == 0
+    assert cache.lookup(first)[0] == 4
+    assert cache.lookup(third)[0] == 4
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["bytes"] == stats["max_bytes"]
+    cache.store(list(range(12)), _cache(12), [12])
+    assert cache.stats()["bytes"] <= stats["max_bytes"]
+    cache.clear()
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["bytes"] == 0
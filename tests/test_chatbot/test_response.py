@@ -4,17 +4,59 @@
 
 import importlib
 from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+
+import pytest
 
 import database as db
 from chatbot import Model, new_model, response_cycle
 from tests.test_chatbot.test_model import model
+from tests.test_database.fixtures import character, thread, user
+from tests.test_database.test_main import test_db
 
 types_module = importlib.import_module("chatbot.types")
 ChatMessage = getattr(types_module, "ChatMessage")
 response_module = importlib.import_module("chatbot.response")
-Messages = getattr(response_module, "Messages")
 _get_response_time = getattr(response_module, "_get_response_time")
 _get_response_and_submit = getattr(response_module, "_get_response_and_submit")
+_parse_response_timed_message = getattr(
+    response_module, "_parse_response_timed_message"
+)
+
+
+def test_parse_response_timed_message() -> None:
+    """Test the delay and message are parsed from a combined response."""
+    duration, message = _parse_response_timed_message(
+        '{"delay": "1h 30m", "message": "Hi!"}'
+    )
+    assert duration == timedelta(hours=1, minutes=30)
+    assert message == "Hi!"
+    with pytest.raises(ValueError):
+        _parse_response_timed_message('{"message": "Hi!"}')
+    with pytest.raises(ValueError):
+        _parse_response_timed_message("Hi!")
+
+
+def test_response_cycle_single_generation(model: Model, thread: db.Thread) -> None:
+    """Test the combined response cycle generates the delay and message at once."""
+    with patch.object(
+        model.dispatcher, "generate", wraps=model.dispatcher.generate
+    ) as mock_generate:
+        response_cycle(model, thread["id"], separate_time=False, delay_policy="llm")
+    assert mock_generate.call_count == 1
+    messages = db.select_messages(db.Message(thread_id=thread["id"]))
+    assert len(messages) == 1
+    assert messages[0]["content"] == "Mock response"
+    assert messages[0]["role"] == "assistant"
 
 
-# TODO
+def test_response_cycle_cancelled(model: Model, thread: db.Thread) -> None:
+    """Test a cancelled response cycle doesn't submit its message."""
+    response_cycle(
+        model,
+        thread["id"],
+        separate_time=False,
+        delay_policy="llm",
+        cancelled=lambda: True,
+    )
+    assert not db.select_messages(db.Message(thread_id=thread["id"]))
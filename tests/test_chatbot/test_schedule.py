@@ -0,0 +1,118 @@
+"""This file contains the tests for the chatbot/schedule.py file."""
+
+# pylint: disable=redefined-outer-name unused-argument unused-import protected-access
+
+import importlib
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+schedule_module = importlib.import_module("chatbot.schedule")
+GenerationScheduler = getattr(schedule_module, "GenerationScheduler")
+
+
+@patch("chatbot.schedule._next_delay", return_value=10.0)
+@patch("database.select_character_ids", return_value=[1, 2])
+def test_pop_due(
+    mock_select_character_ids: MagicMock, mock_next_delay: MagicMock
+) -> None:
+    """Test only due jobs are popped, and each is scheduled to fire again."""
+    scheduler = GenerationScheduler(MagicMock())
+    scheduler._refresh_characters()
+    assert len(scheduler._heap) == 8
+    now = time.monotonic()
+    with scheduler._cond:
+        assert scheduler._pop_due(now) == []
+        due = scheduler._pop_due(now + 10)
+    assert sorted(due) == sorted(
+        (char_id, kind)
+        for char_id in [1, 2]
+        for kind in ["thought", "event", "post", "comment"]
+    )
+    assert len(scheduler._heap) == 8
+    assert min(entry[0] for entry in scheduler._heap) == now + 20
+
+
+@patch("chatbot.schedule._next_delay", return_value=10.0)
+@patch("database.select_character_ids")
+def test_refresh_characters_drops_deleted(
+    mock_select_character_ids: MagicMock, mock_next_delay: MagicMock
+) -> None:
+    """Test jobs of deleted characters are discarded when they come due."""
+    mock_select_character_ids.return_value = [1, 2]
+    scheduler = GenerationScheduler(MagicMock())
+    scheduler._refresh_characters()
+    mock_select_character_ids.return_value = [2, 3]
+    scheduler._refresh_characters()
+    assert len(scheduler._heap) == 12
+    with scheduler._cond:
+        due = scheduler._pop_due(time.monotonic() + 10)
+    assert {char_id for char_id, _ in due} == {2, 3}
+
+
+@patch("chatbot.schedule.build_feed_snapshot")
+@patch("chatbot.schedule._run_job")
+@patch("database.select_character_ids", return_value=[1])
+def test_due_jobs_run_on_workers(
+    mock_select_character_ids: MagicMock,
+    mock_run_job: MagicMock,
+    mock_build_feed_snapshot: MagicMock,
+) -> None:
+    """
+    Test the scheduler wakes for due jobs and runs them in the worker pool,
+    with a snapshot of the feed.
+    """
+    ran = threading.Event()
+    mock_run_job.side_effect = lambda *args: ran.set()
+    scheduler = GenerationScheduler(MagicMock(), max_workers=1)
+    with patch("chatbot.schedule._next_delay", side_effect=[0.01, 3600, 3600, 3600]):
+        scheduler._refresh_characters()
+    with patch("chatbot.schedule._next_delay", return_value=3600):
+        scheduler.start()
+        assert ran.wait(timeout=5)
+        scheduler.stop()
+    model = scheduler.model
+    mock_build_feed_snapshot.assert_called_once_with(model)
+    feed = mock_build_feed_snapshot.return_value
+    mock_run_job.assert_called_once_with(model, 1, "thought", feed)
+    assert scheduler.stats == {"submitted": 1, "skipped": 0, "failed": 0}
+
+
+@patch("chatbot.schedule._run_job")
+def test_running_job_is_not_resubmitted(mock_run_job: MagicMock) -> None:
+    """Test a job still running when it comes due again is skipped."""
+    release = threading.Event()
+    mock_run_job.side_effect = lambda *args: release.wait(timeout=5)
+    scheduler = GenerationScheduler(MagicMock())
+    scheduler._submit(1, "post")
+    scheduler._submit(1, "post")
+    release.set()
+    scheduler.stop()
+    assert mock_run_job.call_count == 1
+    assert scheduler.stats["skipped"] == 1
+
+
+@patch("chatbot.schedule._next_delay", return_value=10.0)
+@patch("database.select_character_ids", return_value=[1])
+def test_postponed_jobs(
+    mock_select_character_ids: MagicMock, mock_next_delay: MagicMock
+) -> None:
+    """Test postponed jobs come due again once, counting their postponements."""
+    admission = MagicMock()
+    admission.decide.return_value = "postpone"
+    admission.postpone_delay = 5.0
+    scheduler = GenerationScheduler(MagicMock(), admission=admission)
+    scheduler._refresh_characters()
+    assert not scheduler._admit(1, "post")
+    assert not scheduler._admit(1, "post")
+    admission.decide.assert_called_with(1, "post", 1)
+    with scheduler._cond:
+        assert scheduler._pop_postponed(time.monotonic()) == []
+        due = scheduler._pop_postponed(time.monotonic() + 5)
+    assert due == [(1, "post"), (1, "post")]
+    assert len(scheduler._heap) == 4
+    admission.decide.return_value = "admit"
+    assert scheduler._admit(1, "post")
+    admission.decide.assert_called_with(1, "post", 2)
+    assert scheduler._admit(1, "post")
+    admission.decide.assert_called_with(1, "post", 0)
@@ -0,0 +1,76 @@
+"""This file contains the tests for the chatbot/server.py file."""
+
+# pylint: disable=redefined-outer-name unused-argument unused-import
+
+import importlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Generator
+
+import pytest
+
+server_module = importlib.import_module("chatbot.server")
+start_server = getattr(server_module, "start_server")
+model_module = importlib.import_module("chatbot.model")
+ModelRemote = getattr(model_module, "ModelRemote")
+DEFAULT_MODEL = getattr(model_module, "DEFAULT_MODEL")
+types_module = importlib.import_module("chatbot.types")
+ChatMessage = getattr(types_module, "ChatMessage")
+
+CHAT = [
+    ChatMessage(role="system", content="You are an assistant."),
+    ChatMessage(role="user", content="Hi!"),
+]
+
+
+@pytest.fixture(scope="module")
+def server_address() -> Generator[str, None, None]:
+    """Yields the address of an inference worker serving the mocked model."""
+    process, address = start_server(mocked=True)
+    yield address
+    process.terminate()
+    process.join()
+
+
+@pytest.fixture
+def remote(server_address: str) -> Generator[ModelRemote, None, None]:
+    """Yields a client of the inference worker."""
+    remote = ModelRemote(DEFAULT_MODEL, server_address)
+    yield remote
+    remote.close()
+
+
+def test_generate_responses(remote: ModelRemote) -> None:
+    """Test responses are generated by the worker."""
+    responses = remote.generate_responses([CHAT, CHAT], max_new_tokens=16)
+    assert responses == [
+        ChatMessage(role="assistant", content="Mock response"),
+        ChatMessage(role="assistant", content="Mock response"),
+    ]
+    assert remote.generate_response(CHAT)["content"] == "Mock response"
+    assert remote.max_tokens == 8192
+
+
+def test_clients_share_worker(server_address: str) -> None:
+    """Test several clients can use the same worker at once."""
+    clients = [ModelRemote(DEFAULT_MODEL, server_address) for _ in range(3)]
+    with ThreadPoolExecutor(len(clients)) as executor:
+        responses = list(executor.map(lambda c: c.generate_response(CHAT), clients))
+    assert [r["content"] for r in responses] == ["Mock response"] * 3
+    for client in clients:
+        client.close()
+
+
+def test_reconnects(remote: ModelRemote) -> None:
+    """Test the client reconnects after its connection is lost."""
+    remote.generate_response(CHAT)
+    assert remote._conn is not None  # pylint: disable=protected-access
+    remote._conn.close()  # pylint: disable=protected-access
+    remote._conn = None  # pylint: disable=protected-access
+    assert remote.generate_response(CHAT)["content"] == "Mock response"
+
+
+def test_worker_errors_raised(remote: ModelRemote) -> None:
+    """Test errors in the worker are raised by the client."""
+    with pytest.raises(RuntimeError, match="Unknown request"):
+        remote._request({"op": "unknown"})  # pylint: disable=protected-access
+    assert remote.generate_response(CHAT)["content"] == "Mock response"
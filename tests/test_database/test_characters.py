@@ -125,3 +125,13 @@ def test_update_character(test_db: None) -> None:
     result = db.select_character_by_id(char_id)
     assert result["name"] == "Test Character 2"
     assert result["path_name"] == "test"
+
+
+def test_select_characters_by_ids(test_db: None) -> None:
+    """Test the select_characters_by_ids function."""
+    char_id = db.insert_character(db.Character(name="test", path_name="test"))
+    char2_id = db.insert_character(db.Character(name="test2", path_name="test2"))
+    result = db.select_characters_by_ids([char_id, char2_id, char_id, 999])
+    assert set(result) == {char_id, char2_id}
+    assert result[char2_id]["name"] == "test2"
+    assert db.select_characters_by_ids([]) == {}
@@ -7,7 +7,7 @@ from typing import List
 
 import database as db
 
-from .fixtures import character, post, posts
+from .fixtures import character, characters, comments, post, posts
 from .test_main import test_db
 
 
@@ -96,3 +96,16 @@ def test_select_comments_with_query_no_matching(post: db.Post) -> None:
     db.insert_comment(comment2)
     result = db.select_comments(db.Comment(post_id=999))
     assert not result
+
+
+def test_select_comments_from_posts(
+    posts: List[db.Post], comments: List[db.Comment]
+) -> None:
+    """Test the select_comments_from_posts function."""
+    result = db.select_comments_from_posts([p["id"] for p in posts])
+    assert [c["content"] for c in result[posts[0]["id"]]] == [
+        "test comment",
+        "test comment 2",
+    ]
+    assert [c["content"] for c in result[posts[1]["id"]]] == ["test comment 3"]
+    assert result[posts[2]["id"]] == []
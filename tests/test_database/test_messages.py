@@ -156,6 +156,89 @@ def test_select_messages_by_character(
     assert len(result) == 3
 
 
+def test_select_messages_with_participants(
+    user: db.User, characters: List[db.Character], threads: List[db.Thread]
+) -> None:
+    """Test the select_messages_with_participants function."""
+    # Messages belonging to characters[0]
+    message = db.Message(
+        thread_id=threads[0]["id"],
+        content="test message",
+        role="user",
+    )
+    message2 = db.Message(
+        thread_id=threads[2]["id"],
+        content="test message 2",
+        role="assistant",
+    )
+    # Messages belonging to characters[1]
+    message3 = db.Message(
+        thread_id=threads[1]["id"],
+        content="test message 3",
+        role="user",
+    )
+    db.insert_message(message)
+    db.insert_message(message2)
+    db.insert_message(message3)
+    result = db.select_messages_with_participants(char_id=characters[0]["id"])
+    assert len(result) == 2
+    assert result[0]["content"] == "test message"
+    assert result[0]["char_name"] == characters[0]["name"]
+    assert result[0]["username"] == user["username"]
+    assert result[0]["user_id"] == user["id"]
+    assert result[0]["char_id"] == characters[0]["id"]
+    result = db.select_messages_with_participants(thread_id=threads[1]["id"])
+    assert len(result) == 1
+    assert result[0]["content"] == "test message 3"
+    assert result[0]["char_name"] == characters[1]["name"]
+
+
+def test_select_recent_messages_by_character(
+    characters: List[db.Character], threads: List[db.Thread]
+) -> None:
+    """Test the select_recent_messages_by_character function."""
+    now = datetime.now(timezone.utc)
+    for i in range(3):
+        db.insert_message(
+            db.Message(
+                thread_id=threads[0]["id"],
+                content=f"thread 0 message {i}",
+                role="user",
+                timestamp=now - timedelta(minutes=10 - i),
+            )
+        )
+    db.insert_message(
+        db.Message(
+            thread_id=threads[2]["id"],
+            content="thread 2 message",
+            role="assistant",
+            timestamp=now - timedelta(minutes=1),
+        )
+    )
+    # belongs to characters[1]
+    db.insert_message(
+        db.Message(thread_id=threads[1]["id"], content="other", role="user")
+    )
+    result = db.select_recent_messages_by_character(characters[0]["id"], limit=3)
+    assert [message["content"] for message in result] == [
+        "thread 2 message",
+        "thread 0 message 2",
+        "thread 0 message 1",
+    ]
+    assert result[0]["char_name"] == characters[0]["name"]
+    result = db.select_recent_messages_by_character(
+        characters[0]["id"], limit=10, per_thread_limit=1
+    )
+    assert [message["content"] for message in result] == [
+        "thread 2 message",
+        "thread 0 message 2",
+    ]
+    result = db.select_recent_messages_by_character(
+        characters[0]["id"], limit=10, before=now - timedelta(minutes=9)
+    )
+    assert [message["content"] for message in result] == ["thread 0 message 0"]
+
+
 def test_delete_message(thread: db.Thread) -> None:
     """Test the delete_message function."""
     message = db.Message(
@@ -0,0 +1,156 @@
+"""Tests for the migrations module in the database package."""
+
+# pylint: disable=redefined-outer-name unused-argument unused-import
+
+import contextlib
+import importlib
+from pathlib import Path
+from typing import Any, Callable, Generator, List, Tuple
+
+import pytest
+from sqlalchemy import Engine, create_engine, event, inspect
+
+import database as db
+
+from .fixtures import character, post, thread, user
+from .test_main import test_db
+
+migrations_module = importlib.import_module("database.migrations")
+MIGRATIONS = getattr(migrations_module, "MIGRATIONS")
+schema_sql = getattr(migrations_module, "schema_sql")
+main_module = importlib.import_module("database.main")
+
+SQL_DIR = Path(__file__).parents[2] / "sql"
+
+
+@pytest.fixture
+def engine() -> Generator[Engine, None, None]:
+    """Yields an empty database of its own."""
+    engine = create_engine("sqlite+pysqlite:///:memory:")
+    yield engine
+    engine.dispose()
+
+
+def _indexes(engine: Engine, table: str) -> List[str]:
+    return [index["name"] for index in inspect(engine).get_indexes(table)]
+
+
+def test_create_db_is_current(engine: Engine) -> None:
+    """Test a new database is created at the newest schema version."""
+    db.create_db(engine)
+    assert db.schema_version(engine) == MIGRATIONS[-1][0]
+    assert "ix_events_char_id_timestamp" in _indexes(engine, "events")
+    assert db.migrate(engine) == []
+
+
+def test_migrate_existing_database(engine: Engine) -> None:
+    """Test a database from before versioning is brought up to date."""
+    db.metadata_obj.create_all(engine)
+    with engine.begin() as conn:
+        for table in db.metadata_obj.sorted_tables:
+            for index in table.indexes:
+                index.drop(conn)
+        for table in ("messages", "events", "posts", "comments"):
+            conn.exec_driver_sql(f"ALTER TABLE {table} DROP COLUMN token_count")
+            conn.exec_driver_sql(f"ALTER TABLE {table} DROP COLUMN tokenizer")
+        conn.exec_driver_sql("DROP TABLE schema_version")
+    assert db.migrate(engine) == [version for version, _, _ in MIGRATIONS]
+    columns = [c["name"] for c in inspect(engine).get_columns("messages")]
+    assert "token_count" in columns
+    assert "tokenizer" in columns
+    assert _indexes(engine, "likes") == [
+        "ix_likes_comment_id",
+        "ix_likes_post_id",
+        "ix_likes_user_id_content_liked_comment_id",
+        "ix_likes_user_id_content_liked_post_id",
+    ]
+    assert db.schema_version(engine) == MIGRATIONS[-1][0]
+
+
+@pytest.mark.parametrize(
+    "dialect, filename", [("sqlite", "schema.sql"), ("postgresql", "schema_psql.sql")]
+)
+def test_schema_files_current(dialect: str, filename: str) -> None:
+    """Test the schema files match the table definitions."""
+    assert (SQL_DIR / filename).read_text() == schema_sql(dialect)
+
+
+def _query_plans(query: Callable[[], Any]) -> List[str]:
+    """Run a query, returning the plans SQLite chose for its statements."""
+    statements: List[Tuple[str, Any]] = []
+
+    def record(*args: Any) -> None:
+        # conn, cursor, statement, parameters, context, executemany
+        statements.append((args[2], args[3]))
+
+    engine = main_module.ENGINE
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        # the plan is recorded whether or not anything is found
+        with contextlib.suppress(ValueError):
+            query()
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    plans = []
+    with engine.connect() as conn:
+        for statement, parameters in statements:
+            rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            plans.append("\n".join(row.detail for row in rows))
+    return plans
+
+
+@pytest.mark.parametrize(
+    "index, query",
+    [
+        (
+            "ix_messages_thread_id_timestamp",
+            lambda ids: db.select_messages_with_participants(thread_id=ids["thread"]),
+        ),
+        (
+            "ix_messages_thread_id_timestamp",
+            lambda ids: db.select_scheduled_message(ids["thread"]),
+        ),
+        (
+            "ix_events_char_id_timestamp",
+            lambda ids: db.select_most_recent_event(ids["char"]),
+        ),
+        (
+            "ix_posts_char_id_timestamp",
+            lambda ids: db.select_posts(
+                db.Post(char_id=ids["char"]),
+                db.QueryOptions(orderby="timestamp", order="desc"),
+            ),
+        ),
+        (
+            "ix_comments_post_id",
+            lambda ids: db.select_comments_from_posts([ids["post"]]),
+        ),
+        (
+            "ix_threads_user_id_char_id_started",
+            lambda ids: db.select_latest_thread(ids["user"], ids["char"]),
+        ),
+        (
+            "ix_likes_user_id_content_liked_post_id",
+            lambda ids: db.has_user_liked(ids["user"], "post", ids["post"]),
+        ),
+        ("ix_likes_post_id", lambda ids: db.count_likes("post", ids["post"])),
+        ("ix_users_username", lambda ids: db.select_user("test")),
+        ("ix_characters_path_name", lambda ids: db.select_character("test_character")),
+    ],
+)
+def test_hot_queries_use_indexes(
+    index: str,
+    query: Callable[[Any], Any],
+    thread: db.Thread,
+    post: db.Post,
+) -> None:
+    """Test each hot query is answered with an index rather than a table scan."""
+    db.insert_event(db.Event(char_id=post["char_id"], type="event", content="test"))
+    ids = {
+        "thread": thread["id"],
+        "user": thread["user_id"],
+        "char": thread["char_id"],
+        "post": post["id"],
+    }
+    plans = _query_plans(lambda: query(ids))
+    assert any(index in plan for plan in plans), plans
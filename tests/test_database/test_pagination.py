@@ -0,0 +1,85 @@
+"""Tests for the pagination module in the database package."""
+
+# pylint: disable=redefined-outer-name unused-argument unused-import
+
+from datetime import datetime, timedelta
+from typing import List
+
+import pytest
+
+import database as db
+
+from .fixtures import character, thread, user
+from .test_main import test_db
+
+
+def test_cursor_round_trip() -> None:
+    """Test a cursor decodes to the row it was made from."""
+    timestamp = datetime(2024, 1, 2, 3, 4, 5, 678)
+    cursor = db.next_cursor(
+        [db.Message(id=7, timestamp=timestamp)], db.QueryOptions(limit=1)
+    )
+    assert cursor is not None
+    assert db.decode_cursor(cursor) == (timestamp, 7)
+
+
+def test_next_cursor_last_page() -> None:
+    """Test there's no next page after a short page or without a limit."""
+    rows = [db.Message(id=1, timestamp=datetime(2024, 1, 1))]
+    assert db.next_cursor(rows, db.QueryOptions(limit=2)) is None
+    assert db.next_cursor(rows, db.QueryOptions()) is None
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "", "bm90fGE"])
+def test_decode_invalid_cursor(cursor: str) -> None:
+    """Test malformed cursors are rejected."""
+    with pytest.raises(ValueError):
+        db.decode_cursor(cursor)
+
+
+def _page_through(thread: db.Thread, options: db.QueryOptions) -> List[List[int]]:
+    """Select every page of a thread's messages, returning their ids."""
+    pages = []
+    while True:
+        page = db.select_messages(db.Message(thread_id=thread["id"]), options)
+        pages.append([message["id"] for message in page])
+        cursor = db.next_cursor(page, options)
+        if cursor is None:
+            return pages
+        options = db.QueryOptions(**{**options, "cursor": cursor})
+
+
+@pytest.mark.parametrize("order", ["asc", "desc"])
+def test_select_messages_by_cursor(thread: db.Thread, order: str) -> None:
+    """Test paging by cursor visits every message once, in order."""
+    start = datetime(2024, 1, 1)
+    ids = [
+        db.insert_message(
+            db.Message(
+                thread_id=thread["id"],
+                content=f"message {i}",
+                role="user",
+                # pairs of messages share a timestamp
+                timestamp=start + timedelta(minutes=i // 2),
+            )
+        )
+        for i in range(5)
+    ]
+    pages = _page_through(
+        thread, db.QueryOptions(limit=2, orderby="timestamp", order=order)
+    )
+    expected = ids if order == "asc" else ids[::-1]
+    assert pages == [expected[0:2], expected[2:4], expected[4:]]
+
+
+def test_cursor_requires_timestamp_order(thread: db.Thread) -> None:
+    """Test a cursor can't be combined with another order."""
+    cursor = db.next_cursor(
+        [db.Message(id=1, timestamp=datetime(2024, 1, 1))], db.QueryOptions(limit=1)
+    )
+    assert cursor is not None
+    with pytest.raises(ValueError):
+        db.select_messages(
+            db.Message(thread_id=thread["id"]),
+            db.QueryOptions(limit=1, orderby="role", cursor=cursor),
+        )
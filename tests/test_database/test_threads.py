@@ -7,7 +7,7 @@ from typing import List
 
 import database as db
 
-from .fixtures import character, characters, user
+from .fixtures import character, characters, threads, user
 from .test_main import test_db
 
 
@@ -115,3 +115,11 @@ def test_select_latest_thread(user: db.User, character: db.Character) -> None:
     assert result["user_id"] == user["id"]
     assert result["char_id"] == character["id"]
     assert result["id"] == latest_id
+
+
+def test_select_threads_by_ids(threads: List[db.Thread]) -> None:
+    """Test several threads are selected in one query, keyed by id."""
+    ids = [thread["id"] for thread in threads]
+    result = db.select_threads_by_ids(ids[:2] + [999])
+    assert sorted(result) == sorted(ids[:2])
+    assert result[ids[0]] == threads[0]
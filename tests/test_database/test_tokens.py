@@ -0,0 +1,121 @@
+"""Tests for the tokens module in the database package."""
+
+# pylint: disable=redefined-outer-name unused-argument unused-import
+
+import importlib
+from typing import Generator
+
+import pytest
+from sqlalchemy import Table, select
+
+import database as db
+
+from .fixtures import character, characters, post, thread, threads, user
+from .test_main import test_db
+
+tokens_module = importlib.import_module("database.tokens")
+main_module = importlib.import_module("database.main")
+db_types_module = importlib.import_module("database.db_types")
+messages_table = getattr(db_types_module, "messages_table")
+posts_table = getattr(db_types_module, "posts_table")
+comments_table = getattr(db_types_module, "comments_table")
+
+
+def _word_count(text: str) -> int:
+    return len(text.split())
+
+
+@pytest.fixture
+def counter(monkeypatch: pytest.MonkeyPatch) -> Generator[None, None, None]:
+    """Counts the tokens of inserted rows by words, for the test only."""
+    monkeypatch.setattr(tokens_module, "_COUNTER", None)
+    db.register_token_counter("words", _word_count)
+    yield
+
+
+def _counts(table: Table) -> dict:
+    with main_module.ENGINE.connect() as conn:
+        rows = conn.execute(select(table.c.id, table.c.token_count, table.c.tokenizer))
+        return {row.id: (row.token_count, row.tokenizer) for row in rows}
+
+
+def test_insert_counts_tokens(counter: None, thread: db.Thread, post: db.Post) -> None:
+    """Test the tokens of inserted rows are counted."""
+    message_id = db.insert_message(
+        db.Message(thread_id=thread["id"], content="three word message", role="user")
+    )
+    comment_id = db.insert_comment(
+        db.Comment(post_id=post["id"], char_id=post["char_id"], content="a comment")
+    )
+    post_id = db.insert_post(
+        db.Post(
+            char_id=post["char_id"],
+            content="post content",
+            image_post=True,
+            image_description="an image",
+            prompt="",
+        )
+    )
+    assert _counts(messages_table)[message_id] == (3, "words")
+    assert _counts(comments_table)[comment_id] == (2, "words")
+    assert _counts(posts_table)[post_id] == (4, "words")
+
+
+def test_update_recounts_tokens(counter: None, thread: db.Thread) -> None:
+    """Test the tokens of a message are counted again when its content changes."""
+    message_id = db.insert_message(
+        db.Message(thread_id=thread["id"], content="message", role="user")
+    )
+    db.update_message(db.Message(id=message_id, content="edited message"))
+    assert _counts(messages_table)[message_id] == (2, "words")
+
+
+def test_backfill_token_counts(
+    monkeypatch: pytest.MonkeyPatch, thread: db.Thread
+) -> None:
+    """Test rows without counts from the current tokenizer are counted."""
+    monkeypatch.setattr(tokens_module, "_COUNTER", None)
+    uncounted = db.insert_message(
+        db.Message(thread_id=thread["id"], content="not counted", role="user")
+    )
+    db.register_token_counter("chars", len)
+    other = db.insert_message(
+        db.Message(thread_id=thread["id"], content="other tokenizer", role="user")
+    )
+    db.register_token_counter("words", _word_count)
+    counted = db.insert_message(
+        db.Message(thread_id=thread["id"], content="already counted", role="user")
+    )
+    result = db.backfill_token_counts(batch_size=1)
+    assert result["messages"] >= 2
+    counts = _counts(messages_table)
+    assert counts[uncounted] == (2, "words")
+    assert counts[other] == (2, "words")
+    assert counts[counted] == (2, "words")
+    assert db.backfill_token_counts()["messages"] == 0
+
+
+def test_backfill_without_counter(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test the backfill needs a registered counter."""
+    monkeypatch.setattr(tokens_module, "_COUNTER", None)
+    with pytest.raises(ValueError):
+        db.backfill_token_counts()
+
+
+def test_select_messages_within_budget(counter: None, thread: db.Thread) -> None:
+    """Test only the most recent messages fitting the budget are selected."""
+    ids = [
+        db.insert_message(
+            db.Message(thread_id=thread["id"], content="two words", role="user")
+        )
+        for _ in range(5)
+    ]
+    result = db.select_messages_with_participants(
+        thread_id=thread["id"], token_budget=5, tokenizer="words"
+    )
+    assert sorted(m["id"] for m in result) == ids[-2:]
+    assert result[0]["char_name"] == "test character"
+    result = db.select_messages_with_participants(
+        thread_id=thread["id"], token_budget=5, tokenizer="other"
+    )
+    assert len(result) == 5
@@ -54,3 +54,17 @@ def test_update_user(test_db: None) -> None:
     db.update_user(user)
     result = db.select_user_by_id(user["id"])
     assert result["username"] == "test2"
+
+
+def test_select_users_by_ids(test_db: None) -> None:
+    """Test several users are selected in one query, keyed by id."""
+    ids = [
+        db.insert_user(
+            db.User(username=f"user{i}", password="test", email=f"{i}@test.com")
+        )
+        for i in range(3)
+    ]
+    result = db.select_users_by_ids([ids[0], ids[2], ids[2], 999])
+    assert sorted(result) == [ids[0], ids[2]]
+    assert result[ids[2]]["username"] == "user2"
+    assert db.select_users_by_ids([]) == {}
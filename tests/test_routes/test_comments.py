@@ -4,6 +4,7 @@ This file contains the tests for the routes/posts.py file.
 
 # pylint: disable=redefined-outer-name unused-argument unused-import
 
+from datetime import datetime
 from unittest.mock import MagicMock, patch
 
 from flask.testing import FlaskClient
@@ -15,9 +16,9 @@ from .fixtures import app, client
 
 @patch("database.select_post")
 @patch("database.select_comments")
-@patch("database.select_character_by_id")
+@patch("database.select_characters_by_ids")
 def test_get_posts_with_query(
-    mock_select_character_by_id: MagicMock,
+    mock_select_characters_by_ids: MagicMock,
     mock_select_comments: MagicMock,
     mock_select_post: MagicMock,
     client: FlaskClient,
@@ -26,16 +27,30 @@ def test_get_posts_with_query(
     Test the get posts route with a query specifying a character.
     """
     post = db.Post(id=1, char_id=1, content="Test post")
-    character = db.Character(id=1, path_name="test_character")
+    character = db.Character(
+        id=1,
+        name="Test Character",
+        path_name="test_character",
+        profile_path="",
+        favorite_colour="",
+    )
     comment_1 = db.Comment(
-        id=1, post_id=post["id"], char_id=character["id"], content="Test comment 1"
+        id=1,
+        timestamp=datetime(2024, 1, 1),
+        post_id=post["id"],
+        char_id=character["id"],
+        content="Test comment 1",
     )
     comment_2 = db.Comment(
-        id=2, post_id=post["id"], char_id=character["id"], content="Test comment 2"
+        id=2,
+        timestamp=datetime(2024, 1, 1),
+        post_id=post["id"],
+        char_id=character["id"],
+        content="Test comment 2",
     )
     mock_select_post.return_value = post
     mock_select_comments.return_value = [comment_1, comment_2]
-    mock_select_character_by_id.return_value = character
+    mock_select_characters_by_ids.return_value = {character["id"]: character}
     response = client.get(f"/v1/posts/{post['id']}/comments")
     assert response.status_code == 200
     assert response.json
@@ -44,4 +59,5 @@ def test_get_posts_with_query(
     assert response.json[1]["id"] == comment_2["id"]
     assert mock_select_post.called_once_with(post["id"])
     assert mock_select_comments.called_once_with(db.Comment(post_id=post["id"]))
-    assert mock_select_character_by_id.called_once_with(character["id"])
+    assert response.json[0]["posted_by"]["name"] == character["name"]
+    mock_select_characters_by_ids.assert_called_once()
@@ -5,6 +5,7 @@ This file contains the tests for the routes/events.py file.
 # pylint: disable=redefined-outer-name unused-argument unused-import
 
 
+from datetime import datetime
 from unittest.mock import MagicMock, patch
 
 from flask.testing import FlaskClient
@@ -64,3 +65,22 @@ def test_get_events_invalid_character(
     response = client.get("/v1/events?char_path=not_a_character")
     assert response.status_code == 200
     assert response.json == []
+
+
+@patch("database.select_events")
+def test_get_events_paginated(
+    mock_select_events: MagicMock, client: FlaskClient
+) -> None:
+    """
+    Test the get events route pages through events with a cursor.
+    """
+    timestamp = datetime(2024, 1, 1)
+    event_1 = db.Event(id=1, char_id=1, type="test", timestamp=timestamp)
+    mock_select_events.return_value = [event_1]
+    response = client.get("/v1/events?char_id=1&limit=1&order=desc")
+    assert response.status_code == 200
+    cursor = response.headers["X-Next-Cursor"]
+    client.get(f"/v1/events?char_id=1&limit=1&order=desc&cursor={cursor}")
+    mock_select_events.assert_called_with(
+        db.Event(char_id=1), db.QueryOptions(limit=1, order="desc", cursor=cursor)
+    )
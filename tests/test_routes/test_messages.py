@@ -179,3 +179,32 @@ def test_delete_messages_more_recent_app(
     assert response.status_code == 200
     assert mock_select_message.called_once_with(message_1["id"])
     assert mock_delete_messages_more_recent.called_once_with(message_1["id"])
+
+
+@patch("database.select_thread")
+@patch("database.select_messages")
+def test_get_messages_by_thread_paginated(
+    mock_select_messages: MagicMock,
+    mock_select_thread: MagicMock,
+    client: FlaskClient,
+) -> None:
+    """Test a full page of messages comes with the cursor of the next page."""
+    thread_1 = db.Thread(id=1)
+    timestamp = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    message_1 = db.Message(id=1, thread_id=1, content="test 1", timestamp=timestamp)
+    message_2 = db.Message(id=2, thread_id=1, content="test 2", timestamp=timestamp)
+    mock_select_thread.return_value = thread_1
+    mock_select_messages.return_value = [message_1, message_2]
+    response = client.get("/v1/threads/1/messages?limit=2&orderby=timestamp")
+    assert response.status_code == 200
+    cursor = response.headers["X-Next-Cursor"]
+    assert db.decode_cursor(cursor) == (timestamp, message_2["id"])
+    response = client.get(f"/v1/threads/1/messages?limit=2&cursor={cursor}")
+    mock_select_messages.assert_called_with(
+        db.Message(thread_id=1), db.QueryOptions(limit=2, cursor=cursor)
+    )
+    mock_select_messages.return_value = [message_1]
+    response = client.get(f"/v1/threads/1/messages?limit=2&cursor={cursor}")
+    assert "X-Next-Cursor" not in response.headers
+    response = client.get("/v1/threads/1/messages?cursor=invalid")
+    assert response.json == []
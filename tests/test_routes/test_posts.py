@@ -4,6 +4,7 @@ This file contains the tests for the routes/posts.py file.
 
 # pylint: disable=redefined-outer-name unused-argument unused-import
 
+from datetime import datetime
 from unittest.mock import MagicMock, patch
 
 from flask.testing import FlaskClient
@@ -15,17 +16,41 @@ from .fixtures import app, client
 
 @patch("database.select_posts")
 @patch("database.select_character")
+@patch("database.select_characters_by_ids")
+@patch("database.select_comments_from_posts")
 def test_get_posts_with_query(
-    mock_select_character: MagicMock, mock_select_posts: MagicMock, client: FlaskClient
+    mock_select_comments_from_posts: MagicMock,
+    mock_select_characters_by_ids: MagicMock,
+    mock_select_character: MagicMock,
+    mock_select_posts: MagicMock,
+    client: FlaskClient,
 ) -> None:
     """
     Test the get posts route with a query specifying a character.
+    The characters and comments of the posts are selected in one query each.
     """
-    char = db.Character(id=1, path_name="test_character")
+    char = db.Character(
+        id=1,
+        name="Test Character",
+        path_name="test_character",
+        profile_path="",
+        favorite_colour="",
+    )
     mock_select_character.return_value = char
-    post_1 = db.Post(id=1, char_id=1, content="Test post 1")
-    post_2 = db.Post(id=2, char_id=1, content="Test post 2")
+    post_fields = {
+        "timestamp": datetime(2024, 1, 1),
+        "image_post": False,
+        "image_path": "",
+        "image_description": "",
+    }
+    post_1 = db.Post(id=1, char_id=1, content="Test post 1", prompt="", **post_fields)
+    post_2 = db.Post(id=2, char_id=1, content="Test post 2", prompt="", **post_fields)
+    comment = db.Comment(
+        id=1, timestamp=datetime(2024, 1, 1), post_id=1, char_id=1, content="Test"
+    )
     mock_select_posts.return_value = [post_1, post_2]
+    mock_select_characters_by_ids.return_value = {char["id"]: char}
+    mock_select_comments_from_posts.return_value = {1: [comment], 2: []}
     query = "?char_path=test_character"
     response = client.get(f"/v1/posts{query}")
     assert response.status_code == 200
@@ -33,3 +58,8 @@ def test_get_posts_with_query(
     assert response.json[0]["id"] == post_1["id"]
     assert response.json[1]["id"] == post_2["id"]
     assert mock_select_posts.called_once_with(db.Post(char_id=1))
+    assert response.json[0]["comments_count"] == 1
+    assert response.json[0]["comments"][0]["id"] == comment["id"]
+    assert response.json[1]["comments_count"] == 0
+    mock_select_characters_by_ids.assert_called_once()
+    mock_select_comments_from_posts.assert_called_once()
@@ -105,9 +105,9 @@ def test_login_missing_field(client: FlaskClient) -> None:
 
 @patch("database.select_user")
 @patch("database.select_threads")
-@patch("database.select_character_by_id")
+@patch("database.select_characters_by_ids")
 def get_threads_by_user(
-    mock_select_character_by_id: MagicMock,
+    mock_select_characters_by_ids: MagicMock,
     mock_select_threads: MagicMock,
     mock_select_user: MagicMock,
     client: FlaskClient,
@@ -120,7 +120,7 @@ def get_threads_by_user(
     threads = [thread1, thread2]
     mock_select_user.return_value = user
     mock_select_threads.return_value = threads
-    mock_select_character_by_id.return_value = character
+    mock_select_characters_by_ids.return_value = {character["id"]: character}
 
     response = client.get(f"/v1/users/{user['username']}/threads")
     assert response.status_code == 200
@@ -130,4 +130,4 @@ def get_threads_by_user(
     assert response.json[1]["id"] == thread2["id"]
     assert mock_select_user.called_once_with(user["username"])
     assert mock_select_threads.called_once_with(db.Thread(user_id=user["id"]), {})
-    assert mock_select_character_by_id.called_once_with(thread1["char_id"])
+    mock_select_characters_by_ids.assert_called_once()